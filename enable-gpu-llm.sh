@@ -77,7 +77,7 @@ export FORCE_CMAKE=1
 export CMAKE_ARGS="-DGGML_CUDA=on"
 export CUDACXX=/usr/local/cuda/bin/nvcc
 
-pip install llama-cpp-python --upgrade --force-reinstall --no-cache-dir
+pip install "llama-cpp-python==0.3.9" --force-reinstall --no-cache-dir
 
 echo ""
 echo "========================================="
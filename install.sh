@@ -162,11 +162,11 @@ if [ "$HAS_GPU" = true ] && [ "$HAS_CUDA" = true ]; then
     export CMAKE_ARGS="-DGGML_CUDA=on"
     export FORCE_CMAKE=1
     
-    pip install llama-cpp-python --upgrade --no-cache-dir -q
+    pip install "llama-cpp-python==0.3.9" --no-cache-dir -q
     echo -e "  ${GREEN}✓${NC} llama-cpp-python installed with GPU support"
 else
     echo "  Installing llama-cpp-python (CPU-only)..."
-    CMAKE_ARGS="-DGGML_BLAS=OFF -DGGML_OPENMP=OFF" pip install llama-cpp-python --no-cache-dir -q
+    CMAKE_ARGS="-DGGML_BLAS=OFF -DGGML_OPENMP=OFF" pip install "llama-cpp-python==0.3.9" --no-cache-dir -q
     echo -e "  ${YELLOW}ℹ${NC} llama-cpp-python installed (CPU-only)"
 fi
 
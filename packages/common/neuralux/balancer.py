@@ -0,0 +1,130 @@
+"""Least-pending routing of requests across service replicas."""
+
+import asyncio
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import structlog
+from nats.errors import NoRespondersError
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# Failures worth retrying on another replica; error replies are not, since
+# the same request would fail there too
+_RETRYABLE = (asyncio.TimeoutError, NoRespondersError)
+
+
+class ReplicaBalancer:
+    """Spreads requests for a subject over the replicas listed in a registry.
+    
+    The registry is a JSON file mapping a subject to the per-replica
+    subjects serving it, e.g. ``{"ai.llm.request": ["ai.llm.request.a",
+    "ai.llm.request.b"]}``. It is re-read whenever its mtime changes, so
+    replicas can be added or removed without restarting clients. Subjects
+    it does not list are left to the caller (usually a queue group).
+    
+    Each request goes to the replica with the fewest requests pending from
+    this client, and at most ``max_concurrent`` run on one replica at a
+    time, so a slow replica cannot hold up requests another could serve.
+    A timeout or missing responder is retried on the least loaded replica
+    not yet tried, with exponential backoff, up to ``max_attempts`` times.
+    """
+    
+    def __init__(
+        self,
+        registry_path: Path,
+        max_concurrent: int = 8,
+        max_attempts: int = 5,
+        backoff: float = 0.1,
+    ):
+        """Initialize the balancer; the registry is read on first use."""
+        self.registry_path = registry_path
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._registry: Dict[str, List[str]] = {}
+        self._mtime: Optional[float] = None
+        self._pending: Counter = Counter()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+    
+    def replicas(self, subject: str) -> List[str]:
+        """Per-replica subjects registered for a subject (empty if none)."""
+        self._refresh()
+        return self._registry.get(subject, [])
+    
+    def _refresh(self) -> None:
+        """Re-read the registry if the file changed since the last read."""
+        try:
+            mtime = os.stat(self.registry_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        
+        registry: Dict[str, List[str]] = {}
+        if mtime is not None:
+            try:
+                with open(self.registry_path, "rb") as f:
+                    data = json.load(f)
+                registry = {
+                    subject: [str(target) for target in targets]
+                    for subject, targets in data.items()
+                    if isinstance(targets, list) and targets
+                }
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning(
+                    "Ignoring invalid endpoint registry",
+                    path=str(self.registry_path),
+                    error=str(e)
+                )
+        self._registry = registry
+        logger.info("Endpoint registry loaded", subjects=len(registry))
+    
+    def _pick(self, targets: List[str], tried: set) -> str:
+        """Least pending replica, preferring ones not tried yet."""
+        fresh = [target for target in targets if target not in tried] or targets
+        return min(fresh, key=lambda target: self._pending[target])
+    
+    async def dispatch(
+        self,
+        subject: str,
+        send: Callable[[str], Awaitable[T]],
+    ) -> Tuple[str, T]:
+        """Call ``send`` with a replica subject; returns (replica, result)."""
+        targets = self.replicas(subject)
+        tried: set = set()
+        attempt = 0
+        while True:
+            target = self._pick(targets, tried)
+            tried.add(target)
+            semaphore = self._semaphores.get(target)
+            if semaphore is None:
+                semaphore = self._semaphores[target] = asyncio.Semaphore(self.max_concurrent)
+            
+            # Waiting for the semaphore counts as pending, so others avoid it
+            self._pending[target] += 1
+            try:
+                async with semaphore:
+                    return target, await send(target)
+            except _RETRYABLE as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+                logger.warning(
+                    "Replica failed, retrying",
+                    subject=subject,
+                    replica=target,
+                    error=type(e).__name__,
+                    attempt=attempt
+                )
+            finally:
+                self._pending[target] -= 1
+                if not self._pending[target]:
+                    del self._pending[target]
+            await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
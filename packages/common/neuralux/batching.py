@@ -0,0 +1,111 @@
+"""Micro-batching of concurrent single-item calls."""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent single-item requests into batched calls.
+    
+    Requests are queued and drained by a background task, which waits up to
+    ``max_delay_ms`` for more work before passing up to ``max_batch`` items
+    to ``process_batch`` in a single call. ``process_batch`` returns one
+    result per item, in order.
+    """
+    
+    def __init__(
+        self,
+        process_batch: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch: int = 32,
+        max_delay_ms: float = 8.0
+    ):
+        """Initialize the batcher."""
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Requests taken off the queue and not resolved yet
+        self._batch: List[Tuple[T, asyncio.Future]] = []
+    
+    def start(self) -> None:
+        """Start the background drain task on the running loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._drain())
+    
+    async def stop(self) -> None:
+        """Stop the drain task and fail any pending requests.
+        
+        Pending includes the batch being collected or processed when the
+        task is cancelled, not just requests still queued.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+    
+    async def submit(self, item: T) -> R:
+        """Process one item, sharing a batch call with concurrent requests."""
+        if self._task is None:
+            # Not started (e.g. REST-only tests): process the item on its own
+            return (await self.process_batch([item]))[0]
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+    
+    async def _collect(self) -> List[Tuple[T, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch or window is full."""
+        batch = self._batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _drain(self) -> None:
+        """Background task: process queued items in batches and resolve futures."""
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            
+            try:
+                results = await self.process_batch(items)
+            except Exception as e:
+                logger.error("Batched call failed", batch=len(items), error=str(e))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._batch = []
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self._batch = []
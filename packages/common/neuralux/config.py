@@ -20,6 +20,11 @@ class NeuraluxConfig(BaseSettings):
     # Message Bus
     nats_url: str = "nats://localhost:4222"
     nats_max_reconnect_attempts: int = 10
+    # Optional JSON registry of per-replica subjects (see neuralux.balancer);
+    # defaults to endpoints.json in the config directory
+    endpoint_registry_path: Optional[Path] = None
+    endpoint_max_concurrent: int = 8  # In-flight requests per replica from one client
+    endpoint_max_attempts: int = 5  # Tries on different replicas after timeouts
     
     # Redis Cache
     redis_url: str = "redis://localhost:6379"
@@ -9,10 +9,33 @@ from nats.aio.client import Client as NATSClient
 from nats.js import JetStreamContext
 import structlog
 
+from .balancer import ReplicaBalancer
 from .config import NeuraluxConfig
 
 logger = structlog.get_logger(__name__)
 
+try:
+    import orjson
+except ImportError:  # Optional fast JSON codec; stdlib json otherwise
+    orjson = None
+
+
+def _dumps(message: Any) -> bytes:
+    """Encode a message payload as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(
+            message,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(message).encode()
+
+
+def _loads(data: bytes) -> Any:
+    """Decode a JSON message payload."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode())
+
 
 class MessageBusClient:
     """Wrapper for NATS message bus with JetStream support."""
@@ -23,6 +46,12 @@ class MessageBusClient:
         self.nc: Optional[NATSClient] = None
         self.js: Optional[JetStreamContext] = None
         self._subscriptions: Dict[str, Any] = {}
+        # Routes requests for subjects served by several registered replicas
+        self.balancer = ReplicaBalancer(
+            self.config.endpoint_registry_path or self.config.config_dir / "endpoints.json",
+            max_concurrent=self.config.endpoint_max_concurrent,
+            max_attempts=self.config.endpoint_max_attempts
+        )
         
     async def connect(self) -> None:
         """Connect to NATS server."""
@@ -60,7 +89,7 @@ class MessageBusClient:
         
         # Convert message to bytes
         if isinstance(message, dict):
-            payload = json.dumps(message).encode()
+            payload = _dumps(message)
         elif isinstance(message, str):
             payload = message.encode()
         else:
@@ -75,21 +104,32 @@ class MessageBusClient:
         message: Union[Dict[str, Any], str, bytes],
         timeout: float = 10.0,
     ) -> Dict[str, Any]:
-        """Send a request and wait for a reply."""
+        """Send a request and wait for a reply.
+        
+        If the endpoint registry lists replicas for the subject, the
+        request goes to the least busy one and is retried on another
+        after a timeout; ``timeout`` then applies per attempt.
+        """
         if not self.nc:
             raise RuntimeError("Not connected to NATS")
         
         # Convert message to bytes
         if isinstance(message, dict):
-            payload = json.dumps(message).encode()
+            payload = _dumps(message)
         elif isinstance(message, str):
             payload = message.encode()
         else:
             payload = message
         
         try:
-            response = await self.nc.request(subject, payload, timeout=timeout)
-            return json.loads(response.data.decode())
+            if self.balancer.replicas(subject):
+                _, response = await self.balancer.dispatch(
+                    subject,
+                    lambda target: self.nc.request(target, payload, timeout=timeout)
+                )
+            else:
+                response = await self.nc.request(subject, payload, timeout=timeout)
+            return _loads(response.data)
         except asyncio.TimeoutError:
             logger.error("Request timeout", subject=subject, timeout=timeout)
             raise
@@ -109,7 +149,7 @@ class MessageBusClient:
         
         async def message_handler(msg):
             try:
-                data = json.loads(msg.data.decode())
+                data = _loads(msg.data)
                 await callback(data)
             except Exception as e:
                 logger.error(
@@ -125,17 +165,28 @@ class MessageBusClient:
     async def reply_handler(
         self,
         subject: str,
-        handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+        handler: Callable[[Any], Union[Dict[str, Any], bytes]],
+        raw: bool = False,
+        queue: Optional[str] = None,
     ) -> None:
-        """Register a request/reply handler."""
+        """Register a request/reply handler.
+        
+        Handlers may return pre-encoded JSON bytes, which are sent as-is.
+        With ``raw=True`` the handler receives the undecoded request bytes,
+        so it can parse them straight into its own typed model. Handlers
+        sharing a ``queue`` group split requests instead of each answering.
+        """
         if not self.nc:
             raise RuntimeError("Not connected to NATS")
         
         async def reply_callback(msg):
             try:
-                request_data = json.loads(msg.data.decode())
+                request_data = msg.data if raw else _loads(msg.data)
                 response_data = await handler(request_data)
-                response_payload = json.dumps(response_data).encode()
+                if isinstance(response_data, bytes):
+                    response_payload = response_data
+                else:
+                    response_payload = _dumps(response_data)
                 await msg.respond(response_payload)
             except Exception as e:
                 logger.error(
@@ -144,11 +195,11 @@ class MessageBusClient:
                     error=str(e)
                 )
                 error_response = {"error": str(e)}
-                await msg.respond(json.dumps(error_response).encode())
+                await msg.respond(_dumps(error_response))
         
-        sub = await self.nc.subscribe(subject, cb=reply_callback)
+        sub = await self.nc.subscribe(subject, queue=queue, cb=reply_callback)
         self._subscriptions[subject] = sub
-        logger.info("Registered reply handler", subject=subject)
+        logger.info("Registered reply handler", subject=subject, queue=queue)
     
     async def _error_callback(self, e: Exception) -> None:
         """Handle NATS errors."""
@@ -0,0 +1,106 @@
+"""Embedding-keyed cache of recent responses, shared by the services."""
+
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+
+# Rows allocated up front; the matrix doubles as entries are added
+_INITIAL_ROWS = 256
+
+
+class SemanticCache:
+    """LRU cache that matches queries by cosine similarity of their embeddings.
+    
+    Embeddings live in one float32 matrix so a lookup is a single BLAS
+    matrix-vector product over the filled rows (numpy has no fast float16
+    GEMV). The matrix grows by doubling up to ``max_entries``, after which
+    evicted rows are reused in place. Each entry also
+    carries a key of the parameters besides the embedded text (search
+    limit and filters, generation settings, ...), and only entries with an
+    identical key can satisfy a lookup.
+    
+    The dimensionality follows the embeddings actually stored: the matrix
+    is sized from the first insert when ``dim`` is not given, and an insert
+    of a different size (another embedder, a PCA projection) starts the
+    cache over. Lookups of a different size simply miss.
+    """
+    
+    def __init__(self, dim: Optional[int] = None, max_entries: int = 10000, threshold: float = 0.95):
+        """Initialize the cache."""
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # slot -> (key, value)
+        self.dim = dim
+        self._vectors: Optional[np.ndarray] = None
+        if dim is not None:
+            self.reset(dim)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        """Return the embedding as a unit-length float32 vector."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+    
+    def lookup(self, embedding: Sequence[float], key: Hashable):
+        """Return the cached value for a similar query with the same key, or None."""
+        query = self._normalize(embedding)
+        if not self._entries or query.shape[0] != self.dim:
+            self.misses += 1
+            return None
+        
+        # Slots are filled in order, so the first len(entries) rows are live
+        scores = self._vectors[:len(self._entries)] @ query
+        candidates = np.flatnonzero(scores >= self.threshold)
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            entry = self._entries.get(int(slot))
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(int(slot))
+                self.hits += 1
+                return entry[1]
+        
+        self.misses += 1
+        return None
+    
+    def insert(self, embedding: Sequence[float], key: Hashable, value) -> None:
+        """Cache a value, evicting the least recently used entry when full."""
+        vector = self._normalize(embedding)
+        if vector.shape[0] != self.dim:
+            self.reset(vector.shape[0])
+        if len(self._entries) < self.max_entries:
+            slot = len(self._entries)
+            if slot == len(self._vectors):
+                self._grow()
+        else:
+            slot, _ = self._entries.popitem(last=False)
+        self._vectors[slot] = vector
+        self._entries[slot] = (key, value)
+    
+    def _grow(self) -> None:
+        """Double the row capacity, up to ``max_entries``."""
+        rows = min(self.max_entries, len(self._vectors) * 2)
+        extra = np.zeros((rows - len(self._vectors), self.dim), dtype=np.float32)
+        self._vectors = np.concatenate([self._vectors, extra])
+    
+    def clear(self) -> None:
+        """Drop all cached entries (e.g. after the index changed)."""
+        self._entries.clear()
+    
+    def reset(self, dim: int) -> None:
+        """Drop all entries and switch to a new embedding dimensionality."""
+        self.dim = dim
+        self._vectors = np.zeros((min(self.max_entries, _INITIAL_ROWS), dim), dtype=np.float32)
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
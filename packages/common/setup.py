@@ -10,6 +10,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "nats-py>=2.7.0",
+        "numpy>=1.24.0",
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
         "structlog>=24.1.0",
@@ -1,7 +1,9 @@
 """Audio service main entry point."""
 
 import asyncio
+import functools
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import structlog
 from fastapi import FastAPI, HTTPException, File, UploadFile
@@ -45,6 +47,12 @@ class AudioService:
         self.tts_backend = TTSBackend(self.config)
         self.vad_backend = VADBackend(self.config) if self.config.vad_enabled else None
         
+        # Inference is blocking, so it runs off the event loop. STT and TTS
+        # each get one thread that owns the model, which serializes loads,
+        # calls and unloads; VAD locks internally and uses the default pool.
+        self._stt_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-stt")
+        self._tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-tts")
+        
         self.app = FastAPI(
             title="Neuralux Audio Service",
             version="0.1.0",
@@ -75,6 +83,21 @@ class AudioService:
         
         logger.info("Audio service started successfully")
     
+    async def _run_stt(self, func, *args, **kwargs):
+        """Run a blocking STT model call on the STT thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._stt_executor, functools.partial(func, *args, **kwargs))
+    
+    async def _run_tts(self, func, *args, **kwargs):
+        """Run a blocking TTS model call on the TTS thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._tts_executor, functools.partial(func, *args, **kwargs))
+    
+    async def _run_vad(self, func, *args, **kwargs):
+        """Run a blocking VAD call on the default thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
     async def _unload_inactive_models(self):
         """Background task to unload inactive models."""
         while True:
@@ -84,17 +107,14 @@ class AudioService:
                 # Check and unload STT model
                 if self.stt_backend.should_unload():
                     logger.info("Unloading inactive STT model")
-                    self.stt_backend.unload_model()
+                    await self._run_stt(self.stt_backend.unload_model)
                 
                 # Check and unload TTS model
                 if self.tts_backend.should_unload():
                     logger.info("Unloading inactive TTS model")
-                    self.tts_backend.unload_model()
+                    await self._run_tts(self.tts_backend.unload_model)
                 
-                # Check and unload VAD model
-                if self.vad_backend and self.vad_backend.should_unload():
-                    logger.info("Unloading inactive VAD model")
-                    self.vad_backend.unload_model()
+                # VAD unloads itself via its own idle timer
                     
             except asyncio.CancelledError:
                 break
@@ -105,11 +125,13 @@ class AudioService:
         """Shutdown the audio service."""
         logger.info("Shutting down audio service")
         # Unload all models
-        self.stt_backend.unload_model()
-        self.tts_backend.unload_model()
+        await self._run_stt(self.stt_backend.unload_model)
+        await self._run_tts(self.tts_backend.unload_model)
         if self.vad_backend:
             self.vad_backend.unload_model()
         await self.disconnect_from_message_bus()
+        self._stt_executor.shutdown(wait=False)
+        self._tts_executor.shutdown(wait=False)
         logger.info("Audio service stopped")
     
     async def connect_to_message_bus(self):
@@ -122,7 +144,8 @@ class AudioService:
         async def _stt_handler(data: dict) -> dict:
             try:
                 request = STTRequest(**data)
-                result = self.stt_backend.transcribe(
+                result = await self._run_stt(
+                    self.stt_backend.transcribe,
                     audio_path=request.audio_path,
                     audio_data=request.audio_data,
                     language=request.language,
@@ -140,7 +163,8 @@ class AudioService:
         async def _tts_handler(data: dict) -> dict:
             try:
                 request = TTSRequest(**data)
-                result = self.tts_backend.synthesize(
+                result = await self._run_tts(
+                    self.tts_backend.synthesize,
                     text=request.text,
                     voice=request.voice,
                     speed=request.speed,
@@ -158,7 +182,8 @@ class AudioService:
                 return {"error": "VAD is disabled"}
             try:
                 request = VADRequest(**data)
-                result = self.vad_backend.detect(
+                result = await self._run_vad(
+                    self.vad_backend.detect,
                     audio_path=request.audio_path,
                     audio_data=request.audio_data,
                     threshold=request.threshold
@@ -224,8 +249,8 @@ class AudioService:
                     pass
                 self.config.stt_model = name
                 # Reload backend
-                self.stt_backend.unload_model()
-                self.stt_backend.load_model()
+                await self._run_stt(self.stt_backend.unload_model)
+                await self._run_stt(self.stt_backend.load_model)
                 try:
                     await self.message_bus.publish("ai.audio.reload.events", {"event": "done", "kind": "stt", "model": name})
                 except Exception:
@@ -242,7 +267,8 @@ class AudioService:
         async def speech_to_text(request: STTRequest) -> STTResponse:
             """Convert speech to text."""
             try:
-                result = self.stt_backend.transcribe(
+                result = await self._run_stt(
+                    self.stt_backend.transcribe,
                     audio_path=request.audio_path,
                     audio_data=request.audio_data,
                     language=request.language,
@@ -271,7 +297,8 @@ class AudioService:
                     f.write(content)
                     temp_path = f.name
                 
-                result = self.stt_backend.transcribe(
+                result = await self._run_stt(
+                    self.stt_backend.transcribe,
                     audio_path=temp_path,
                     language=language,
                     vad_filter=vad_filter
@@ -289,7 +316,8 @@ class AudioService:
         async def text_to_speech(request: TTSRequest) -> TTSResponse:
             """Convert text to speech."""
             try:
-                result = self.tts_backend.synthesize(
+                result = await self._run_tts(
+                    self.tts_backend.synthesize,
                     text=request.text,
                     voice=request.voice,
                     speed=request.speed,
@@ -305,7 +333,8 @@ class AudioService:
         async def text_to_speech_audio(request: TTSRequest):
             """Convert text to speech and return audio file."""
             try:
-                result = self.tts_backend.synthesize(
+                result = await self._run_tts(
+                    self.tts_backend.synthesize,
                     text=request.text,
                     voice=request.voice,
                     speed=request.speed,
@@ -335,7 +364,8 @@ class AudioService:
                 raise HTTPException(status_code=501, detail="VAD is disabled")
             
             try:
-                result = self.vad_backend.detect(
+                result = await self._run_vad(
+                    self.vad_backend.detect,
                     audio_path=request.audio_path,
                     audio_data=request.audio_data,
                     threshold=request.threshold
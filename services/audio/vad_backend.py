@@ -1,6 +1,7 @@
 """Voice Activity Detection backend using Silero VAD."""
 
 import base64
+import threading
 import time
 import torch
 import torchaudio
@@ -25,6 +26,8 @@ class VADBackend:
         self.utils = None
         self._last_used: float = 0.0  # Track last usage time
         self._unload_timeout: int = 300  # Unload after 5 minutes of inactivity
+        self._unload_timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()  # Serializes detection and timed unload
         
     def load_model(self) -> None:
         """Load the Silero VAD model."""
@@ -62,9 +65,22 @@ class VADBackend:
         Returns:
             Dictionary with detection results
         """
+        with self._lock:
+            try:
+                return self._detect(audio_path, audio_data, threshold)
+            finally:
+                self._last_used = time.time()
+                self._arm_unload_timer()
+    
+    def _detect(
+        self,
+        audio_path: Optional[str],
+        audio_data: Optional[str],
+        threshold: Optional[float]
+    ) -> dict:
+        """Run detection; caller must hold the backend lock."""
         if self.model is None:
             self.load_model()
-        self._last_used = time.time()
         
         try:
             # Handle audio input
@@ -156,8 +172,34 @@ class VADBackend:
         """Check if model is loaded."""
         return self.model is not None
     
+    def _arm_unload_timer(self) -> None:
+        """(Re)start the one-shot timer that unloads the model after inactivity."""
+        if self._unload_timer is not None:
+            self._unload_timer.cancel()
+        if self.model is None:
+            self._unload_timer = None
+            return
+        self._unload_timer = threading.Timer(self._unload_timeout, self._maybe_unload)
+        self._unload_timer.daemon = True
+        self._unload_timer.start()
+    
+    def _maybe_unload(self) -> None:
+        """Timer callback: unload the model if it is still idle."""
+        with self._lock:
+            # A detection may have re-armed a newer timer while this one waited
+            if threading.current_thread() is not self._unload_timer:
+                return
+            self._unload_timer = None
+            if self.model is not None:
+                logger.info("Unloading inactive VAD model")
+                self.unload_model()
+    
     def should_unload(self) -> bool:
-        """Check if model should be unloaded due to inactivity."""
+        """Check if model should be unloaded due to inactivity.
+        
+        Unloading is driven by an internal timer armed on each detection;
+        this is kept for callers that still poll.
+        """
         if self.model is None:
             return False
         if self._last_used == 0.0:
@@ -167,6 +209,9 @@ class VADBackend:
     
     def unload_model(self) -> None:
         """Unload the current model."""
+        if self._unload_timer is not None:
+            self._unload_timer.cancel()
+            self._unload_timer = None
         if self.model:
             logger.info("Unloading VAD model")
             del self.model
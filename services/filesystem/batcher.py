@@ -0,0 +1,40 @@
+"""Micro-batching coalescer for query embeddings."""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import List, Optional
+
+from neuralux.batching import MicroBatcher
+
+
+class EmbeddingBatcher(MicroBatcher[str, List[float]]):
+    """Coalesces concurrent single-text embeds into batched encode calls.
+    
+    Up to ``max_batch`` texts arriving within ``max_delay_ms`` of each other
+    are encoded in a single call on the executor.
+    """
+    
+    def __init__(
+        self,
+        embedder,
+        executor: Optional[Executor] = None,
+        max_batch: int = 32,
+        max_delay_ms: float = 8.0
+    ):
+        """Initialize the batcher."""
+        super().__init__(self._encode_batch, max_batch, max_delay_ms)
+        self.embedder = embedder
+        self.executor = executor
+    
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single text, sharing an encode call with concurrent requests."""
+        return await self.submit(text)
+    
+    async def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts in one forward pass on the executor."""
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(
+            self.executor,
+            lambda: self.embedder.encode(texts, batch_size=len(texts))
+        )
+        return [embedding.tolist() for embedding in embeddings]
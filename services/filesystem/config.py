@@ -57,9 +57,38 @@ class FileSystemServiceConfig(BaseSettings):
     max_file_size_mb: int = 10
     chunk_size: int = 1000  # Characters per chunk
     chunk_overlap: int = 200  # Overlap between chunks
+    embed_workers: int = 2  # Threads for embedding off the event loop
+    index_workers: int = 16  # Concurrent file readers while indexing a directory
+    index_embed_batch_size: int = 64  # Chunks (across files) per encode call
+    upsert_batch_size: int = 256  # Points per non-blocking Qdrant upsert
+    embed_batch_size: int = 32  # Max concurrent queries coalesced into one encode call
+    embed_batch_delay_ms: float = 8.0  # How long to wait for more queries to batch
+    
+    # Embeddings
+    embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_backend: str = "onnx"  # onnx (int8 quantized), fastembed or sentence-transformers
+    embedding_device: str = "auto"  # auto (CUDA fp16 if available), cuda or cpu
+    embedding_gpu_batch_size: int = 256
+    embedding_cache_enabled: bool = True  # Reuse chunk embeddings across re-indexes
+    embedding_cache_warm_size: int = 5000  # Recent vectors preloaded into memory at startup
+    
+    # Similar-file search
+    similar_max_chunks: int = 32  # Chunks of the source file used as queries
+    
+    # Search result cache (0 disables)
+    search_cache_size: int = 10000
+    search_cache_threshold: float = 0.95  # Cosine similarity for a cache hit
     
     # Qdrant collection
     collection_name: str = "neuralux_files"
+    embedding_dim: int = 384  # all-MiniLM-L6-v2 embedding size
+    qdrant_int8_quantization: bool = True  # Scalar-quantize vectors of new collections
+    qdrant_prefer_grpc: bool = True  # Binary protobuf transport instead of JSON over HTTP
+    qdrant_max_concurrency: int = 64  # In-flight search calls per process
+    
+    # PCA reduction (fitted on demand via POST /index/reduce)
+    projection_components: int = 128
+    projection_sample_size: int = 50000
     
     # Message bus subjects
     fs_search_subject: str = "system.file.search"
@@ -0,0 +1,250 @@
+"""Embedding model backends for the filesystem service."""
+
+import os
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+import structlog
+
+from config import FileSystemServiceConfig
+from projection import ProjectedEmbedder
+
+logger = structlog.get_logger(__name__)
+
+
+def _hub_model_id(model_name: str) -> str:
+    """Return the Hugging Face repo id for a sentence-transformers model name."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+class OnnxEmbedder:
+    """Sentence embedder running an int8 dynamically-quantized ONNX graph.
+    
+    Mirrors ``SentenceTransformer.encode`` for the calls the service makes:
+    a single string yields a 1-D vector, a list yields a 2-D array. Outputs
+    are mean-pooled and L2-normalized like all-MiniLM-L6-v2.
+    """
+    
+    def __init__(self, model_name: str, cache_dir: Path):
+        """Export and quantize the model on first use, then load the session."""
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        model_dir = cache_dir / "onnx" / f"{model_name.replace('/', '--')}-int8"
+        model_file = model_dir / "model_quantized.onnx"
+        if not model_file.exists():
+            self._export(_hub_model_id(model_name), model_dir)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+    
+    @staticmethod
+    def _export(model_id: str, model_dir: Path) -> None:
+        """Export the model to ONNX and apply int8 dynamic quantization."""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        
+        logger.info("Exporting embedding model to ONNX", model=model_id)
+        export_dir = model_dir.parent / f"{model_dir.name}-fp32"
+        model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+        model.save_pretrained(export_dir)
+        
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(model_dir)
+        logger.info("Quantized ONNX embedding model saved", path=str(model_dir))
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one forward pass and return normalized sentence embeddings."""
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=256,
+            return_tensors="np"
+        )
+        inputs = {name: tokens[name].astype(np.int64) for name in self._input_names if name in tokens}
+        if "token_type_ids" in self._input_names and "token_type_ids" not in inputs:
+            inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+        
+        hidden = self.session.run(None, inputs)[0]
+        
+        # Mean pooling over non-padding tokens
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        **kwargs
+    ) -> np.ndarray:
+        """Embed one sentence or a list of sentences."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        batches = [
+            self._encode_batch(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class FastEmbedder:
+    """Adapter exposing a ``SentenceTransformer``-style ``encode`` over fastembed.
+    
+    fastembed ships pre-quantized ONNX weights and runs them through
+    onnxruntime's AVX2/AVX-512 kernels, without a PyTorch install.
+    """
+    
+    def __init__(self, model_name: str, cache_dir: Path):
+        """Load the fastembed model (downloaded on first use)."""
+        from fastembed import TextEmbedding
+        
+        self.model = TextEmbedding(
+            model_name=_hub_model_id(model_name),
+            cache_dir=str(cache_dir / "fastembed"),
+            threads=max(1, (os.cpu_count() or 2) // 2)
+        )
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 64,
+        **kwargs
+    ) -> np.ndarray:
+        """Embed one sentence or a list of sentences."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.asarray(
+            list(self.model.embed(texts, batch_size=batch_size)),
+            dtype=np.float32
+        )
+        return embeddings[0] if single else embeddings
+
+
+class CudaEmbedder:
+    """sentence-transformers model running in fp16 on a CUDA device.
+    
+    Batches are encoded under ``torch.inference_mode``; on CUDA OOM the
+    batch size is halved and the call retried.
+    """
+    
+    def __init__(self, model_name: str, batch_size: int = 256):
+        """Load the model onto the GPU in half precision."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        self._torch = torch
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cuda")
+        self.model.half()
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 64,
+        **kwargs
+    ) -> np.ndarray:
+        """Embed one sentence or a list of sentences on the GPU."""
+        torch = self._torch
+        batch_size = self.batch_size
+        while True:
+            try:
+                with torch.inference_mode():
+                    embeddings = self.model.encode(
+                        sentences,
+                        batch_size=batch_size,
+                        convert_to_numpy=True,
+                        show_progress_bar=False
+                    )
+                return embeddings.astype(np.float32)
+            except torch.cuda.OutOfMemoryError:
+                torch.cuda.empty_cache()
+                if batch_size == 1:
+                    raise
+                batch_size = max(1, batch_size // 2)
+                self.batch_size = batch_size
+                logger.warning("CUDA OOM while embedding, reducing batch size", batch_size=batch_size)
+
+
+def _cuda_available() -> bool:
+    """Check for a usable CUDA device without requiring torch."""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+_BACKENDS = {
+    "onnx": (OnnxEmbedder, "int8 ONNX"),
+    "fastembed": (FastEmbedder, "fastembed"),
+}
+
+
+def load_embedder(config: FileSystemServiceConfig, cache_dir: Path):
+    """Load and warm up the configured embedding backend.
+    
+    A CUDA device (``embedding_device`` "auto" or "cuda") takes precedence
+    over the CPU backends. Falls back to sentence-transformers when the
+    optional runtime for the requested backend is not installed.
+    """
+    embedder = None
+    device = config.embedding_device
+    if device == "cuda" or (device == "auto" and _cuda_available()):
+        embedder = CudaEmbedder(config.embedding_model, config.embedding_gpu_batch_size)
+        logger.info("Using CUDA fp16 embedding backend", model=config.embedding_model)
+    
+    backend = _BACKENDS.get(config.embedding_backend)
+    if embedder is None and backend is not None:
+        backend_cls, label = backend
+        try:
+            embedder = backend_cls(config.embedding_model, cache_dir)
+            logger.info(f"Using {label} embedding backend", model=config.embedding_model)
+        except ImportError as e:
+            logger.warning(
+                f"{label} embedding backend unavailable, falling back to sentence-transformers",
+                error=str(e)
+            )
+    
+    if embedder is None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+        embedder = SentenceTransformer(config.embedding_model)
+    
+    # Pay graph optimization / lazy init cost before the first request
+    embedder.encode("warmup")
+    return embedder
+
+
+def embedder_id(config: FileSystemServiceConfig, embedder) -> str:
+    """Identify model + runtime, so cached vectors from different backends never mix."""
+    if isinstance(embedder, ProjectedEmbedder):
+        base_id = embedder_id(config, embedder.base)
+        if embedder.projection is None:
+            return base_id
+        return f"{base_id}:{embedder.projection.id}"
+    if isinstance(embedder, OnnxEmbedder):
+        return f"{config.embedding_model}:onnx-int8"
+    if isinstance(embedder, FastEmbedder):
+        return f"{config.embedding_model}:fastembed"
+    if isinstance(embedder, CudaEmbedder):
+        return f"{config.embedding_model}:cuda-fp16"
+    return config.embedding_model
@@ -0,0 +1,243 @@
+"""Persistent content-hash -> embedding cache for indexing."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:  # Optional SIMD hash; stdlib blake2b otherwise
+    _blake3 = None
+
+logger = structlog.get_logger(__name__)
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+
+def _digest16(data: bytes) -> bytes:
+    """Return a 16-byte digest, using blake3 when it is installed (cache keys only)."""
+    if _blake3 is not None:
+        return _blake3(data).digest()[:16]
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def content_hash(text: str) -> bytes:
+    """Return a 16-byte digest identifying a chunk's text."""
+    return _digest16(text.encode("utf-8"))
+
+
+def chunk_point_id(file_path: str, chunk_index: int) -> str:
+    """Return a Qdrant point ID that is stable across processes and re-indexes.
+    
+    Always blake2b, never blake3: IDs must not depend on which optional
+    packages a host has installed, or re-indexing there would add
+    duplicate points instead of overwriting.
+    """
+    key = f"{file_path}\0{chunk_index}".encode("utf-8")
+    return str(uuid.UUID(bytes=hashlib.blake2b(key, digest_size=16).digest()))
+
+
+class EmbeddingCache:
+    """SQLite-backed cache of chunk embeddings keyed by (content hash, model).
+    
+    Re-indexing unchanged files then only costs a hash and a lookup instead
+    of a model forward pass. Recently used vectors are also held in an
+    in-memory LRU, packed as float16 rows of a single matrix, which ``warm``
+    pre-fills at startup from the rows with the latest ``last_access``.
+    Search queries are cached in that tier only (``put_hot``), so one-off
+    queries never grow the database. Safe to share between executor threads.
+    """
+    
+    def __init__(self, db_path: Path, model_name: str, hot_size: int = 5000):
+        """Open (or create) the cache database.
+        
+        Args:
+            db_path: SQLite database file
+            model_name: Embedder identifier the cached vectors belong to
+            hot_size: Number of recently used vectors kept in memory
+        """
+        self.db_path = db_path
+        self.hot_size = hot_size
+        self._model_name = model_name
+        self._lock = threading.Lock()
+        # In-memory tier: float16 rows of one matrix, digest -> row in LRU order
+        self._hot_slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self._hot_vectors: Optional[np.ndarray] = None
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                hash BLOB NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (hash, model)
+            ) WITHOUT ROWID
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_access" not in columns:
+            self._conn.execute(
+                "ALTER TABLE embeddings ADD COLUMN last_access REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_recent ON embeddings (model, last_access)"
+        )
+        self._conn.commit()
+        logger.info("Embedding cache opened", path=str(db_path), model=model_name)
+    
+    @property
+    def model_name(self) -> str:
+        """Embedder identifier the cached vectors belong to."""
+        return self._model_name
+    
+    @model_name.setter
+    def model_name(self, value: str) -> None:
+        """Switch models; in-memory vectors of the previous model are dropped."""
+        with self._lock:
+            self._model_name = value
+            self._hot_slots.clear()
+            self._hot_vectors = None
+    
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        """Keep a vector in the in-memory LRU (caller holds the lock)."""
+        if self.hot_size <= 0:
+            return
+        if self._hot_vectors is None:
+            self._hot_vectors = np.zeros((self.hot_size, vector.shape[-1]), dtype=np.float16)
+        elif vector.shape[-1] != self._hot_vectors.shape[1]:
+            return
+        
+        slot = self._hot_slots.get(digest)
+        if slot is not None:
+            self._hot_slots.move_to_end(digest)
+        elif len(self._hot_slots) < self.hot_size:
+            slot = len(self._hot_slots)
+        else:
+            _, slot = self._hot_slots.popitem(last=False)
+        self._hot_vectors[slot] = vector
+        self._hot_slots[digest] = slot
+    
+    def _recall(self, digest: bytes) -> Optional[np.ndarray]:
+        """Return an in-memory vector as float32 (caller holds the lock)."""
+        slot = self._hot_slots.get(digest)
+        if slot is None:
+            return None
+        self._hot_slots.move_to_end(digest)
+        return self._hot_vectors[slot].astype(np.float32)
+    
+    def get_hot(self, digest: bytes) -> Optional[np.ndarray]:
+        """Return a vector from memory only, never touching SQLite."""
+        with self._lock:
+            return self._recall(digest)
+    
+    def put_hot(self, digest: bytes, vector: np.ndarray) -> None:
+        """Cache a vector in memory only; it is never written to SQLite."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(digest, vector)
+    
+    def warm(self, top_k: Optional[int] = None) -> int:
+        """Load the most recently used vectors of the current model into memory."""
+        top_k = self.hot_size if top_k is None else min(top_k, self.hot_size)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, vector FROM embeddings WHERE model = ? "
+                "ORDER BY last_access DESC LIMIT ?",
+                (self._model_name, top_k)
+            ).fetchall()
+            # Oldest first, so the most recent end up at the LRU's hot end
+            for digest, blob in reversed(rows):
+                if digest not in self._hot_slots:
+                    self._remember(digest, np.frombuffer(blob, dtype=np.float32))
+        logger.info("Embedding cache warmed", vectors=len(rows))
+        return len(rows)
+    
+    def batch_lookup(self, hashes: Iterable[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return cached vectors for the given hashes (missing ones are omitted)."""
+        found: Dict[bytes, np.ndarray] = {}
+        cold: List[bytes] = []
+        now = time.time()
+        with self._lock:
+            for digest in hashes:
+                vector = self._recall(digest)
+                if vector is not None:
+                    found[digest] = vector
+                else:
+                    cold.append(digest)
+            
+            for i in range(0, len(cold), _LOOKUP_BATCH):
+                batch = cold[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings "
+                    f"WHERE model = ? AND hash IN ({placeholders})",
+                    [self._model_name, *batch]
+                ).fetchall()
+                for digest, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[digest] = vector
+                    self._remember(digest, vector)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? "
+                        f"WHERE model = ? AND hash IN ({placeholders})",
+                        [now, self._model_name, *batch]
+                    )
+            if cold:
+                self._conn.commit()
+        return found
+    
+    def batch_upsert(self, items: Iterable[Tuple[bytes, np.ndarray]]) -> None:
+        """Store vectors for the given hashes."""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for digest, vector in items:
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(digest, vector)
+                rows.append((digest, self._model_name, vector.tobytes(), now))
+            if not rows:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, model, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+    
+    def encode(self, embedder, texts: List[str]) -> np.ndarray:
+        """Embed texts, only running the model for ones not already cached."""
+        hashes = [content_hash(text) for text in texts]
+        cached = self.batch_lookup(set(hashes))
+        
+        # First occurrence of each uncached hash (files often repeat chunks)
+        missing: Dict[bytes, int] = {}
+        for i, digest in enumerate(hashes):
+            if digest not in cached and digest not in missing:
+                missing[digest] = i
+        
+        if missing:
+            fresh = embedder.encode([texts[i] for i in missing.values()], batch_size=64)
+            self.batch_upsert(zip(missing, fresh))
+            for digest, vector in zip(missing, fresh):
+                cached[digest] = np.asarray(vector, dtype=np.float32)
+        
+        logger.debug("Embedded chunks", total=len(texts), computed=len(missing))
+        return np.stack([cached[digest] for digest in hashes])
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
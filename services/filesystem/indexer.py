@@ -1,58 +1,177 @@
 """File content indexer."""
 
+import asyncio
+import io
 import os
 import mimetypes
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import Executor
 from typing import List, Optional, Generator
 import fnmatch
 
+import numpy as np
 import structlog
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+)
 
 from config import FileSystemServiceConfig
+from embedding_cache import EmbeddingCache, chunk_point_id
 from models import FileMetadata, FileChunk
+from projection import PCAProjection
 
 logger = structlog.get_logger(__name__)
 
 
+@lru_cache(maxsize=256)
+def _mime_for_ext(ext: str) -> Optional[str]:
+    """Return the MIME type for a lowercase file extension."""
+    return mimetypes.types_map.get(ext) or mimetypes.guess_type("x" + ext)[0]
+
+
 class FileIndexer:
     """Indexes files and their content."""
     
     def __init__(
         self,
         config: FileSystemServiceConfig,
-        qdrant_client: QdrantClient,
-        embedder
+        qdrant_client: AsyncQdrantClient,
+        embedder,
+        executor: Optional[Executor] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        read_executor: Optional[Executor] = None
     ):
-        """Initialize the file indexer."""
+        """Initialize the file indexer.
+        
+        Args:
+            config: Filesystem service configuration
+            qdrant_client: Async Qdrant client
+            embedder: Model exposing a blocking ``encode`` method
+            executor: Pool used for text extraction and embedding, so the
+                event loop is never blocked (default loop executor if None)
+            embedding_cache: Optional content-hash cache of chunk embeddings
+            read_executor: Pool for directory walks and file reads (defaults
+                to ``executor``)
+        """
         self.config = config
         self.qdrant = qdrant_client
         self.embedder = embedder
-        self._ensure_collection()
+        self.executor = executor
+        self.embedding_cache = embedding_cache
+        self.read_executor = read_executor or executor
     
-    def _ensure_collection(self):
+    async def ensure_collection(self):
         """Ensure the Qdrant collection exists."""
         try:
-            self.qdrant.get_collection(self.config.collection_name)
+            await self.qdrant.get_collection(self.config.collection_name)
             logger.info("Collection exists", collection=self.config.collection_name)
         except:
             # Create collection if it doesn't exist
-            self.qdrant.create_collection(
-                collection_name=self.config.collection_name,
-                vectors_config=VectorParams(
-                    size=384,  # all-MiniLM-L6-v2 embedding size
-                    distance=Distance.COSINE
-                )
+            await self._create_collection(self.config.collection_name, self.config.embedding_dim)
+    
+    async def _create_collection(self, name: str, dim: int):
+        """Create a cosine collection, int8-quantized if configured."""
+        quantization = None
+        if self.config.qdrant_int8_quantization:
+            quantization = ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
             )
-            logger.info("Created collection", collection=self.config.collection_name)
+        await self.qdrant.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            quantization_config=quantization
+        )
+        logger.info("Created collection", collection=name, dim=dim)
+    
+    async def build_projected_collection(
+        self,
+        n_components: int,
+        sample_size: int
+    ) -> tuple[PCAProjection, str, int]:
+        """Fit PCA on stored vectors and copy the collection in reduced form.
+        
+        Reads raw vectors from the current collection, fits a projection on
+        up to ``sample_size`` of them, then writes every point, projected,
+        into a new ``<collection>_pca<n>`` collection (recreated if present).
+        Returns: (projection, new_collection_name, points_copied)
+        """
+        source = self.config.collection_name
+        page_size = self.config.upsert_batch_size
+        
+        # Sample raw vectors
+        sample = []
+        offset = None
+        while len(sample) < sample_size:
+            points, offset = await self.qdrant.scroll(
+                collection_name=source,
+                limit=min(page_size, sample_size - len(sample)),
+                offset=offset,
+                with_vectors=True,
+                with_payload=False
+            )
+            sample.extend(point.vector for point in points)
+            if offset is None:
+                break
+        
+        loop = asyncio.get_running_loop()
+        projection = await loop.run_in_executor(
+            self.executor, PCAProjection.fit, np.asarray(sample, dtype=np.float32), n_components
+        )
+        logger.info(
+            "Fitted embedding projection",
+            dim=projection.dim,
+            samples=len(sample),
+            explained_variance=projection.explained_variance
+        )
+        
+        target = f"{source}_pca{projection.dim}"
+        if await self.qdrant.collection_exists(target):
+            await self.qdrant.delete_collection(target)
+        await self._create_collection(target, projection.dim)
+        
+        # Copy every point with its vector projected
+        copied = 0
+        offset = None
+        while True:
+            points, offset = await self.qdrant.scroll(
+                collection_name=source,
+                limit=page_size,
+                offset=offset,
+                with_vectors=True,
+                with_payload=True
+            )
+            if points:
+                reduced = projection.transform(np.asarray([p.vector for p in points]))
+                await self.qdrant.upsert(
+                    collection_name=target,
+                    points=[
+                        PointStruct(id=p.id, vector=vector.tolist(), payload=p.payload)
+                        for p, vector in zip(points, reduced)
+                    ],
+                    wait=offset is None
+                )
+                copied += len(points)
+            if offset is None:
+                break
+        
+        logger.info("Projected collection built", collection=target, points=copied)
+        return projection, target, copied
     
-    def should_index_file(self, file_path: Path) -> bool:
+    def should_index_file(
+        self,
+        file_path: Path,
+        stat: Optional[os.stat_result] = None
+    ) -> bool:
         """Check if a file should be indexed."""
         # Check size
         try:
-            size_mb = file_path.stat().st_size / (1024 * 1024)
+            if stat is None:
+                stat = file_path.stat()
+            size_mb = stat.st_size / (1024 * 1024)
             if size_mb > self.config.max_file_size_mb:
                 return False
         except:
@@ -141,21 +260,33 @@ class FileIndexer:
                     logger.warning("odfpy not installed, skipping ODS", file=str(file_path))
                     return None
             
-            # XLSX/XLS files (Excel)
-            elif ext in ['.xlsx', '.xls']:
+            # XLSX files (Excel)
+            elif ext == '.xlsx':
+                return self._extract_xlsx(file_path)
+            
+            # XLS files (legacy Excel)
+            elif ext == '.xls':
                 try:
-                    from openpyxl import load_workbook
-                    wb = load_workbook(file_path, read_only=True, data_only=True)
-                    text_parts = []
-                    for sheet in wb.worksheets:
-                        text_parts.append(f"Sheet: {sheet.title}")
-                        for row in sheet.iter_rows(values_only=True):
-                            row_data = [str(cell) for cell in row if cell is not None]
-                            if row_data:
-                                text_parts.append('\t'.join(row_data))
-                    return '\n'.join(text_parts)
+                    import xlrd
+                    wb = xlrd.open_workbook(str(file_path), on_demand=True)
+                    try:
+                        text_parts = []
+                        for sheet_index in range(wb.nsheets):
+                            sheet = wb.sheet_by_index(sheet_index)
+                            text_parts.append(f"Sheet: {sheet.name}")
+                            for row_index in range(sheet.nrows):
+                                row_text = '\t'.join(
+                                    str(value) for value in sheet.row_values(row_index)
+                                    if value not in (None, '')
+                                )
+                                if row_text:
+                                    text_parts.append(row_text)
+                            wb.unload_sheet(sheet_index)
+                        return '\n'.join(text_parts)
+                    finally:
+                        wb.release_resources()
                 except ImportError:
-                    logger.warning("openpyxl not installed, skipping Excel", file=str(file_path))
+                    logger.warning("xlrd not installed, skipping Excel", file=str(file_path))
                     return None
             
             # CSV files
@@ -178,7 +309,48 @@ class FileIndexer:
             logger.error("Error extracting text", file=str(file_path), error=str(e))
             return None
     
-    def chunk_text(self, text: str, file_path: Path) -> Generator[FileChunk, None, None]:
+    def _extract_xlsx(self, file_path: Path) -> Optional[str]:
+        """Extract text from an XLSX workbook without building a cell tree."""
+        try:
+            from xlsx2csv import Xlsx2csv
+            buf = io.StringIO()
+            Xlsx2csv(
+                str(file_path),
+                outputencoding="utf-8",
+                delimiter="\t",
+                skip_empty_lines=True,
+            ).convert(buf, sheetid=0)
+            return buf.getvalue()
+        except ImportError:
+            pass
+        
+        # Fallback: openpyxl read-only mode, streaming row text directly
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            logger.warning("xlsx2csv/openpyxl not installed, skipping Excel", file=str(file_path))
+            return None
+        
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            text_parts = []
+            for sheet in wb.worksheets:
+                text_parts.append(f"Sheet: {sheet.title}")
+                for row in sheet.iter_rows(values_only=True):
+                    row_text = '\t'.join(str(cell) for cell in row if cell is not None)
+                    if row_text:
+                        text_parts.append(row_text)
+            return '\n'.join(text_parts)
+        finally:
+            # Read-only workbooks keep the archive open until closed
+            wb.close()
+    
+    def chunk_text(
+        self,
+        text: str,
+        file_path: Path,
+        stat: Optional[os.stat_result] = None
+    ) -> Generator[FileChunk, None, None]:
         """Split text into overlapping chunks."""
         if not text:
             return
@@ -187,7 +359,8 @@ class FileIndexer:
         overlap = self.config.chunk_overlap
         
         # Get file metadata
-        stat = file_path.stat()
+        if stat is None:
+            stat = file_path.stat()
         metadata = FileMetadata(
             path=str(file_path),
             filename=file_path.name,
@@ -195,7 +368,7 @@ class FileIndexer:
             size_bytes=stat.st_size,
             modified_time=datetime.fromtimestamp(stat.st_mtime),
             created_time=datetime.fromtimestamp(stat.st_ctime),
-            mime_type=mimetypes.guess_type(str(file_path))[0]
+            mime_type=_mime_for_ext(file_path.suffix.lower())
         )
         
         # Create chunks
@@ -219,83 +392,229 @@ class FileIndexer:
             
             start += chunk_size - overlap
     
-    def index_file(self, file_path: Path) -> int:
+    def _embed_chunks(self, texts: List[str]):
+        """Embed chunk texts, reusing cached vectors for unchanged content."""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(self.embedder, texts)
+        return self.embedder.encode(texts, batch_size=64)
+    
+    def _build_points(self, chunks: List[FileChunk], embeddings) -> List[PointStruct]:
+        """Create Qdrant points for chunks and their embeddings."""
+        points = []
+        base_payloads = {}
+        
+        for chunk, embedding in zip(chunks, embeddings):
+            # File-level fields are shared by every chunk; build them once per file
+            base_payload = base_payloads.get(chunk.file_path)
+            if base_payload is None:
+                metadata = chunk.metadata
+                base_payload = base_payloads[chunk.file_path] = {
+                    "file_path": chunk.file_path,
+                    "filename": metadata.filename,
+                    "extension": metadata.extension,
+                    "size_bytes": metadata.size_bytes,
+                    "modified_time": metadata.modified_time.isoformat(),
+                    "mime_type": metadata.mime_type,
+                }
+            
+            payload = base_payload.copy()
+            payload["chunk_index"] = chunk.chunk_index
+            payload["content"] = chunk.content
+            
+            points.append(PointStruct(
+                id=chunk_point_id(chunk.file_path, chunk.chunk_index),
+                vector=embedding.tolist(),
+                payload=payload
+            ))
+        
+        return points
+    
+    async def _embed_to_points(self, chunks: List[FileChunk]) -> List[PointStruct]:
+        """Embed a batch of chunks (possibly from several files) into points."""
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(
+            self.executor,
+            self._embed_chunks,
+            [chunk.content for chunk in chunks]
+        )
+        return self._build_points(chunks, embeddings)
+    
+    async def _upsert(self, points: List[PointStruct], wait: bool = True) -> None:
+        """Upload points to Qdrant.
+        
+        With ``wait=False`` Qdrant acknowledges once the batch is queued
+        rather than applied; a later ``wait=True`` upsert acts as a barrier
+        since updates to a collection are applied in order.
+        """
+        await self.qdrant.upsert(
+            collection_name=self.config.collection_name,
+            points=points,
+            wait=wait
+        )
+    
+    async def index_file(self, file_path: Path) -> int:
         """Index a single file and return number of chunks created."""
-        if not self.should_index_file(file_path):
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return 0
+        
+        if not self.should_index_file(file_path, stat):
             return 0
         
         logger.debug("Indexing file", file=str(file_path))
+        loop = asyncio.get_running_loop()
         
         # Extract text
-        text = self.extract_text(file_path)
+        text = await loop.run_in_executor(self.read_executor, self.extract_text, file_path)
         if not text:
             return 0
         
-        # Create chunks
-        chunks_indexed = 0
-        points = []
+        # Create chunks and embed the whole file in one call
+        chunks = list(self.chunk_text(text, file_path, stat))
+        if not chunks:
+            return 0
+        points = await self._embed_to_points(chunks)
+        await self._upsert(points)
+        return len(points)
+    
+    def _is_excluded_dir(self, dir_path: str) -> bool:
+        """Check whether a directory is covered by an exclusion pattern."""
+        # Patterns look like "*/node_modules/*"; a trailing separator lets
+        # them match the directory itself so it is never descended into.
+        candidate = dir_path + os.sep
+        return any(fnmatch.fnmatch(candidate, pattern) for pattern in self.config.exclude_patterns)
+    
+    def _collect_files(self, directory: Path, recursive: bool) -> List[tuple]:
+        """Walk a directory with os.scandir and return indexable (path, stat) pairs."""
+        files = []
+        stack = [str(directory)]
         
-        for chunk in self.chunk_text(text, file_path):
-            # Generate embedding
-            embedding = self.embedder.encode(chunk.content).tolist()
-            
-            # Create point for Qdrant
-            point = PointStruct(
-                id=abs(hash(f"{chunk.file_path}_{chunk.chunk_index}")),
-                vector=embedding,
-                payload={
-                    "file_path": chunk.file_path,
-                    "filename": chunk.metadata.filename,
-                    "extension": chunk.metadata.extension,
-                    "chunk_index": chunk.chunk_index,
-                    "content": chunk.content,
-                    "size_bytes": chunk.metadata.size_bytes,
-                    "modified_time": chunk.metadata.modified_time.isoformat(),
-                    "mime_type": chunk.metadata.mime_type,
-                }
-            )
-            points.append(point)
-            chunks_indexed += 1
-        
-        # Upload to Qdrant in batches
-        if points:
-            self.qdrant.upsert(
-                collection_name=self.config.collection_name,
-                points=points
-            )
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive and not self._is_excluded_dir(entry.path):
+                                    stack.append(entry.path)
+                            elif entry.is_file():
+                                # DirEntry caches the stat result
+                                stat = entry.stat()
+                                file_path = Path(entry.path)
+                                if self.should_index_file(file_path, stat):
+                                    files.append((file_path, stat))
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.warning("Cannot scan directory", directory=current, error=str(e))
         
-        return chunks_indexed
+        return files
     
-    def index_directory(
+    async def index_directory(
         self,
         directory: Path,
         recursive: bool = True
     ) -> tuple[int, int, List[str]]:
         """
         Index all files in a directory.
+        
+        Text extraction runs on ``index_workers`` concurrent readers, while a
+        single consumer chunks the texts and embeds them across files in
+        batches of ``index_embed_batch_size`` chunks. Points are uploaded in
+        batches of ``upsert_batch_size`` without waiting for Qdrant to apply
+        them, followed by a final waiting upsert.
         Returns: (files_indexed, chunks_created, errors)
         """
-        files_indexed = 0
+        indexed_files = set()
         chunks_created = 0
         errors = []
+        points_buffer: List[PointStruct] = []
+        loop = asyncio.get_running_loop()
         
-        pattern = "**/*" if recursive else "*"
+        files = await loop.run_in_executor(
+            self.read_executor, self._collect_files, directory, recursive
+        )
+        file_iter = iter(files)
+        workers = max(1, min(self.config.index_workers, len(files)))
+        extracted: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
         
-        for file_path in directory.glob(pattern):
-            if not file_path.is_file():
-                continue
-            
+        async def reader():
+            # The iterator is shared; asyncio runs one reader step at a time
+            for file_path, stat in file_iter:
+                text = await loop.run_in_executor(self.read_executor, self.extract_text, file_path)
+                await extracted.put((file_path, stat, text))
+        
+        async def run_readers():
             try:
-                chunks = self.index_file(file_path)
-                if chunks > 0:
-                    files_indexed += 1
-                    chunks_created += chunks
-                    
+                await asyncio.gather(*(reader() for _ in range(workers)))
+            finally:
+                await extracted.put(None)
+        
+        readers = asyncio.create_task(run_readers())
+        pending: List[FileChunk] = []
+        pending_files: List[Path] = []
+        
+        async def upload(points: List[PointStruct], wait: bool):
+            nonlocal chunks_created
+            batch_files = {point.payload["file_path"] for point in points}
+            try:
+                await self._upsert(points, wait=wait)
+                chunks_created += len(points)
+                indexed_files.update(batch_files)
             except Exception as e:
-                error_msg = f"{file_path}: {str(e)}"
-                errors.append(error_msg)
-                logger.error("Error indexing file", file=str(file_path), error=str(e))
+                for file_path in sorted(batch_files):
+                    errors.append(f"{file_path}: {str(e)}")
+                logger.error("Error uploading points", files=len(batch_files), error=str(e))
         
+        async def flush():
+            try:
+                points_buffer.extend(await self._embed_to_points(pending))
+            except Exception as e:
+                for file_path in pending_files:
+                    errors.append(f"{file_path}: {str(e)}")
+                logger.error("Error embedding batch", files=len(pending_files), error=str(e))
+            pending.clear()
+            pending_files.clear()
+            
+            # Keep at least one point back for the final waiting upsert
+            size = self.config.upsert_batch_size
+            while len(points_buffer) > size:
+                await upload(points_buffer[:size], wait=False)
+                del points_buffer[:size]
+        
+        try:
+            while True:
+                item = await extracted.get()
+                if item is None:
+                    break
+                file_path, stat, text = item
+                if not text:
+                    continue
+                
+                try:
+                    chunks = list(self.chunk_text(text, file_path, stat))
+                except Exception as e:
+                    errors.append(f"{file_path}: {str(e)}")
+                    logger.error("Error indexing file", file=str(file_path), error=str(e))
+                    continue
+                
+                if chunks:
+                    pending.extend(chunks)
+                    pending_files.append(file_path)
+                if len(pending) >= self.config.index_embed_batch_size:
+                    await flush()
+            
+            if pending:
+                await flush()
+            if points_buffer:
+                await upload(points_buffer, wait=True)
+        finally:
+            readers.cancel()
+        await asyncio.gather(readers, return_exceptions=True)
+        
+        files_indexed = len(indexed_files)
         logger.info(
             "Directory indexing complete",
             files=files_indexed,
@@ -304,4 +623,3 @@ class FileIndexer:
         )
         
         return files_indexed, chunks_created, errors
-
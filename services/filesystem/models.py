@@ -1,12 +1,20 @@
 """Data models for filesystem service."""
 
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
+
+import msgspec
 from pydantic import BaseModel, Field
 
 
-class FileMetadata(BaseModel):
+# Internal indexing types. These are built once per file/chunk while indexing
+# and never cross the API boundary unvalidated, so they are plain slotted
+# dataclasses rather than pydantic models.
+
+@dataclass(slots=True, frozen=True)
+class FileMetadata:
     """Metadata for an indexed file."""
     path: str
     filename: str
@@ -15,14 +23,10 @@ class FileMetadata(BaseModel):
     modified_time: datetime
     created_time: Optional[datetime] = None
     mime_type: Optional[str] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class FileChunk(BaseModel):
+@dataclass(slots=True, frozen=True)
+class FileChunk:
     """A chunk of file content with metadata."""
     file_path: str
     chunk_index: int
@@ -57,6 +61,16 @@ class SearchResponse(BaseModel):
     total_found: int
 
 
+class BatchSearchRequest(BaseModel):
+    """Several searches executed together."""
+    queries: List[SearchQuery] = Field(..., min_length=1, max_length=100)
+
+
+class BatchSearchResponse(BaseModel):
+    """Responses for a batch search, in request order."""
+    responses: List[SearchResponse]
+
+
 class IndexRequest(BaseModel):
     """Request to index a directory."""
     directory: str
@@ -72,6 +86,20 @@ class IndexResponse(BaseModel):
     duration_seconds: float
 
 
+class ProjectionRequest(BaseModel):
+    """Request to fit a PCA projection and build a reduced collection."""
+    n_components: Optional[int] = Field(None, ge=8)
+    sample_size: Optional[int] = Field(None, ge=1)
+
+
+class ProjectionResponse(BaseModel):
+    """Response from building a reduced collection."""
+    collection: str
+    n_components: int
+    explained_variance: float
+    points_copied: int
+
+
 class FileWriteRequest(BaseModel):
     """Request to write to a file."""
     file_path: str
@@ -129,3 +157,52 @@ class FileDeleteResponse(BaseModel):
     file_path: str
     error: Optional[str] = None
 
+
+# Message bus request types. NATS handlers receive already-decoded dicts;
+# msgspec.convert validates them several times faster than pydantic. They
+# mirror the pydantic request models above, which remain the REST schema.
+
+class SearchQueryMsg(msgspec.Struct):
+    """Search query received over the message bus."""
+    query: str
+    limit: int = 10
+    file_types: Optional[List[str]] = None
+    min_score: float = 0.1
+
+
+class IndexRequestMsg(msgspec.Struct):
+    """Index request received over the message bus."""
+    directory: str
+    recursive: bool = True
+    force_reindex: bool = False
+
+
+class FileWriteRequestMsg(msgspec.Struct):
+    """File write request received over the message bus."""
+    file_path: str
+    content: str
+    mode: str = "w"
+    create_dirs: bool = True
+
+
+class FileReadRequestMsg(msgspec.Struct):
+    """File read request received over the message bus."""
+    file_path: str
+    max_size: int = 10 * 1024 * 1024
+
+
+class FileMoveRequestMsg(msgspec.Struct):
+    """File move request received over the message bus."""
+    src_path: str
+    dst_path: str
+    overwrite: bool = False
+
+
+class FileDeleteRequestMsg(msgspec.Struct):
+    """File delete request received over the message bus."""
+    file_path: str
+
+
+def convert_message(data: dict, message_type):
+    """Validate a decoded message-bus payload into a msgspec request type."""
+    return msgspec.convert(data, message_type, strict=False)
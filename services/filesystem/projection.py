@@ -0,0 +1,84 @@
+"""PCA dimensionality reduction for stored and query embeddings."""
+
+import hashlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+class PCAProjection:
+    """Linear projection of embeddings onto their top principal components."""
+    
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance: float):
+        """Create a projection from a fitted mean and component matrix."""
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.explained_variance = float(explained_variance)
+    
+    @property
+    def dim(self) -> int:
+        """Output dimensionality."""
+        return self.components.shape[0]
+    
+    @property
+    def id(self) -> str:
+        """Short stable identifier of the fitted projection."""
+        digest = hashlib.blake2b(self.components.tobytes(), digest_size=4).hexdigest()
+        return f"pca{self.dim}-{digest}"
+    
+    @classmethod
+    def fit(cls, vectors: np.ndarray, n_components: int) -> "PCAProjection":
+        """Fit a projection on a sample of embeddings."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[0] < n_components:
+            raise ValueError(
+                f"Need at least {n_components} vectors to fit, got {vectors.shape[0]}"
+            )
+        mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        variance = singular_values ** 2
+        explained = variance[:n_components].sum() / variance.sum()
+        return cls(mean, vt[:n_components], explained)
+    
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Project one vector (1-D) or a batch of vectors (2-D)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return (vectors - self.mean) @ self.components.T
+    
+    def save(self, path: Path) -> None:
+        """Persist the projection to an .npz file."""
+        np.savez(
+            path,
+            mean=self.mean,
+            components=self.components,
+            explained_variance=np.float32(self.explained_variance)
+        )
+    
+    @classmethod
+    def load(cls, path: Path) -> Optional["PCAProjection"]:
+        """Load a saved projection, or return None if there is none."""
+        if not path.exists():
+            return None
+        data = np.load(path)
+        return cls(data["mean"], data["components"], float(data["explained_variance"]))
+
+
+class ProjectedEmbedder:
+    """Embedder wrapper that applies an optional projection to ``encode`` output.
+    
+    The projection can be swapped at runtime; every component holding this
+    wrapper then produces reduced vectors without being rebuilt.
+    """
+    
+    def __init__(self, base, projection: Optional[PCAProjection] = None):
+        """Wrap a model exposing ``encode``."""
+        self.base = base
+        self.projection = projection
+    
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """Embed and, if a projection is active, reduce the embeddings."""
+        embeddings = self.base.encode(sentences, **kwargs)
+        if self.projection is None:
+            return embeddings
+        return self.projection.transform(embeddings)
@@ -1,14 +1,83 @@
 """Semantic file searcher."""
 
-from typing import List
+import asyncio
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import List, Optional
 import structlog
-from qdrant_client import QdrantClient
+from neuralux.semantic_cache import SemanticCache
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchValue, SearchRequest
 
+from batcher import EmbeddingBatcher
 from config import FileSystemServiceConfig
+from embedding_cache import EmbeddingCache, content_hash
 from models import SearchQuery, SearchResult, SearchResponse, FileMetadata
 
 logger = structlog.get_logger(__name__)
 
+SNIPPET_LENGTH = 200
+
+
+def _hit_to_result(hit) -> SearchResult:
+    """Convert a Qdrant hit into a SearchResult.
+    
+    Payloads were written by FileIndexer with a fixed schema, so the
+    pydantic models are built with model_construct to skip re-validation.
+    """
+    payload = hit.payload
+    content = payload["content"]
+    snippet = content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content
+    
+    metadata = FileMetadata(
+        path=payload["file_path"],
+        filename=payload["filename"],
+        extension=payload["extension"],
+        size_bytes=payload["size_bytes"],
+        modified_time=datetime.fromisoformat(payload["modified_time"]),
+        mime_type=payload.get("mime_type"),
+    )
+    
+    return SearchResult.model_construct(
+        file_path=payload["file_path"],
+        filename=payload["filename"],
+        score=hit.score,
+        snippet=snippet,
+        metadata=metadata,
+        chunk_index=payload["chunk_index"]
+    )
+
+
+def _cache_key(query: SearchQuery) -> tuple:
+    """Search parameters that must match exactly for a cached response to apply."""
+    return (
+        query.limit,
+        query.min_score,
+        tuple(query.file_types) if query.file_types else None,
+    )
+
+
+def _extension_filter(query: SearchQuery) -> Optional[Filter]:
+    """Build a Qdrant filter for the query's file types, if any."""
+    if not query.file_types:
+        return None
+    return Filter(
+        should=[
+            FieldCondition(key="extension", match=MatchValue(value=ext))
+            for ext in query.file_types
+        ]
+    )
+
+
+def _build_response(query: SearchQuery, hits) -> SearchResponse:
+    """Convert Qdrant hits for a query into a SearchResponse."""
+    results = [_hit_to_result(hit) for hit in hits]
+    return SearchResponse.model_construct(
+        query=query.query,
+        results=results,
+        total_found=len(results)
+    )
+
 
 class FileSearcher:
     """Searches indexed files semantically."""
@@ -16,158 +85,186 @@ class FileSearcher:
     def __init__(
         self,
         config: FileSystemServiceConfig,
-        qdrant_client: QdrantClient,
-        embedder
+        qdrant_client: AsyncQdrantClient,
+        embedder,
+        executor: Optional[Executor] = None,
+        batcher: Optional[EmbeddingBatcher] = None,
+        cache: Optional[SemanticCache] = None,
+        embedding_cache: Optional[EmbeddingCache] = None
     ):
         """Initialize the file searcher."""
         self.config = config
         self.qdrant = qdrant_client
         self.embedder = embedder
+        self.executor = executor
+        self.batcher = batcher
+        self.cache = cache
+        self.embedding_cache = embedding_cache
+        # Bound in-flight Qdrant calls so bursts queue here, not in the channel
+        self._qdrant_slots = asyncio.Semaphore(config.qdrant_max_concurrency)
+    
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a query string off the event loop.
+        
+        Repeated queries are answered from the embedding cache's in-memory
+        tier without running the model.
+        """
+        digest = None
+        if self.embedding_cache is not None:
+            digest = content_hash(text)
+            cached = self.embedding_cache.get_hot(digest)
+            if cached is not None:
+                return cached.tolist()
+        
+        if self.batcher is not None:
+            embedding = await self.batcher.embed(text)
+        else:
+            loop = asyncio.get_running_loop()
+            vector = await loop.run_in_executor(self.executor, self.embedder.encode, text)
+            embedding = vector.tolist()
+        
+        if digest is not None:
+            self.embedding_cache.put_hot(digest, embedding)
+        return embedding
     
-    def search(self, query: SearchQuery) -> SearchResponse:
+    async def search(self, query: SearchQuery) -> SearchResponse:
         """Search for files matching the query."""
         logger.info("Searching files", query=query.query, limit=query.limit)
         
         # Generate embedding for query
-        query_embedding = self.embedder.encode(query.query).tolist()
-        
-        # Build filter if file types specified
-        search_filter = None
-        if query.file_types:
-            search_filter = {
-                "should": [
-                    {"key": "extension", "match": {"value": ext}}
-                    for ext in query.file_types
-                ]
-            }
+        query_embedding = await self.embed_query(query.query)
         
-        # Search in Qdrant
-        search_results = self.qdrant.search(
-            collection_name=self.config.collection_name,
-            query_vector=query_embedding,
-            limit=query.limit,
-            score_threshold=query.min_score,
-            query_filter=search_filter if search_filter else None
-        )
+        # Near-duplicate queries with identical parameters reuse a cached response
+        cache_key = _cache_key(query)
+        if self.cache is not None:
+            cached = self.cache.lookup(query_embedding, cache_key)
+            if cached is not None:
+                logger.info("Search served from cache", results=cached.total_found)
+                return cached.model_copy(update={"query": query.query})
         
-        # Convert to SearchResult objects
-        results = []
-        for hit in search_results:
-            payload = hit.payload
-            
-            # Parse datetime from ISO format string
-            from datetime import datetime
-            modified_time = datetime.fromisoformat(payload["modified_time"])
-            
-            # Create metadata
-            metadata = FileMetadata(
-                path=payload["file_path"],
-                filename=payload["filename"],
-                extension=payload["extension"],
-                size_bytes=payload["size_bytes"],
-                modified_time=modified_time,
-                mime_type=payload.get("mime_type"),
-            )
-            
-            # Extract snippet (first 200 chars of content)
-            content = payload["content"]
-            snippet = content[:200] + "..." if len(content) > 200 else content
-            
-            result = SearchResult(
-                file_path=payload["file_path"],
-                filename=payload["filename"],
-                score=hit.score,
-                snippet=snippet,
-                metadata=metadata,
-                chunk_index=payload["chunk_index"]
+        # Search in Qdrant
+        async with self._qdrant_slots:
+            search_results = await self.qdrant.search(
+                collection_name=self.config.collection_name,
+                query_vector=query_embedding,
+                limit=query.limit,
+                score_threshold=query.min_score,
+                query_filter=_extension_filter(query)
             )
-            results.append(result)
         
-        response = SearchResponse(
-            query=query.query,
-            results=results,
-            total_found=len(results)
-        )
+        response = _build_response(query, search_results)
         
-        logger.info("Search complete", results=len(results))
+        if self.cache is not None:
+            self.cache.insert(query_embedding, cache_key, response)
+        
+        logger.info("Search complete", results=response.total_found)
         return response
     
-    def search_similar(self, file_path: str, limit: int = 10) -> SearchResponse:
+    async def search_batch(self, queries: List[SearchQuery]) -> List[SearchResponse]:
+        """Run many searches with one encode call and one Qdrant batch request.
+        
+        Responses are returned in the same order as ``queries``.
+        """
+        logger.info("Batch searching files", queries=len(queries))
+        if not queries:
+            return []
+        
+        # Embed every query in a single forward pass
+        loop = asyncio.get_running_loop()
+        texts = [query.query for query in queries]
+        embeddings = await loop.run_in_executor(
+            self.executor,
+            lambda: self.embedder.encode(texts, batch_size=64)
+        )
+        embeddings = [embedding.tolist() for embedding in embeddings]
+        
+        responses: List[Optional[SearchResponse]] = [None] * len(queries)
+        pending = []
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.lookup(embedding, _cache_key(query))
+            if cached is not None:
+                responses[i] = cached.model_copy(update={"query": query.query})
+            else:
+                pending.append(i)
+        
+        if pending:
+            requests = [
+                SearchRequest(
+                    vector=embeddings[i],
+                    limit=queries[i].limit,
+                    score_threshold=queries[i].min_score,
+                    filter=_extension_filter(queries[i]),
+                    with_payload=True,
+                )
+                for i in pending
+            ]
+            async with self._qdrant_slots:
+                batch_results = await self.qdrant.search_batch(
+                    collection_name=self.config.collection_name,
+                    requests=requests
+                )
+            for i, hits in zip(pending, batch_results):
+                responses[i] = _build_response(queries[i], hits)
+                if self.cache is not None:
+                    self.cache.insert(embeddings[i], _cache_key(queries[i]), responses[i])
+        
+        logger.info("Batch search complete", queries=len(queries), qdrant_queries=len(pending))
+        return responses
+    
+    async def search_similar(self, file_path: str, limit: int = 10) -> SearchResponse:
         """Find files similar to the given file."""
         logger.info("Finding similar files", file_path=file_path)
         
-        # Get the file's chunks from Qdrant
-        scroll_result = self.qdrant.scroll(
-            collection_name=self.config.collection_name,
-            scroll_filter={
-                "must": [
-                    {"key": "file_path", "match": {"value": file_path}}
-                ]
-            },
-            limit=1
-        )
+        same_file = FieldCondition(key="file_path", match=MatchValue(value=file_path))
         
-        if not scroll_result[0]:
+        # Get the file's chunks (with vectors) from Qdrant
+        async with self._qdrant_slots:
+            chunks, _ = await self.qdrant.scroll(
+                collection_name=self.config.collection_name,
+                scroll_filter=Filter(must=[same_file]),
+                limit=self.config.similar_max_chunks,
+                with_vectors=True
+            )
+        
+        if not chunks:
             return SearchResponse(
                 query=f"similar to {file_path}",
                 results=[],
                 total_found=0
             )
         
-        # Use first chunk's embedding to find similar
-        first_chunk = scroll_result[0][0]
-        query_vector = first_chunk.vector
-        
-        # Search for similar vectors
-        search_results = self.qdrant.search(
-            collection_name=self.config.collection_name,
-            query_vector=query_vector,
-            limit=limit + 10,  # Get extra to filter out the source file
-        )
-        
-        # Filter out the source file and convert to results
-        results = []
-        seen_files = set()
-        
-        for hit in search_results:
-            payload = hit.payload
-            hit_file_path = payload["file_path"]
-            
-            # Skip the source file and duplicates
-            if hit_file_path == file_path or hit_file_path in seen_files:
-                continue
-            
-            seen_files.add(hit_file_path)
-            
-            # Parse datetime from ISO format string
-            modified_time = datetime.fromisoformat(payload["modified_time"])
-            
-            metadata = FileMetadata(
-                path=hit_file_path,
-                filename=payload["filename"],
-                extension=payload["extension"],
-                size_bytes=payload["size_bytes"],
-                modified_time=modified_time,
-                mime_type=payload.get("mime_type"),
+        # One batched query per chunk vector, excluding the source file server-side.
+        # Ask for extra hits since several may come from the same file.
+        requests = [
+            SearchRequest(
+                vector=chunk.vector,
+                limit=limit * 3,
+                filter=Filter(must_not=[same_file]),
+                with_payload=True,
             )
-            
-            content = payload["content"]
-            snippet = content[:200] + "..." if len(content) > 200 else content
-            
-            result = SearchResult(
-                file_path=hit_file_path,
-                filename=payload["filename"],
-                score=hit.score,
-                snippet=snippet,
-                metadata=metadata,
-                chunk_index=payload["chunk_index"]
+            for chunk in chunks
+        ]
+        async with self._qdrant_slots:
+            batch_results = await self.qdrant.search_batch(
+                collection_name=self.config.collection_name,
+                requests=requests
             )
-            results.append(result)
-            
-            if len(results) >= limit:
-                break
         
-        return SearchResponse(
+        # Merge and keep each file's best-scoring chunk
+        best_hits = {}
+        for hits in batch_results:
+            for hit in hits:
+                hit_file_path = hit.payload["file_path"]
+                best = best_hits.get(hit_file_path)
+                if best is None or hit.score > best.score:
+                    best_hits[hit_file_path] = hit
+        
+        top_hits = sorted(best_hits.values(), key=lambda hit: hit.score, reverse=True)[:limit]
+        results = [_hit_to_result(hit) for hit in top_hits]
+        
+        return SearchResponse.model_construct(
             query=f"similar to {file_path}",
             results=results,
             total_found=len(results)
@@ -1,14 +1,21 @@
 """Filesystem service - semantic file search and indexing."""
 
 import asyncio
+import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
+from typing import Union
 
+import aiofiles
+import orjson
 import structlog
 from fastapi import FastAPI, HTTPException
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from qdrant_client import AsyncQdrantClient
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "packages" / "common"))
@@ -16,16 +23,28 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "packages" / "commo
 from neuralux.config import NeuraluxConfig
 from neuralux.logger import setup_logging
 from neuralux.messaging import MessageBusClient
+from neuralux.semantic_cache import SemanticCache
 
+from batcher import EmbeddingBatcher
 from config import FileSystemServiceConfig
+from embedder import embedder_id, load_embedder
+from embedding_cache import EmbeddingCache
+from fileops import move_file
 from indexer import FileIndexer
+from projection import PCAProjection, ProjectedEmbedder
 from searcher import FileSearcher
 from models import (
     SearchQuery, IndexRequest, IndexResponse, SearchResponse,
+    BatchSearchRequest, BatchSearchResponse,
+    ProjectionRequest, ProjectionResponse,
     FileWriteRequest, FileWriteResponse,
     FileReadRequest, FileReadResponse,
     FileMoveRequest, FileMoveResponse,
     FileDeleteRequest, FileDeleteResponse,
+    SearchQueryMsg, IndexRequestMsg,
+    FileWriteRequestMsg, FileReadRequestMsg,
+    FileMoveRequestMsg, FileDeleteRequestMsg,
+    convert_message,
 )
 
 logger = structlog.get_logger(__name__)
@@ -39,22 +58,100 @@ class FileSystemService:
         self.config = FileSystemServiceConfig()
         self.neuralux_config = NeuraluxConfig()
         self.message_bus = MessageBusClient(self.neuralux_config)
-        self.app = FastAPI(title="Neuralux Filesystem Service")
+        self.app = FastAPI(
+            title="Neuralux Filesystem Service",
+            lifespan=self._lifespan,
+            default_response_class=ORJSONResponse,
+        )
         
-        # Initialize Qdrant client
-        self.qdrant = QdrantClient(url=self.neuralux_config.qdrant_url)
+        # Qdrant, the embedding model and the components using them are
+        # created in start(), so importing this module stays cheap
+        self.embedder = None
+        self.embedding_cache = None
+        self._warm_task = None
+        self.search_cache = None
+        
+        # Setup routes
+        self._setup_routes()
+    
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """FastAPI lifespan: start on startup, stop on shutdown."""
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+    
+    async def _initialize(self):
+        """Create the Qdrant client, load the embedder and build components."""
+        # Initialize Qdrant client (gRPC skips JSON encoding of point payloads)
+        grpc_port = int(self.neuralux_config.qdrant_grpc_url.rsplit(":", 1)[-1])
+        self.qdrant = AsyncQdrantClient(
+            url=self.neuralux_config.qdrant_url,
+            grpc_port=grpc_port,
+            prefer_grpc=self.config.qdrant_prefer_grpc,
+        )
         
         # Initialize embedder (lightweight model)
         logger.info("Loading embedding model...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        base_embedder = await asyncio.to_thread(
+            load_embedder, self.config, self.neuralux_config.cache_dir
+        )
+        self.embedder = ProjectedEmbedder(base_embedder)
         logger.info("Embedding model loaded")
         
-        # Initialize indexer and searcher
-        self.indexer = FileIndexer(self.config, self.qdrant, self.embedder)
-        self.searcher = FileSearcher(self.config, self.qdrant, self.embedder)
+        # Use the reduced collection if a PCA projection has been fitted
+        self._projection_path = self.neuralux_config.data_dir / "fs_projection.npz"
+        projection = PCAProjection.load(self._projection_path)
+        if projection is not None:
+            self._apply_projection(projection)
         
-        # Setup routes
-        self._setup_routes()
+        # Persistent chunk embedding cache so re-indexing skips unchanged content
+        if self.config.embedding_cache_enabled:
+            self.embedding_cache = EmbeddingCache(
+                self.neuralux_config.data_dir / "fs_embedding_cache.db",
+                embedder_id(self.config, self.embedder),
+                hot_size=self.config.embedding_cache_warm_size
+            )
+        
+        # Bounded pool for CPU-bound embedding and text extraction
+        self._embed_pool = ThreadPoolExecutor(
+            max_workers=self.config.embed_workers,
+            thread_name_prefix="fs-embed"
+        )
+        
+        # Pool for blocking filesystem metadata calls (stat, mkdir, move, ...)
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=(os.cpu_count() or 1) * 2,
+            thread_name_prefix="fs-io"
+        )
+        
+        # Coalesce concurrent query embeds into batched encode calls
+        self.batcher = EmbeddingBatcher(
+            self.embedder,
+            self._embed_pool,
+            max_batch=self.config.embed_batch_size,
+            max_delay_ms=self.config.embed_batch_delay_ms
+        )
+        
+        # Cache of recent search responses, matched by query embedding; sized
+        # from the first query vector, whatever embedder produced it
+        if self.config.search_cache_size > 0:
+            self.search_cache = SemanticCache(
+                max_entries=self.config.search_cache_size,
+                threshold=self.config.search_cache_threshold
+            )
+        
+        # Initialize indexer and searcher
+        self.indexer = FileIndexer(
+            self.config, self.qdrant, self.embedder, self._embed_pool,
+            self.embedding_cache, self._io_pool
+        )
+        self.searcher = FileSearcher(
+            self.config, self.qdrant, self.embedder, self._embed_pool,
+            self.batcher, self.search_cache, self.embedding_cache
+        )
     
     def _setup_routes(self):
         """Setup FastAPI routes."""
@@ -67,15 +164,32 @@ class FileSystemService:
                 "status": "running"
             }
         
+        @self.app.get("/metrics")
+        async def metrics():
+            """Service counters."""
+            return {
+                "search_cache": self.search_cache.stats() if self.search_cache else None,
+            }
+        
         @self.app.post("/search", response_model=SearchResponse)
         async def search(query: SearchQuery):
             """Search for files by content."""
             try:
-                return self.searcher.search(query)
+                return await self.searcher.search(query)
             except Exception as e:
                 logger.error("Search failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/batch/search", response_model=BatchSearchResponse)
+        async def batch_search(request: BatchSearchRequest):
+            """Run several searches with a single embedding call."""
+            try:
+                responses = await self.searcher.search_batch(request.queries)
+                return BatchSearchResponse(responses=responses)
+            except Exception as e:
+                logger.error("Batch search failed", error=str(e))
+                raise HTTPException(status_code=500, detail=str(e))
+        
         @self.app.post("/index", response_model=IndexResponse)
         async def index(request: IndexRequest):
             """Index a directory."""
@@ -85,30 +199,29 @@ class FileSystemService:
                 if not directory.exists():
                     raise HTTPException(status_code=404, detail="Directory not found")
                 
-                start_time = time.time()
-                files, chunks, errors = self.indexer.index_directory(
-                    directory,
-                    recursive=request.recursive
-                )
-                duration = time.time() - start_time
-                
-                return IndexResponse(
-                    files_indexed=files,
-                    chunks_created=chunks,
-                    errors=errors,
-                    duration_seconds=duration
-                )
+                return await self._index_directory(directory, request.recursive)
             except HTTPException:
                 raise
             except Exception as e:
                 logger.error("Indexing failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/index/reduce", response_model=ProjectionResponse)
+        async def reduce_index(request: ProjectionRequest):
+            """Fit a PCA projection and move the index to reduced vectors."""
+            try:
+                return await self._build_projection(request)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error("Index reduction failed", error=str(e))
+                raise HTTPException(status_code=500, detail=str(e))
+        
         @self.app.get("/similar/{file_path:path}")
         async def find_similar(file_path: str, limit: int = 10):
             """Find files similar to the given file."""
             try:
-                return self.searcher.search_similar(file_path, limit)
+                return await self.searcher.search_similar(file_path, limit)
             except Exception as e:
                 logger.error("Similar search failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
@@ -131,6 +244,17 @@ class FileSystemService:
                 logger.error("File read failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.get("/file/stream/{file_path:path}")
+        async def stream_file(file_path: str):
+            """Stream a file's raw bytes in chunks."""
+            path = Path(file_path).expanduser()
+            if not await self._run_io(path.is_file):
+                raise HTTPException(status_code=404, detail="File does not exist")
+            return StreamingResponse(
+                self._iter_file(path),
+                media_type="application/octet-stream"
+            )
+        
         @self.app.post("/file/move", response_model=FileMoveResponse)
         async def move_file(request: FileMoveRequest):
             """Move or rename a file."""
@@ -149,12 +273,13 @@ class FileSystemService:
                 logger.error("File delete failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
     
-    async def _handle_search_request(self, request_data: dict) -> dict:
+    async def _handle_search_request(self, request_data: dict) -> Union[bytes, dict]:
         """Handle search request from message bus."""
         try:
-            query = SearchQuery(**request_data)
-            response = self.searcher.search(query)
-            return response.model_dump(mode='json')
+            query = convert_message(request_data, SearchQueryMsg)
+            response = await self.searcher.search(query)
+            # orjson encodes datetimes natively; skip pydantic's JSON-mode pass
+            return orjson.dumps(response.model_dump())
         except Exception as e:
             logger.error("Message bus search failed", error=str(e))
             return {"error": str(e)}
@@ -162,27 +287,89 @@ class FileSystemService:
     async def _handle_index_request(self, request_data: dict) -> dict:
         """Handle index request from message bus."""
         try:
-            request = IndexRequest(**request_data)
+            request = convert_message(request_data, IndexRequestMsg)
             directory = Path(request.directory).expanduser()
-            
-            start_time = time.time()
-            files, chunks, errors = self.indexer.index_directory(
-                directory,
-                recursive=request.recursive
-            )
-            duration = time.time() - start_time
-            
-            response = IndexResponse(
-                files_indexed=files,
-                chunks_created=chunks,
-                errors=errors,
-                duration_seconds=duration
-            )
+            response = await self._index_directory(directory, request.recursive)
             return response.model_dump()
         except Exception as e:
             logger.error("Message bus indexing failed", error=str(e))
             return {"error": str(e)}
     
+    async def _index_directory(self, directory: Path, recursive: bool) -> IndexResponse:
+        """Index a directory and invalidate cached search results."""
+        start_time = time.time()
+        files, chunks, errors = await self.indexer.index_directory(
+            directory,
+            recursive=recursive
+        )
+        duration = time.time() - start_time
+        
+        # Indexed content changed, so cached responses may be stale
+        if self.search_cache is not None and chunks:
+            self.search_cache.clear()
+        
+        return IndexResponse(
+            files_indexed=files,
+            chunks_created=chunks,
+            errors=errors,
+            duration_seconds=duration
+        )
+    
+    def _apply_projection(self, projection: PCAProjection):
+        """Switch embeddings, caches and the active collection to reduced vectors."""
+        self.embedder.projection = projection
+        self.config.collection_name = f"{self.config.collection_name}_pca{projection.dim}"
+        self.config.embedding_dim = projection.dim
+        if self.embedding_cache is not None:
+            self.embedding_cache.model_name = embedder_id(self.config, self.embedder)
+        if self.search_cache is not None:
+            self.search_cache.reset(projection.dim)
+        logger.info(
+            "Using reduced embeddings",
+            collection=self.config.collection_name,
+            dim=projection.dim
+        )
+    
+    async def _build_projection(self, request: ProjectionRequest) -> ProjectionResponse:
+        """Fit PCA on the indexed vectors and switch to a reduced collection."""
+        if self.embedder.projection is not None:
+            raise HTTPException(status_code=409, detail="Embeddings are already reduced")
+        
+        projection, collection, copied = await self.indexer.build_projected_collection(
+            n_components=request.n_components or self.config.projection_components,
+            sample_size=request.sample_size or self.config.projection_sample_size
+        )
+        await self._run_io(projection.save, self._projection_path)
+        self._apply_projection(projection)
+        
+        return ProjectionResponse(
+            collection=collection,
+            n_components=projection.dim,
+            explained_variance=projection.explained_variance,
+            points_copied=copied
+        )
+    
+    async def _warm_embedding_cache(self):
+        """Load the most recently used embeddings into the in-memory cache tier."""
+        try:
+            await self._run_io(self.embedding_cache.warm)
+        except Exception as e:
+            logger.warning("Embedding cache warm-up failed", error=str(e))
+    
+    async def _run_io(self, func, *args):
+        """Run a blocking filesystem call on the I/O pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_pool, func, *args)
+    
+    async def _iter_file(self, file_path: Path, chunk_size: int = 64 * 1024):
+        """Yield a file's contents in fixed-size chunks."""
+        async with aiofiles.open(file_path, "rb") as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
     async def _write_file(self, request: FileWriteRequest) -> FileWriteResponse:
         """Write content to a file."""
         try:
@@ -190,15 +377,14 @@ class FileSystemService:
             
             # Create parent directories if needed
             if request.create_dirs:
-                file_path.parent.mkdir(parents=True, exist_ok=True)
+                await self._run_io(
+                    lambda: file_path.parent.mkdir(parents=True, exist_ok=True)
+                )
             
             # Write file
-            if request.mode == "a":
-                with file_path.open("a", encoding="utf-8") as f:
-                    bytes_written = f.write(request.content)
-            else:
-                bytes_written = len(request.content)
-                file_path.write_text(request.content, encoding="utf-8")
+            mode = "a" if request.mode == "a" else "w"
+            async with aiofiles.open(file_path, mode, encoding="utf-8") as f:
+                bytes_written = await f.write(request.content)
             
             logger.info("File written", path=str(file_path), bytes=bytes_written)
             
@@ -221,7 +407,9 @@ class FileSystemService:
         try:
             file_path = Path(request.file_path).expanduser()
             
-            if not file_path.exists():
+            try:
+                stat = await self._run_io(file_path.stat)
+            except FileNotFoundError:
                 return FileReadResponse(
                     success=False,
                     file_path=str(file_path),
@@ -229,7 +417,7 @@ class FileSystemService:
                 )
             
             # Check file size
-            size = file_path.stat().st_size
+            size = stat.st_size
             if size > request.max_size:
                 return FileReadResponse(
                     success=False,
@@ -239,7 +427,9 @@ class FileSystemService:
                 )
             
             # Read file
-            content = file_path.read_text(encoding="utf-8")
+            async with aiofiles.open(file_path, "rb") as f:
+                data = await f.read()
+            content = data.decode("utf-8")
             
             logger.info("File read", path=str(file_path), bytes=size)
             
@@ -260,8 +450,6 @@ class FileSystemService:
     async def _move_file(self, request: FileMoveRequest) -> FileMoveResponse:
         """Move or rename a file."""
         try:
-            import shutil
-            
             src_path = Path(request.src_path).expanduser()
             dst_path = Path(request.dst_path).expanduser()
             
@@ -284,8 +472,8 @@ class FileSystemService:
             # Create parent directories
             dst_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Move file
-            shutil.move(str(src_path), str(dst_path))
+            # Move file (rename, or in-kernel copy across devices)
+            await self._run_io(move_file, str(src_path), str(dst_path))
             
             logger.info("File moved", src=str(src_path), dst=str(dst_path))
             
@@ -316,7 +504,7 @@ class FileSystemService:
                 )
             
             # Delete file
-            file_path.unlink()
+            await self._run_io(file_path.unlink)
             
             logger.info("File deleted", path=str(file_path))
             
@@ -335,7 +523,7 @@ class FileSystemService:
     async def _handle_file_write_request(self, request_data: dict) -> dict:
         """Handle file write request from message bus."""
         try:
-            request = FileWriteRequest(**request_data)
+            request = convert_message(request_data, FileWriteRequestMsg)
             response = await self._write_file(request)
             return response.model_dump()
         except Exception as e:
@@ -345,7 +533,7 @@ class FileSystemService:
     async def _handle_file_read_request(self, request_data: dict) -> dict:
         """Handle file read request from message bus."""
         try:
-            request = FileReadRequest(**request_data)
+            request = convert_message(request_data, FileReadRequestMsg)
             response = await self._read_file(request)
             return response.model_dump()
         except Exception as e:
@@ -355,7 +543,7 @@ class FileSystemService:
     async def _handle_file_move_request(self, request_data: dict) -> dict:
         """Handle file move request from message bus."""
         try:
-            request = FileMoveRequest(**request_data)
+            request = convert_message(request_data, FileMoveRequestMsg)
             response = await self._move_file(request)
             return response.model_dump()
         except Exception as e:
@@ -365,7 +553,7 @@ class FileSystemService:
     async def _handle_file_delete_request(self, request_data: dict) -> dict:
         """Handle file delete request from message bus."""
         try:
-            request = FileDeleteRequest(**request_data)
+            request = convert_message(request_data, FileDeleteRequestMsg)
             response = await self._delete_file(request)
             return response.model_dump()
         except Exception as e:
@@ -377,6 +565,14 @@ class FileSystemService:
         setup_logging(self.config.service_name, self.neuralux_config.log_level)
         logger.info("Starting filesystem service")
         
+        await self._initialize()
+        await self.indexer.ensure_collection()
+        self.batcher.start()
+        
+        # Preload recently used embeddings in the background
+        if self.embedding_cache is not None:
+            self._warm_task = asyncio.create_task(self._warm_embedding_cache())
+        
         # Connect to message bus
         try:
             await self.message_bus.connect()
@@ -418,30 +614,50 @@ class FileSystemService:
         """Stop the filesystem service."""
         logger.info("Stopping filesystem service")
         await self.message_bus.disconnect()
+        if self._warm_task is not None and not self._warm_task.done():
+            self._warm_task.cancel()
+        await self.batcher.stop()
+        await self.qdrant.close()
+        self._embed_pool.shutdown(wait=True)
+        self._io_pool.shutdown(wait=True)
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+
+
+@lru_cache(maxsize=1)
+def get_service() -> FileSystemService:
+    """Return the process-wide service instance.
+    
+    Construction is cheap; the model and Qdrant client are created once, in
+    the app's lifespan, inside the serving process.
+    """
+    return FileSystemService()
 
 
 # Create service instance
-service = FileSystemService()
+service = get_service()
+app = service.app
 
 
 if __name__ == "__main__":
     import uvicorn
     
-    async def startup():
-        await service.start()
-    
-    async def shutdown():
-        await service.stop()
-    
-    # Add startup/shutdown handlers
-    service.app.add_event_handler("startup", startup)
-    service.app.add_event_handler("shutdown", shutdown)
+    # libuv event loop and C HTTP parser when available (uvicorn[standard])
+    try:
+        import uvloop  # noqa: F401
+        import httptools  # noqa: F401
+        loop, http = "uvloop", "httptools"
+    except ImportError:
+        logger.warning("uvloop/httptools not installed, using the default asyncio loop")
+        loop, http = "asyncio", "h11"
     
-    # Run the service
+    # Run the service (startup/shutdown are handled by the app's lifespan)
     uvicorn.run(
-        service.app,
+        app,
         host=service.config.host,
         port=service.config.service_port,
         log_level=service.neuralux_config.log_level.lower(),
+        loop=loop,
+        http=http,
     )
 
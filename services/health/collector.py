@@ -1,9 +1,17 @@
 """Metrics collection using psutil."""
 
+import heapq
 import os
+import re
+import sys
+import threading
+import time
+import numpy as np
 import psutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import structlog
 
 from models import (
@@ -18,39 +26,274 @@ from models import (
 
 logger = structlog.get_logger(__name__)
 
+# Linux /proc is read directly where psutil would do more work than needed
+_HAS_PROCFS = sys.platform.startswith("linux") and os.path.isdir("/proc")
+
+# "TCP: inuse 12 ..." / "UDP6: inuse 3 ..." lines of /proc/net/sockstat{,6}
+_SOCKSTAT_INUSE = re.compile(rb"^(?:TCP|UDP)6?: inuse (\d+)", re.MULTILINE)
+
+# Mount table changes rarely; re-read it at most this often (seconds)
+PARTITIONS_TTL = 300.0
+
+# Weight of the newest sample in the smoothed per-core CPU figures
+PER_CORE_EWMA_ALPHA = 0.3
+
+# CPU percent is measured between consecutive calls; callers arriving
+# sooner than this after the last sample reuse it (seconds)
+MIN_CPU_SAMPLE_INTERVAL = 0.5
+
+
+class _NetBaseline(NamedTuple):
+    """Network counters at the previous collection, for rate deltas."""
+    timestamp: float  # time.monotonic()
+    bytes_sent: int
+    bytes_recv: int
+
+
+_PSEUDO_MOUNT_PREFIXES = ('/snap/', '/run/', '/sys/')
+
+
+def is_pseudo_mount(device: str, mountpoint: str) -> bool:
+    """Whether a mount is a snap/loop image or a runtime/kernel filesystem.
+    
+    Snap and loop mounts are read-only images that always report 100% usage;
+    /run and /sys hold tmpfs and kernel mounts. None are worth monitoring.
+    """
+    return mountpoint.startswith(_PSEUDO_MOUNT_PREFIXES) or '/loop' in device
+
+
+def _decode_utf8(raw: bytes) -> str:
+    """Decode a bytes value returned by older pynvml releases."""
+    return raw.decode("utf-8")
+
+
+# (cpu_percent, pid, name, memory_percent, rss_bytes)
+ProcessSample = Tuple[float, int, str, float, int]
+
+
+class _LinuxProcSampler:
+    """Per-process CPU and memory sampling straight from /proc.
+    
+    Reads only ``/proc/<pid>/stat`` and ``/proc/<pid>/statm``, avoiding the
+    per-process object and attribute machinery of ``psutil.process_iter``.
+    CPU percent follows psutil's convention (100 = one full core) and is the
+    usage since the previous ``sample`` call. Calls from different threads
+    are serialized, so each measures against the sample before it.
+    """
+    
+    def __init__(self):
+        """Initialize the sampler."""
+        self._clk_tck = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._mem_total = psutil.virtual_memory().total
+        # pid -> (utime + stime ticks, sample time, start time ticks)
+        self._prev_ticks: Dict[int, Tuple[int, float, int]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _read(path: str) -> bytes:
+        """Read a small /proc file in one unbuffered syscall."""
+        with open(path, "rb", buffering=0) as f:
+            return f.read()
+    
+    def sample(self) -> List[ProcessSample]:
+        """Return one sample per live process."""
+        with self._lock:
+            return self._sample()
+    
+    def _sample(self) -> List[ProcessSample]:
+        """Read every process and replace the baseline; callers hold _lock."""
+        samples = []
+        ticks = {}
+        now = time.monotonic()
+        
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                stat = self._read(f"/proc/{entry}/stat")
+                statm = self._read(f"/proc/{entry}/statm")
+            except OSError:
+                # Exited between listdir and open, or not readable
+                continue
+            
+            # comm may contain spaces and parentheses: split at the last ')'
+            lparen = stat.find(b"(")
+            rparen = stat.rfind(b")")
+            name = stat[lparen + 1:rparen].decode("utf-8", "replace")
+            fields = stat[rparen + 2:].split()
+            # fields[0] is field 3 (state): utime=14, stime=15, starttime=22
+            total = int(fields[11]) + int(fields[12])
+            start = int(fields[19])
+            ticks[pid] = (total, now, start)
+            
+            cpu_percent = 0.0
+            prev = self._prev_ticks.get(pid)
+            if prev is not None and prev[2] == start and now > prev[1]:
+                cpu_percent = (total - prev[0]) / self._clk_tck / (now - prev[1]) * 100.0
+            
+            rss = int(statm.split()[1]) * self._page_size
+            samples.append((
+                round(cpu_percent, 1),
+                pid,
+                name,
+                rss / self._mem_total * 100.0,
+                rss,
+            ))
+        
+        # Forget exited pids
+        self._prev_ticks = ticks
+        return samples
+
 
 class MetricsCollector:
     """Collects system metrics using psutil."""
     
     def __init__(self):
         """Initialize the metrics collector."""
-        # Store previous network counters for delta calculation
-        self._last_net_io = psutil.net_io_counters()
+        # Boot time never changes while we run
+        self._boot_time = datetime.fromtimestamp(psutil.boot_time())
+        
+        # Previous network counters; rates are deltas against them, so no
+        # collection ever sleeps to measure throughput
+        net_io = psutil.net_io_counters()
+        self._net_baseline = _NetBaseline(time.monotonic(), net_io.bytes_sent, net_io.bytes_recv)
+        self._net_lock = threading.Lock()
+        
+        # Prime psutil's CPU time baseline; later non-blocking calls report
+        # usage since the previous call instead of sleeping for a sample
+        self._cpu_sample = (time.monotonic(), tuple(psutil.cpu_percent(interval=None, percpu=True)))
+        self._cpu_lock = threading.Lock()
+        # psutil tracks the overall figure separately; it backs collect_cheap
+        psutil.cpu_percent(interval=None)
+        
+        # Smoothed per-core CPU percent, updated in place each collection
+        self._per_core_ewma: Optional[np.ndarray] = None
+        self._ewma_lock = threading.Lock()
+        
+        # (refreshed_at, partitions) for collect_disk_metrics
+        self._partitions_cache = (0.0, [])
+        
+        # Read /proc directly on Linux; psutil.process_iter elsewhere
+        self._proc_sampler = None
+        if _HAS_PROCFS:
+            self._proc_sampler = _LinuxProcSampler()
+            self._proc_sampler.sample()
+        
+        # Runs the independent collect_* calls of collect_all in parallel
+        self._pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="health-collect")
+        
+        # NVML is initialized once; per tick only the volatile values are read
+        self._nvml = None
+        self._nvml_devices: List[Tuple[int, object, str, Optional[float]]] = []
+        self._init_nvml()
+    
+    def _init_nvml(self) -> None:
+        """Bring up NVML and cache (index, handle, name, power limit) per GPU."""
+        try:
+            import pynvml  # type: ignore
+            pynvml.nvmlInit()
+        except Exception:
+            return
+        
+        try:
+            # Older pynvml returns bytes, newer str; check the type once
+            decode_name = None
+            for i in range(pynvml.nvmlDeviceGetCount()):
+                handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                raw = pynvml.nvmlDeviceGetName(handle)
+                if decode_name is None:
+                    decode_name = _decode_utf8 if isinstance(raw, bytes) else str
+                name = decode_name(raw)
+                try:
+                    limit = float(pynvml.nvmlDeviceGetEnforcedPowerLimit(handle)) / 1000.0
+                except Exception:
+                    limit = None
+                self._nvml_devices.append((i, handle, name, limit))
+        except Exception as e:
+            logger.warning("Error enumerating GPUs", error=str(e))
+            self._nvml_devices = []
+        self._nvml = pynvml
+        logger.info("NVML initialized", gpus=len(self._nvml_devices))
+    
+    def close(self) -> None:
+        """Stop the worker threads and release NVML."""
+        self._pool.shutdown(wait=True)
+        if self._nvml is not None:
+            try:
+                self._nvml.nvmlShutdown()
+            except Exception:
+                pass
+            self._nvml = None
+            self._nvml_devices = []
+        
+    def collect_cheap(self) -> Tuple[float, float]:
+        """Return (cpu percent, memory percent) in well under a millisecond.
         
+        Used by the scheduler to decide whether a full ``collect_all`` is
+        due. Uses psutil's overall CPU baseline, which is independent of the
+        per-core one behind ``collect_cpu_metrics``.
+        """
+        return psutil.cpu_percent(interval=None), psutil.virtual_memory().percent
+    
+    def _smooth_per_core(self, per_core: Tuple[float, ...]) -> Tuple[float, ...]:
+        """Fold a per-core sample into the EWMA state and return the result.
+        
+        The whole vector is updated with in-place NumPy ops, so the cost
+        does not grow with Python-level work per core.
+        """
+        sample = np.asarray(per_core, dtype=np.float64)
+        with self._ewma_lock:
+            state = self._per_core_ewma
+            if state is None or state.shape != sample.shape:
+                # First sample, or CPUs were hotplugged: restart from this one
+                self._per_core_ewma = state = sample
+            else:
+                state *= 1.0 - PER_CORE_EWMA_ALPHA
+                state += PER_CORE_EWMA_ALPHA * sample
+            return tuple(state.tolist())
+    
+    def _sample_per_core(self) -> Tuple[float, ...]:
+        """Per-core CPU percent since the previous sample, without sleeping.
+        
+        Back-to-back callers (e.g. concurrent requests) share the last
+        sample instead of measuring over a window of a few milliseconds,
+        which would also reset psutil's baseline for the next collection.
+        """
+        with self._cpu_lock:
+            sampled_at, per_core = self._cpu_sample
+            now = time.monotonic()
+            if now - sampled_at >= MIN_CPU_SAMPLE_INTERVAL or not per_core:
+                per_core = tuple(psutil.cpu_percent(interval=None, percpu=True))
+                self._cpu_sample = (now, per_core)
+            return per_core
+    
     def collect_cpu_metrics(self) -> CPUMetrics:
         """Collect CPU metrics."""
         try:
-            # Collect per-core first (includes overall) - more efficient than two separate calls
-            per_core = psutil.cpu_percent(interval=0.1, percpu=True)
+            # Non-blocking: usage since the previous collection (primed in __init__)
+            per_core = self._sample_per_core()
             # Calculate overall from per-core average instead of separate blocking call
             cpu_percent = sum(per_core) / len(per_core) if per_core else 0.0
-            load_avg = os.getloadavg() if hasattr(os, 'getloadavg') else [0.0, 0.0, 0.0]
+            load_avg = os.getloadavg() if hasattr(os, 'getloadavg') else (0.0, 0.0, 0.0)
             
             cpu_stats = psutil.cpu_stats()
             
             return CPUMetrics(
                 usage_percent=cpu_percent,
                 per_core=per_core,
-                load_average=list(load_avg),
+                load_average=load_avg,
                 context_switches=cpu_stats.ctx_switches,
                 interrupts=cpu_stats.interrupts,
+                per_core_smoothed=self._smooth_per_core(per_core),
             )
         except Exception as e:
             logger.error("Error collecting CPU metrics", error=str(e))
             return CPUMetrics(
                 usage_percent=0.0,
-                per_core=[],
-                load_average=[0.0, 0.0, 0.0],
+                per_core=(),
+                load_average=(0.0, 0.0, 0.0),
                 context_switches=0,
                 interrupts=0,
             )
@@ -82,23 +325,42 @@ class MetricsCollector:
                 swap_percent=0.0,
             )
     
+    def _get_partitions(self) -> list:
+        """Return monitored partitions, re-reading the mount table after a TTL."""
+        refreshed_at, partitions = self._partitions_cache
+        now = time.monotonic()
+        if now - refreshed_at > PARTITIONS_TTL:
+            partitions = [
+                partition for partition in psutil.disk_partitions(all=False)
+                if not is_pseudo_mount(partition.device, partition.mountpoint)
+            ]
+            self._partitions_cache = (now, partitions)
+        return partitions
+    
     def collect_disk_metrics(self) -> List[DiskMetrics]:
         """Collect disk metrics for all partitions."""
         disks = []
         try:
-            partitions = psutil.disk_partitions(all=False)
-            
-            for partition in partitions:
+            for partition in self._get_partitions():
                 try:
-                    usage = psutil.disk_usage(partition.mountpoint)
+                    st = os.statvfs(partition.mountpoint)
+                    if st.f_blocks == 0:
+                        continue
+                    
+                    # Same arithmetic as psutil.disk_usage: percent is relative
+                    # to the space available to unprivileged users
+                    total = st.f_blocks * st.f_frsize
+                    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+                    free = st.f_bavail * st.f_frsize
+                    user_total = used + free
                     
                     disks.append(DiskMetrics(
                         device=partition.device,
                         mountpoint=partition.mountpoint,
-                        total=usage.total,
-                        used=usage.used,
-                        free=usage.free,
-                        percent=usage.percent,
+                        total=total,
+                        used=used,
+                        free=free,
+                        percent=round(used / user_total * 100, 1) if user_total else 0.0,
                     ))
                 except (PermissionError, OSError) as e:
                     logger.debug("Cannot access partition", partition=partition.mountpoint, error=str(e))
@@ -109,11 +371,37 @@ class MetricsCollector:
             
         return disks
     
+    def _count_connections(self) -> int:
+        """Count inet sockets, from the kernel's sockstat totals on Linux."""
+        if not _HAS_PROCFS:
+            return len(psutil.net_connections())
+        
+        total = 0
+        for path in ("/proc/net/sockstat", "/proc/net/sockstat6"):
+            try:
+                with open(path, "rb", buffering=0) as f:
+                    data = f.read()
+            except OSError:
+                continue
+            total += sum(int(n) for n in _SOCKSTAT_INUSE.findall(data))
+        return total
+    
     def collect_network_metrics(self) -> NetworkMetrics:
         """Collect network metrics."""
         try:
             net_io = psutil.net_io_counters()
-            connections = len(psutil.net_connections())
+            connections = self._count_connections()
+            
+            now = time.monotonic()
+            with self._net_lock:
+                previous = self._net_baseline
+                self._net_baseline = _NetBaseline(now, net_io.bytes_sent, net_io.bytes_recv)
+            elapsed = now - previous.timestamp
+            send_rate = recv_rate = 0.0
+            # Counters can go backwards when an interface is removed
+            if elapsed > 0:
+                send_rate = max(net_io.bytes_sent - previous.bytes_sent, 0) / elapsed
+                recv_rate = max(net_io.bytes_recv - previous.bytes_recv, 0) / elapsed
             
             return NetworkMetrics(
                 bytes_sent=net_io.bytes_sent,
@@ -121,6 +409,8 @@ class MetricsCollector:
                 packets_sent=net_io.packets_sent,
                 packets_recv=net_io.packets_recv,
                 connections=connections,
+                send_rate=send_rate,
+                recv_rate=recv_rate,
             )
         except Exception as e:
             logger.error("Error collecting network metrics", error=str(e))
@@ -132,95 +422,139 @@ class MetricsCollector:
                 connections=0,
             )
     
+    def _sample_processes_psutil(self) -> List[ProcessSample]:
+        """Sample processes through psutil (non-Linux fallback).
+        
+        Memory percent is derived from RSS here: psutil's memory_percent
+        re-reads memory_info and the system memory total for every process.
+        """
+        samples = []
+        mem_total = psutil.virtual_memory().total
+        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent']):
+            try:
+                info = proc.info
+                rss = proc.memory_info().rss
+                samples.append((
+                    info['cpu_percent'] or 0.0,
+                    info['pid'],
+                    info['name'],
+                    rss / mem_total * 100 if mem_total else 0.0,
+                    rss,
+                ))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return samples
+    
     def collect_top_processes(self, count: int = 10) -> List[ProcessInfo]:
         """Collect information about top processes by CPU usage."""
-        processes = []
-        
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'memory_info']):
-                try:
-                    info = proc.info
-                    memory_mb = info['memory_info'].rss / (1024 * 1024) if info.get('memory_info') else 0.0
-                    
-                    processes.append(ProcessInfo(
-                        pid=info['pid'],
-                        name=info['name'],
-                        cpu_percent=info['cpu_percent'] or 0.0,
-                        memory_percent=info['memory_percent'] or 0.0,
-                        memory_mb=memory_mb,
-                    ))
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+            if self._proc_sampler is not None:
+                samples = self._proc_sampler.sample()
+            else:
+                samples = self._sample_processes_psutil()
             
-            # Sort by CPU usage and take top N
-            processes.sort(key=lambda p: p.cpu_percent, reverse=True)
-            return processes[:count]
+            # Top N by CPU usage in O(N log count), on raw tuples so only
+            # the survivors are turned into models
+            top = heapq.nlargest(count, samples, key=itemgetter(0))
+            return [
+                ProcessInfo(
+                    pid=pid,
+                    name=name,
+                    cpu_percent=cpu_percent,
+                    memory_percent=memory_percent,
+                    memory_mb=rss / (1024 * 1024),
+                )
+                for cpu_percent, pid, name, memory_percent, rss in top
+            ]
             
         except Exception as e:
             logger.error("Error collecting process info", error=str(e))
             return []
     
+    def collect_gpu_metrics(self) -> List[GPUMetrics]:
+        """Collect utilization, memory, temperature and power for NVIDIA GPUs."""
+        pynvml = self._nvml
+        if pynvml is None:
+            return []
+        
+        gpus = []
+        for index, handle, name, limit in self._nvml_devices:
+            try:
+                util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+            except Exception as e:
+                logger.debug("Cannot query GPU", index=index, error=str(e))
+                continue
+            temp = None
+            power = None
+            try:
+                temp = float(pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU))
+            except Exception:
+                pass
+            try:
+                power = float(pynvml.nvmlDeviceGetPowerUsage(handle)) / 1000.0
+            except Exception:
+                pass
+            mem_used_mb = mem.used / (1024 * 1024)
+            mem_total_mb = mem.total / (1024 * 1024)
+            mem_util = (mem_used_mb / mem_total_mb * 100.0) if mem_total_mb > 0 else 0.0
+            gpus.append(GPUMetrics(
+                index=index,
+                name=name,
+                utilization_percent=float(util.gpu),
+                memory_used_mb=mem_used_mb,
+                memory_total_mb=mem_total_mb,
+                memory_util_percent=mem_util,
+                temperature_c=temp,
+                power_watts=power,
+                power_limit_watts=limit,
+            ))
+        return gpus
+    
     def collect_all(self, top_process_count: int = 10) -> SystemMetrics:
         """Collect all system metrics."""
         try:
-            boot_time = datetime.fromtimestamp(psutil.boot_time())
-            uptime = (datetime.now() - boot_time).total_seconds()
-            # Try to collect GPU metrics via pynvml (NVIDIA)
-            gpus = []
-            try:
-                import pynvml  # type: ignore
-                pynvml.nvmlInit()
-                count = pynvml.nvmlDeviceGetCount()
-                for i in range(count):
-                    h = pynvml.nvmlDeviceGetHandleByIndex(i)
-                    name = pynvml.nvmlDeviceGetName(h).decode("utf-8") if hasattr(pynvml.nvmlDeviceGetName(h), 'decode') else str(pynvml.nvmlDeviceGetName(h))
-                    util = pynvml.nvmlDeviceGetUtilizationRates(h)
-                    mem = pynvml.nvmlDeviceGetMemoryInfo(h)
-                    temp = None
-                    power = None
-                    limit = None
-                    try:
-                        temp = float(pynvml.nvmlDeviceGetTemperature(h, pynvml.NVML_TEMPERATURE_GPU))
-                    except Exception:
-                        pass
-                    try:
-                        power = float(pynvml.nvmlDeviceGetPowerUsage(h)) / 1000.0
-                        limit = float(pynvml.nvmlDeviceGetEnforcedPowerLimit(h)) / 1000.0
-                    except Exception:
-                        pass
-                    mem_used_mb = mem.used / (1024 * 1024)
-                    mem_total_mb = mem.total / (1024 * 1024)
-                    mem_util = (mem_used_mb / mem_total_mb * 100.0) if mem_total_mb > 0 else 0.0
-                    gpus.append(GPUMetrics(
-                        index=i,
-                        name=name,
-                        utilization_percent=float(util.gpu),
-                        memory_used_mb=mem_used_mb,
-                        memory_total_mb=mem_total_mb,
-                        memory_util_percent=mem_util,
-                        temperature_c=temp,
-                        power_watts=power,
-                        power_limit_watts=limit,
-                    ))
-                try:
-                    pynvml.nvmlShutdown()
-                except Exception:
-                    pass
-            except Exception:
-                gpus = []
+            # One clock read per snapshot; boot time is fixed
+            now = datetime.now()
+            
+            # The collectors are independent and mostly in GIL-releasing
+            # syscalls, so run them concurrently
+            cpu = self._pool.submit(self.collect_cpu_metrics)
+            memory = self._pool.submit(self.collect_memory_metrics)
+            disks = self._pool.submit(self.collect_disk_metrics)
+            network = self._pool.submit(self.collect_network_metrics)
+            processes = self._pool.submit(self.collect_top_processes, top_process_count)
+            gpus = self._pool.submit(self.collect_gpu_metrics)
             
             return SystemMetrics(
-                timestamp=datetime.now(),
-                cpu=self.collect_cpu_metrics(),
-                memory=self.collect_memory_metrics(),
-                disks=self.collect_disk_metrics(),
-                network=self.collect_network_metrics(),
-                top_processes=self.collect_top_processes(top_process_count),
-                gpus=gpus,
-                uptime_seconds=uptime,
-                boot_time=boot_time,
+                timestamp=now,
+                cpu=cpu.result(),
+                memory=memory.result(),
+                disks=disks.result(),
+                network=network.result(),
+                top_processes=processes.result(),
+                gpus=gpus.result(),
+                uptime_seconds=(now - self._boot_time).total_seconds(),
+                boot_time=self._boot_time,
             )
         except Exception as e:
             logger.error("Error collecting system metrics", error=str(e))
             raise
 
+
+_collector_singleton: Optional[MetricsCollector] = None
+_collector_lock = threading.Lock()
+
+
+def get_collector() -> MetricsCollector:
+    """Return the process-wide collector.
+    
+    psutil keeps its CPU percent baselines in module globals, so two
+    collectors in one process would reset each other's deltas; everything
+    should share this instance.
+    """
+    global _collector_singleton
+    with _collector_lock:
+        if _collector_singleton is None:
+            _collector_singleton = MetricsCollector()
+        return _collector_singleton
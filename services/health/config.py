@@ -13,12 +13,18 @@ class HealthServiceConfig(BaseSettings):
     host: str = "0.0.0.0"
     
     # Collection intervals (seconds)
+    poll_interval: int = 5  # Cheap CPU/memory poll deciding whether a full snapshot is due
     collection_interval: int = 30  # Collect metrics every 30 seconds (reduced from 5s to save CPU)
     idle_collection_interval: int = 60  # When system is idle, collect less frequently
     idle_threshold: float = 20.0  # System is considered idle if CPU < 20%
+    current_metrics_max_age: float = 1.0  # Requests reuse a snapshot up to this old (seconds)
+    schedule_jitter: float = 0.1  # Background sleeps vary by +/- this fraction so hosts drift apart
     
     # Storage
     db_path: Path = Path(__file__).parent.parent.parent / "data" / "health.duckdb"
+    archive_path: Path = Path(__file__).parent.parent.parent / "data" / "health_metrics"  # Parquet, one dir per day
+    flush_interval: float = 5.0  # Write buffered rows at least this often (seconds)
+    flush_max_rows: int = 100  # ...or as soon as this many rows are buffered
     
     # Retention policy
     detailed_retention_days: int = 7  # Keep detailed metrics for 7 days
@@ -1,14 +1,72 @@
 """Anomaly detection and alerting."""
 
 from datetime import datetime
-from typing import List
+from typing import List, Sequence
+import numpy as np
 import structlog
 
+from collector import is_pseudo_mount
 from models import SystemMetrics, HealthAlert
 from config import HealthServiceConfig
 
+try:
+    from numba import njit
+except ImportError:  # Optional JIT; the NumPy scan below is used otherwise
+    njit = None
+
 logger = structlog.get_logger(__name__)
 
+# Columns of the sample matrix used by detect_anomalies_batch
+BATCH_COLUMNS = ("cpu", "memory", "swap", "disk")
+
+# Swap usage above this (strictly) raises a warning
+SWAP_WARNING_THRESHOLD = 50.0
+
+
+def _scan_thresholds_numpy(values, warn, crit, out_levels):
+    """Write 0 (ok), 1 (warning) or 2 (critical) per sample and column."""
+    out_levels[:] = np.where(values >= crit, 2, np.where(values >= warn, 1, 0))
+
+
+def _scan_thresholds_loop(values, warn, crit, out_levels):
+    """Scalar version of the threshold scan, compiled by numba."""
+    for i in range(values.shape[0]):
+        for j in range(values.shape[1]):
+            value = values[i, j]
+            if value >= crit[j]:
+                out_levels[i, j] = 2
+            elif value >= warn[j]:
+                out_levels[i, j] = 1
+            else:
+                out_levels[i, j] = 0
+
+
+_scan_thresholds = (
+    njit(cache=True)(_scan_thresholds_loop) if njit is not None else _scan_thresholds_numpy
+)
+
+
+def metrics_to_array(history: Sequence[SystemMetrics]) -> np.ndarray:
+    """Pack snapshots into a contiguous (N, 4) float64 matrix of BATCH_COLUMNS.
+    
+    The disk column holds the fullest monitored disk of each snapshot;
+    pseudo mounts are filtered here since stored snapshots may predate the
+    collector doing so.
+    """
+    samples = np.zeros((len(history), len(BATCH_COLUMNS)), dtype=np.float64)
+    for i, metrics in enumerate(history):
+        disk = max(
+            (d.percent for d in metrics.disks if not is_pseudo_mount(d.device, d.mountpoint)),
+            default=0.0
+        )
+        samples[i] = (
+            metrics.cpu.usage_percent,
+            metrics.memory.percent,
+            metrics.memory.swap_percent,
+            disk,
+        )
+    return samples
+
 
 class AnomalyDetector:
     """Detects anomalies in system metrics and generates alerts."""
@@ -19,27 +77,24 @@ class AnomalyDetector:
     
     def detect_anomalies(self, metrics: SystemMetrics) -> List[HealthAlert]:
         """Detect anomalies in metrics and return alerts."""
-        alerts = []
-        
-        # Check CPU usage
-        alerts.extend(self._check_cpu(metrics))
-        
-        # Check memory usage
-        alerts.extend(self._check_memory(metrics))
-        
-        # Check disk usage
-        alerts.extend(self._check_disks(metrics))
-        
-        return alerts
+        # One timestamp for every alert raised from this snapshot
+        now = datetime.now()
+        return [
+            *self._check_cpu(metrics, now),
+            *self._check_memory(metrics, now),
+            *self._check_disks(metrics, now),
+        ]
     
-    def _check_cpu(self, metrics: SystemMetrics) -> List[HealthAlert]:
+    def _check_cpu(self, metrics: SystemMetrics, now: datetime) -> List[HealthAlert]:
         """Check CPU metrics for anomalies."""
         alerts = []
         cpu_usage = metrics.cpu.usage_percent
+        if cpu_usage < self.config.cpu_warning_threshold:
+            return alerts
         
         if cpu_usage >= self.config.cpu_critical_threshold:
             alerts.append(HealthAlert(
-                timestamp=datetime.now(),
+                timestamp=now,
                 level="critical",
                 category="cpu",
                 message=f"CPU usage is critically high: {cpu_usage:.1f}%",
@@ -48,7 +103,7 @@ class AnomalyDetector:
             ))
         elif cpu_usage >= self.config.cpu_warning_threshold:
             alerts.append(HealthAlert(
-                timestamp=datetime.now(),
+                timestamp=now,
                 level="warning",
                 category="cpu",
                 message=f"CPU usage is high: {cpu_usage:.1f}%",
@@ -58,14 +113,14 @@ class AnomalyDetector:
         
         return alerts
     
-    def _check_memory(self, metrics: SystemMetrics) -> List[HealthAlert]:
+    def _check_memory(self, metrics: SystemMetrics, now: datetime) -> List[HealthAlert]:
         """Check memory metrics for anomalies."""
         alerts = []
         mem_usage = metrics.memory.percent
         
         if mem_usage >= self.config.memory_critical_threshold:
             alerts.append(HealthAlert(
-                timestamp=datetime.now(),
+                timestamp=now,
                 level="critical",
                 category="memory",
                 message=f"Memory usage is critically high: {mem_usage:.1f}%",
@@ -74,7 +129,7 @@ class AnomalyDetector:
             ))
         elif mem_usage >= self.config.memory_warning_threshold:
             alerts.append(HealthAlert(
-                timestamp=datetime.now(),
+                timestamp=now,
                 level="warning",
                 category="memory",
                 message=f"Memory usage is high: {mem_usage:.1f}%",
@@ -84,36 +139,35 @@ class AnomalyDetector:
         
         # Check swap usage
         swap_usage = metrics.memory.swap_percent
-        if swap_usage > 50.0:
+        if swap_usage > SWAP_WARNING_THRESHOLD:
             alerts.append(HealthAlert(
-                timestamp=datetime.now(),
+                timestamp=now,
                 level="warning",
                 category="memory",
                 message=f"Swap usage is high: {swap_usage:.1f}%",
                 value=swap_usage,
-                threshold=50.0,
+                threshold=SWAP_WARNING_THRESHOLD,
             ))
         
         return alerts
     
-    def _check_disks(self, metrics: SystemMetrics) -> List[HealthAlert]:
-        """Check disk metrics for anomalies."""
+    def _check_disks(self, metrics: SystemMetrics, now: datetime) -> List[HealthAlert]:
+        """Check disk metrics for anomalies.
+        
+        Snap/loop images and special mounts are already dropped once, when
+        the collector caches the partition list, so no per-disk filter runs
+        here.
+        """
         alerts = []
         
         for disk in metrics.disks:
-            # Skip snap mounts and loop devices (they're always 100% and read-only)
-            if disk.mountpoint.startswith('/snap/') or '/loop' in disk.device:
-                continue
-            
-            # Skip other special mounts
-            if disk.mountpoint.startswith('/run/') or disk.mountpoint.startswith('/sys/'):
-                continue
-            
             disk_usage = disk.percent
+            if disk_usage < self.config.disk_warning_threshold:
+                continue
             
             if disk_usage >= self.config.disk_critical_threshold:
                 alerts.append(HealthAlert(
-                    timestamp=datetime.now(),
+                    timestamp=now,
                     level="critical",
                     category="disk",
                     message=f"Disk {disk.mountpoint} is critically full: {disk_usage:.1f}%",
@@ -122,7 +176,7 @@ class AnomalyDetector:
                 ))
             elif disk_usage >= self.config.disk_warning_threshold:
                 alerts.append(HealthAlert(
-                    timestamp=datetime.now(),
+                    timestamp=now,
                     level="warning",
                     category="disk",
                     message=f"Disk {disk.mountpoint} is filling up: {disk_usage:.1f}%",
@@ -132,6 +186,34 @@ class AnomalyDetector:
         
         return alerts
     
+    def detect_anomalies_batch(self, samples: np.ndarray) -> np.ndarray:
+        """Classify many samples at once (e.g. replaying stored history).
+        
+        Args:
+            samples: (N, 4) matrix with columns BATCH_COLUMNS, as returned
+                by ``metrics_to_array``
+        
+        Returns:
+            (N, 4) int8 matrix of alert levels: 0 ok, 1 warning, 2 critical.
+            Uses the same thresholds as ``detect_anomalies``.
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.float64)
+        warn = np.array([
+            self.config.cpu_warning_threshold,
+            self.config.memory_warning_threshold,
+            np.nextafter(SWAP_WARNING_THRESHOLD, np.inf),
+            self.config.disk_warning_threshold,
+        ])
+        crit = np.array([
+            self.config.cpu_critical_threshold,
+            self.config.memory_critical_threshold,
+            np.inf,  # Swap only ever warns
+            self.config.disk_critical_threshold,
+        ])
+        levels = np.empty(samples.shape, dtype=np.int8)
+        _scan_thresholds(samples, warn, crit, levels)
+        return levels
+    
     def get_overall_status(self, alerts: List[HealthAlert]) -> str:
         """Determine overall system health status."""
         if not alerts:
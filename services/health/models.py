@@ -1,20 +1,38 @@
-"""Data models for health monitoring service."""
+"""Data models for health monitoring service.
+
+Metrics, alerts and responses are produced internally and trusted, so they
+are frozen ``msgspec.Struct`` types: construction does no validation and
+``msgspec.json.encode`` serializes them directly. They only ever form trees,
+never reference cycles, so they are also excluded from cyclic GC tracking
+(``gc=False``). Request models parse external input, so they are plain
+(validating) structs decoded straight from the request bytes.
+"""
 
 from datetime import datetime
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Tuple
+
+import msgspec
+
+# Shared encoder; reusing one avoids re-creating its internal buffers per call
+_ENCODER = msgspec.json.Encoder()
+
 
+def to_json(obj) -> bytes:
+    """Encode models (or builtins containing them) as JSON bytes."""
+    return _ENCODER.encode(obj)
 
-class CPUMetrics(BaseModel):
+
+class CPUMetrics(msgspec.Struct, frozen=True, gc=False):
     """CPU metrics."""
     usage_percent: float
-    per_core: List[float]
-    load_average: List[float]  # 1, 5, 15 minute averages
+    per_core: Tuple[float, ...]
+    load_average: Tuple[float, ...]  # 1, 5, 15 minute averages
     context_switches: int
     interrupts: int
+    per_core_smoothed: Tuple[float, ...] = ()  # EWMA of per_core; not stored
 
 
-class MemoryMetrics(BaseModel):
+class MemoryMetrics(msgspec.Struct, frozen=True, gc=False):
     """Memory metrics."""
     total: int  # bytes
     available: int
@@ -25,7 +43,7 @@ class MemoryMetrics(BaseModel):
     swap_percent: float
 
 
-class DiskMetrics(BaseModel):
+class DiskMetrics(msgspec.Struct, frozen=True, gc=False):
     """Disk metrics for a single partition."""
     device: str
     mountpoint: str
@@ -35,16 +53,19 @@ class DiskMetrics(BaseModel):
     percent: float
 
 
-class NetworkMetrics(BaseModel):
+class NetworkMetrics(msgspec.Struct, frozen=True, gc=False):
     """Network metrics."""
     bytes_sent: int
     bytes_recv: int
     packets_sent: int
     packets_recv: int
     connections: int
+    # Bytes/s since the previous collection; not stored
+    send_rate: float = 0.0
+    recv_rate: float = 0.0
 
 
-class ProcessInfo(BaseModel):
+class ProcessInfo(msgspec.Struct, frozen=True, gc=False):
     """Information about a single process."""
     pid: int
     name: str
@@ -53,7 +74,7 @@ class ProcessInfo(BaseModel):
     memory_mb: float
 
 
-class GPUMetrics(BaseModel):
+class GPUMetrics(msgspec.Struct, frozen=True, gc=False):
     """GPU metrics (primarily NVIDIA via NVML)."""
     index: int
     name: str
@@ -66,7 +87,7 @@ class GPUMetrics(BaseModel):
     power_limit_watts: Optional[float] = None
 
 
-class SystemMetrics(BaseModel):
+class SystemMetrics(msgspec.Struct, frozen=True, kw_only=True, gc=False):
     """Complete system metrics snapshot."""
     timestamp: datetime
     cpu: CPUMetrics
@@ -74,17 +95,16 @@ class SystemMetrics(BaseModel):
     disks: List[DiskMetrics]
     network: NetworkMetrics
     top_processes: List[ProcessInfo]
-    gpus: List[GPUMetrics] = Field(default_factory=list)
+    gpus: List[GPUMetrics] = []
     uptime_seconds: float
     boot_time: datetime
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    def to_json_bytes(self) -> bytes:
+        """Encode the snapshot as JSON bytes."""
+        return _ENCODER.encode(self)
 
 
-class HealthAlert(BaseModel):
+class HealthAlert(msgspec.Struct, frozen=True, gc=False):
     """Health alert/warning."""
     timestamp: datetime
     level: str  # "warning" or "critical"
@@ -92,21 +112,16 @@ class HealthAlert(BaseModel):
     message: str
     value: float
     threshold: float
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
-class HealthSummary(BaseModel):
+class HealthSummary(msgspec.Struct, frozen=True, gc=False):
     """Summary of system health."""
     current_metrics: SystemMetrics
     alerts: List[HealthAlert]
     status: str  # "healthy", "warning", "critical"
 
 
-class HealthHistoryRequest(BaseModel):
+class HealthHistoryRequest(msgspec.Struct, frozen=True):
     """Request for historical health data."""
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
@@ -114,7 +129,26 @@ class HealthHistoryRequest(BaseModel):
     limit: int = 100
 
 
-class HealthHistoryResponse(BaseModel):
+class HealthAlertsRequest(msgspec.Struct, frozen=True):
+    """Request for recent alerts."""
+    hours: int = 24
+
+
+_HISTORY_REQUEST_DECODER = msgspec.json.Decoder(HealthHistoryRequest)
+_ALERTS_REQUEST_DECODER = msgspec.json.Decoder(HealthAlertsRequest)
+
+
+def decode_history_request(data: bytes) -> HealthHistoryRequest:
+    """Decode a history request body; an empty body means all defaults."""
+    return _HISTORY_REQUEST_DECODER.decode(data or b"{}")
+
+
+def decode_alerts_request(data: bytes) -> HealthAlertsRequest:
+    """Decode an alerts request body; an empty body means all defaults."""
+    return _ALERTS_REQUEST_DECODER.decode(data or b"{}")
+
+
+class HealthHistoryResponse(msgspec.Struct, frozen=True, gc=False):
     """Response with historical health data."""
     metrics: List[SystemMetrics]
     count: int
@@ -1,11 +1,17 @@
 """Health monitoring service main entry point."""
 
 import asyncio
+import functools
+import random
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import Optional, Tuple, Union
 import structlog
-from fastapi import FastAPI, HTTPException
+import msgspec
+from fastapi import FastAPI, HTTPException, Request, Response
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "packages" / "common"))
@@ -15,18 +21,27 @@ from neuralux.logger import setup_logging
 from neuralux.messaging import MessageBusClient
 
 from config import HealthServiceConfig
-from collector import MetricsCollector
+from collector import get_collector
 from storage import HealthStorage
 from detector import AnomalyDetector
 from models import (
     HealthSummary,
     HealthHistoryRequest,
     HealthHistoryResponse,
+    SystemMetrics,
+    decode_alerts_request,
+    decode_history_request,
+    to_json,
 )
 
 logger = structlog.get_logger(__name__)
 
 
+def _json_response(obj) -> Response:
+    """Serialize a msgspec model straight to a JSON HTTP response."""
+    return Response(content=to_json(obj), media_type="application/json")
+
+
 class HealthService:
     """Health monitoring service."""
     
@@ -36,8 +51,10 @@ class HealthService:
         self.neuralux_config = NeuraluxConfig()
         self.message_bus = MessageBusClient(self.neuralux_config)
         
-        self.collector = MetricsCollector()
+        self.collector = get_collector()
         self.storage = HealthStorage(self.config)
+        # DuckDB writes (flushes, archiving) run here, off the event loop
+        self._storage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health-storage")
         self.detector = AnomalyDetector(self.config)
         
         self.app = FastAPI(
@@ -47,25 +64,31 @@ class HealthService:
         )
         self._setup_routes()
         
-        self.collection_task = None
-        self.cleanup_task = None
+        # Supervises the collection, cleanup and flush loops
+        self.background_task: Optional[asyncio.Task] = None
         
+        # Most recent snapshot as (monotonic time, metrics), shared by the
+        # collection loop and request handlers
+        self._latest: Optional[Tuple[float, SystemMetrics]] = None
+        self._refresh_lock = asyncio.Lock()
+    
     async def connect_to_message_bus(self):
         """Connect to NATS and register handlers."""
         await self.message_bus.connect()
         
-        # Register reply handlers (for request-response pattern)
+        # Register reply handlers (for request-response pattern). They take
+        # the raw request bytes and decode them straight into msgspec models.
         await self.message_bus.reply_handler(
-            "system.health.current", self._handle_current_request
+            "system.health.current", self._handle_current_request, raw=True
         )
         await self.message_bus.reply_handler(
-            "system.health.history", self._handle_history_request
+            "system.health.history", self._handle_history_request, raw=True
         )
         await self.message_bus.reply_handler(
-            "system.health.alerts", self._handle_alerts_request
+            "system.health.alerts", self._handle_alerts_request, raw=True
         )
         await self.message_bus.reply_handler(
-            "system.health.summary", self._handle_summary_request
+            "system.health.summary", self._handle_summary_request, raw=True
         )
         
         logger.info("Health service connected to NATS and handlers registered")
@@ -85,68 +108,73 @@ class HealthService:
         @self.app.get("/health")
         async def get_health():
             """Get current health summary."""
-            return await self._get_health_summary()
+            return _json_response(await self._get_health_summary())
         
         @self.app.post("/history")
-        async def get_history(request: HealthHistoryRequest):
-            """Get historical metrics."""
-            metrics = self.storage.get_metrics_history(
-                start_time=request.start_time,
-                end_time=request.end_time,
-                limit=request.limit
-            )
-            return HealthHistoryResponse(
-                metrics=metrics,
-                count=len(metrics)
-            )
+        async def get_history(request: Request):
+            """Get historical metrics.
+            
+            The body is a JSON ``HealthHistoryRequest``.
+            """
+            try:
+                history_request = decode_history_request(await request.body())
+            except msgspec.DecodeError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            return _json_response(await self._get_history(history_request))
+    
+    async def _get_history(self, request: HealthHistoryRequest) -> HealthHistoryResponse:
+        """Query stored metrics on a worker thread, off the event loop."""
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(None, functools.partial(
+            self.storage.get_metrics_history,
+            start_time=request.start_time,
+            end_time=request.end_time,
+            limit=request.limit
+        ))
+        return HealthHistoryResponse(
+            metrics=metrics,
+            count=len(metrics)
+        )
     
-    async def _handle_current_request(self, data: dict) -> dict:
+    async def _handle_current_request(self, data: bytes) -> Union[bytes, dict]:
         """Handle request for current metrics."""
         try:
-            metrics = self.collector.collect_all(self.config.top_processes_count)
-            return metrics.model_dump(mode='json')
+            metrics = await self._get_current_metrics()
+            return metrics.to_json_bytes()
         except Exception as e:
             logger.error("Error handling current request", error=str(e))
             return {"error": str(e)}
     
-    async def _handle_history_request(self, data: dict) -> dict:
+    async def _handle_history_request(self, data: bytes) -> Union[bytes, dict]:
         """Handle request for historical metrics."""
         try:
-            request = HealthHistoryRequest(**data)
-            metrics = self.storage.get_metrics_history(
-                start_time=request.start_time,
-                end_time=request.end_time,
-                limit=request.limit
-            )
-            response = HealthHistoryResponse(
-                metrics=metrics,
-                count=len(metrics)
-            )
-            return response.model_dump(mode='json')
+            request = decode_history_request(data)
+            return to_json(await self._get_history(request))
         except Exception as e:
             logger.error("Error handling history request", error=str(e))
             return {"error": str(e)}
     
-    async def _handle_alerts_request(self, data: dict) -> dict:
+    async def _handle_alerts_request(self, data: bytes) -> Union[bytes, dict]:
         """Handle request for recent alerts."""
         try:
-            hours = data.get("hours", 24)
-            alerts = self.storage.get_recent_alerts(hours)
-            return {
-                "alerts": [alert.model_dump(mode='json') for alert in alerts],
+            request = decode_alerts_request(data)
+            loop = asyncio.get_running_loop()
+            alerts = await loop.run_in_executor(None, self.storage.get_recent_alerts, request.hours)
+            return to_json({
+                "alerts": alerts,
                 "count": len(alerts)
-            }
+            })
         except Exception as e:
             logger.error("Error handling alerts request", error=str(e))
             return {"error": str(e)}
     
-    async def _handle_summary_request(self, data: dict) -> dict:
+    async def _handle_summary_request(self, data: bytes) -> Union[bytes, dict]:
         """Handle request for health summary."""
         try:
             logger.info("Handling summary request")
             summary = await self._get_health_summary()
-            result = summary.model_dump(mode='json')
-            logger.info("Summary request successful", result_keys=list(result.keys()))
+            result = to_json(summary)
+            logger.info("Summary request successful", size=len(result))
             return result
         except Exception as e:
             logger.error("Error handling summary request", error=str(e), exc_info=True)
@@ -155,7 +183,7 @@ class HealthService:
     async def _get_health_summary(self) -> HealthSummary:
         """Get current health summary."""
         # Collect current metrics
-        metrics = self.collector.collect_all(self.config.top_processes_count)
+        metrics = await self._get_current_metrics()
         
         # Detect anomalies
         alerts = self.detector.detect_anomalies(metrics)
@@ -169,82 +197,193 @@ class HealthService:
             status=status
         )
     
+    def _jittered(self, interval: float) -> float:
+        """Spread a sleep by +/- ``schedule_jitter`` so replicas don't wake in phase."""
+        jitter = self.config.schedule_jitter
+        return interval * (1.0 - jitter + 2.0 * jitter * random.random())
+    
     async def start_collection(self):
-        """Start periodic metrics collection with adaptive intervals."""
+        """Start periodic metrics collection with adaptive intervals.
+        
+        Every ``poll_interval`` a cheap CPU/memory sample decides whether a
+        full snapshot is due: after ``collection_interval`` when busy, after
+        ``idle_collection_interval`` when idle, and immediately when CPU or
+        memory crosses its warning threshold.
+        """
         logger.info(
             "Starting metrics collection",
+            poll_interval=self.config.poll_interval,
             active_interval=self.config.collection_interval,
             idle_interval=self.config.idle_collection_interval,
             idle_threshold=self.config.idle_threshold
         )
         
+        loop = asyncio.get_running_loop()
+        last_full = None
+        was_alerting = False
+        
         while True:
             try:
-                # Collect metrics
-                metrics = self.collector.collect_all(self.config.top_processes_count)
-                
-                # Store metrics
-                self.storage.store_metrics(metrics)
-                
-                # Detect anomalies
-                alerts = self.detector.detect_anomalies(metrics)
-                
-                # Store alerts
-                for alert in alerts:
-                    self.storage.store_alert(alert)
-                    logger.warning(
-                        "Health alert",
-                        level=alert.level,
-                        category=alert.category,
-                        message=alert.message
-                    )
-                
-                # Adaptive interval: if system is idle, collect less frequently
-                cpu_usage = metrics.cpu.usage_percent
+                cpu_usage, mem_usage = self.collector.collect_cheap()
+                alerting = (
+                    cpu_usage >= self.config.cpu_warning_threshold
+                    or mem_usage >= self.config.memory_warning_threshold
+                )
                 if cpu_usage < self.config.idle_threshold:
-                    sleep_interval = self.config.idle_collection_interval
-                    logger.debug("System idle, using longer interval", cpu=cpu_usage, interval=sleep_interval)
+                    interval = self.config.idle_collection_interval
                 else:
-                    sleep_interval = self.config.collection_interval
+                    interval = self.config.collection_interval
                 
+                now = loop.time()
+                due = last_full is None or now - last_full >= interval
+                if due or (alerting and not was_alerting):
+                    last_full = now
+                    await self._collect_snapshot()
+                was_alerting = alerting
+            
             except Exception as e:
                 logger.error("Error in collection loop", error=str(e))
-                sleep_interval = self.config.collection_interval
             
-            await asyncio.sleep(sleep_interval)
+            await asyncio.sleep(self._jittered(self.config.poll_interval))
+    
+    async def _collect_metrics(self) -> SystemMetrics:
+        """Take a full snapshot in a worker thread and remember it."""
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(
+            None, self.collector.collect_all, self.config.top_processes_count
+        )
+        self._latest = (time.monotonic(), metrics)
+        return metrics
+    
+    async def _get_current_metrics(self) -> SystemMetrics:
+        """Return a snapshot at most ``current_metrics_max_age`` seconds old.
+        
+        Concurrent callers that find the cache stale wait for a single
+        refresh instead of each walking every process.
+        """
+        max_age = self.config.current_metrics_max_age
+        latest = self._latest
+        if latest is not None and time.monotonic() - latest[0] < max_age:
+            return latest[1]
+        
+        async with self._refresh_lock:
+            # Another caller may have refreshed while we waited
+            latest = self._latest
+            if latest is not None and time.monotonic() - latest[0] < max_age:
+                return latest[1]
+            return await self._collect_metrics()
+    
+    async def _collect_snapshot(self):
+        """Collect, store and check one full metrics snapshot.
+        
+        Collection runs in a worker thread; storing only queues rows, which
+        the flush task writes on the storage thread. A flush due early is
+        handed to that thread too, never run on the event loop.
+        """
+        # Same lock as request-driven refreshes, so two full collections
+        # never run at once and race on the collector's baselines
+        async with self._refresh_lock:
+            metrics = await self._collect_metrics()
+        
+        # Queue metrics for storage
+        flush_due = self.storage.store_metrics(metrics)
+        
+        # Detect anomalies
+        alerts = self.detector.detect_anomalies(metrics)
+        
+        for alert in alerts:
+            logger.warning(
+                "Health alert",
+                level=alert.level,
+                category=alert.category,
+                message=alert.message
+            )
+        
+        # Store alerts
+        flush_due = self.storage.store_alerts(alerts) or flush_due
+        if flush_due:
+            self._storage_executor.submit(self.storage.flush)
     
     async def start_cleanup(self):
         """Start periodic cleanup of old data."""
         logger.info("Starting cleanup task")
+        loop = asyncio.get_running_loop()
         
         while True:
             try:
                 # Run cleanup once per day
-                await asyncio.sleep(86400)  # 24 hours
-                self.storage.cleanup_old_data()
+                await asyncio.sleep(self._jittered(86400))  # 24 hours
+                await loop.run_in_executor(self._storage_executor, self.storage.cleanup_old_data)
             except Exception as e:
                 logger.error("Error in cleanup loop", error=str(e))
     
+    async def start_flush(self):
+        """Periodically write rows buffered by the storage layer."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._jittered(self.config.flush_interval))
+            try:
+                await loop.run_in_executor(self._storage_executor, self.storage.flush)
+            except Exception as e:
+                logger.error("Error in flush loop", error=str(e))
+    
     async def start(self):
         """Start the health service."""
         try:
             await self.connect_to_message_bus()
             
             # Start background tasks
-            self.collection_task = asyncio.create_task(self.start_collection())
-            self.cleanup_task = asyncio.create_task(self.start_cleanup())
+            self.background_task = asyncio.create_task(self._run_background())
             
             logger.info("Health service started")
         except Exception as e:
             logger.error("Failed to start health service", error=str(e))
     
+    async def _run_background(self):
+        """Run the background loops as one group.
+        
+        Same contract as asyncio.TaskGroup, which Python 3.10 (still
+        supported by install.sh) lacks: cancelling this task cancels every
+        loop, a loop that dies from an unexpected error cancels the others
+        and is logged here, and no loop outlives this task.
+        """
+        loops = [
+            asyncio.ensure_future(self.start_collection()),
+            asyncio.ensure_future(self.start_cleanup()),
+            asyncio.ensure_future(self.start_flush()),
+        ]
+        try:
+            done, _ = await asyncio.wait(loops, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(
+                        "Background loop failed",
+                        loop=task.get_coro().__qualname__,
+                        error=str(task.exception())
+                    )
+        finally:
+            for task in loops:
+                task.cancel()
+            # Wait for the cancellations to finish, so no loop is still
+            # touching storage once this task is done
+            await asyncio.gather(*loops, return_exceptions=True)
+    
     async def stop(self):
         """Stop the health service."""
         logger.info("Stopping health service")
-        if self.collection_task:
-            self.collection_task.cancel()
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Drain buffered rows on the storage thread, queued behind any
+        # in-flight flush; shielded so a cancelled shutdown cannot drop them
+        loop = asyncio.get_running_loop()
+        await asyncio.shield(loop.run_in_executor(self._storage_executor, self.storage.close))
+        self._storage_executor.shutdown(wait=True)
+        self.collector.close()
         await self.disconnect_from_message_bus()
 
 
@@ -1,17 +1,240 @@
 """Time-series storage for health metrics using DuckDB."""
 
 import duckdb
+import shutil
+import threading
+from collections import defaultdict
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
 import structlog
-import json
+import msgspec
 
-from models import SystemMetrics, HealthAlert
+from models import (
+    SystemMetrics,
+    HealthAlert,
+    CPUMetrics,
+    MemoryMetrics,
+    DiskMetrics,
+    NetworkMetrics,
+    ProcessInfo,
+    to_json,
+)
 from config import HealthServiceConfig
 
 logger = structlog.get_logger(__name__)
 
+# Native LIST/STRUCT types for the nested metrics columns; field names
+# match the models so rows convert back without renaming
+_DISKS_TYPE = (
+    "STRUCT(device VARCHAR, mountpoint VARCHAR, total BIGINT, used BIGINT, "
+    "free BIGINT, percent DOUBLE)[]"
+)
+_PROCESSES_TYPE = (
+    "STRUCT(pid INTEGER, name VARCHAR, cpu_percent DOUBLE, "
+    "memory_percent DOUBLE, memory_mb DOUBLE)[]"
+)
+
+# Metrics table layout, shared by the rollup tables
+_METRICS_COLUMNS = (
+    ("timestamp", "TIMESTAMP"),
+    ("cpu_usage", "FLOAT"),
+    ("cpu_per_core", "DOUBLE[]"),
+    ("load_average", "DOUBLE[]"),
+    ("memory_total", "BIGINT"),
+    ("memory_used", "BIGINT"),
+    ("memory_percent", "FLOAT"),
+    ("swap_used", "BIGINT"),
+    ("swap_percent", "FLOAT"),
+    ("disks", _DISKS_TYPE),
+    ("network_bytes_sent", "BIGINT"),
+    ("network_bytes_recv", "BIGINT"),
+    ("network_connections", "INTEGER"),
+    ("top_processes", _PROCESSES_TYPE),
+    ("uptime_seconds", "FLOAT"),
+    ("boot_time", "TIMESTAMP"),
+)
+_METRICS_DDL = ", ".join(f"{name} {column_type}" for name, column_type in _METRICS_COLUMNS)
+_NESTED_COLUMNS = {
+    name: column_type for name, column_type in _METRICS_COLUMNS
+    if column_type.endswith("[]")
+}
+
+# Where each metrics column comes from in a SystemMetrics ``m``
+_METRICS_ROW_EXPRESSIONS = {
+    "timestamp": "m.timestamp",
+    "cpu_usage": "m.cpu.usage_percent",
+    "cpu_per_core": "m.cpu.per_core",
+    "load_average": "m.cpu.load_average",
+    "memory_total": "m.memory.total",
+    "memory_used": "m.memory.used",
+    "memory_percent": "m.memory.percent",
+    "swap_used": "m.memory.swap_used",
+    "swap_percent": "m.memory.swap_percent",
+    "disks": "m.disks",
+    "network_bytes_sent": "m.network.bytes_sent",
+    "network_bytes_recv": "m.network.bytes_recv",
+    "network_connections": "m.network.connections",
+    "top_processes": "m.top_processes",
+    "uptime_seconds": "m.uptime_seconds",
+    "boot_time": "m.boot_time",
+}
+
+
+def _compile_row_builder():
+    """Generate ``build_row(m) -> tuple`` for the fixed metrics layout.
+    
+    The function is emitted once from _METRICS_COLUMNS, so the row is a
+    single tuple display with every attribute path spelled out; sub-structs
+    read more than once are bound to locals first, and the JSON encoder is
+    a closure constant rather than a module global lookup.
+    """
+    parents = sorted({
+        expression.split(".")[1] for expression in _METRICS_ROW_EXPRESSIONS.values()
+        if expression.count(".") == 2
+    })
+    fields = []
+    for name, _ in _METRICS_COLUMNS:
+        expression = _METRICS_ROW_EXPRESSIONS[name]
+        for parent in parents:
+            expression = expression.replace(f"m.{parent}.", f"{parent}.")
+        if name in _NESTED_COLUMNS:
+            expression = f"encode({expression}).decode()"
+        fields.append(expression)
+    
+    lines = ["def build_row(m, encode=encode):"]
+    lines += [f"    {parent} = m.{parent}" for parent in parents]
+    lines.append("    return (" + ", ".join(fields) + ",)")
+    namespace = {"encode": to_json}
+    exec(compile("\n".join(lines), "<metrics row builder>", "exec"), namespace)
+    return namespace["build_row"]
+
+
+_build_metrics_row = _compile_row_builder()
+
+# Nested values are bound as JSON text and cast by DuckDB: binding Python
+# lists of dicts directly is over 10x slower. The VALUES list names its
+# columns col0, col1, ... in metrics row order.
+_METRICS_INSERT_SELECT = ", ".join(
+    f"CAST(CAST(col{i} AS JSON) AS {column_type})" if name in _NESTED_COLUMNS else f"col{i}"
+    for i, (name, column_type) in enumerate(_METRICS_COLUMNS)
+)
+
+# Bulk ingestion selects the metrics columns by name from the source, in
+# time order so the rollup upserts see each bucket's latest row last
+_BULK_INGEST_SELECT = (
+    f"SELECT {', '.join(name for name, _ in _METRICS_COLUMNS)} "
+    "FROM {source} ORDER BY timestamp"
+)
+
+# Parquet v2 pages let DuckDB pick DELTA_BINARY_PACKED for timestamps and
+# counters and BYTE_STREAM_SPLIT for floats, which zstd then compresses far
+# better than plain pages (about 3x smaller archives on collector data)
+_ARCHIVE_COPY_OPTIONS = (
+    "FORMAT PARQUET, COMPRESSION zstd, PARQUET_VERSION v2, "
+    "PARTITION_BY (date), APPEND"
+)
+# Under archive_path; not matched by the date=* globs that read the archive
+_ARCHIVE_STAGING = ".staging"
+
+# Pre-aggregated metrics as (table, bucket unit, bucket seconds, retention
+# setting), coarsest first. Rows have the metrics columns, so they read back
+# as SystemMetrics, plus a sample count; timestamp is the bucket start.
+ROLLUPS = (
+    ("metrics_1d", "day", 86400, "summary_retention_days"),
+    ("metrics_1h", "hour", 3600, "aggregated_retention_days"),
+    ("metrics_1m", "minute", 60, "detailed_retention_days"),
+)
+
+# Averaged over a bucket; every other column keeps the bucket's latest value
+_ROLLUP_AVERAGED = {
+    "cpu_usage", "memory_used", "memory_percent",
+    "swap_used", "swap_percent", "network_connections",
+}
+
+
+def _rollup_select(unit: str, source: str) -> str:
+    """Aggregate rows of ``source`` into one row per ``unit`` bucket."""
+    columns = []
+    for name, column_type in _METRICS_COLUMNS:
+        if name == "timestamp":
+            columns.append(f"date_trunc('{unit}', timestamp) AS timestamp")
+        elif name in _ROLLUP_AVERAGED:
+            columns.append(f"CAST(avg({name}) AS {column_type}) AS {name}")
+        else:
+            columns.append(f"arg_max({name}, timestamp) AS {name}")
+    columns.append("count(*) AS samples")
+    return f"SELECT {', '.join(columns)} FROM {source} GROUP BY 1"
+
+
+def _rollup_upsert(table: str, unit: str) -> str:
+    """Fold the rows of metrics_batch into an existing rollup table.
+    
+    Averages are merged weighted by sample count; batches arrive in time
+    order, so the batch's latest values replace the stored ones.
+    """
+    updates = []
+    for name, column_type in _METRICS_COLUMNS[1:]:
+        if name in _ROLLUP_AVERAGED:
+            updates.append(
+                f"{name} = CAST(({name} * samples + EXCLUDED.{name} * EXCLUDED.samples)"
+                f" / (samples + EXCLUDED.samples) AS {column_type})"
+            )
+        else:
+            updates.append(f"{name} = EXCLUDED.{name}")
+    updates.append("samples = samples + EXCLUDED.samples")
+    return (
+        f"INSERT INTO {table} {_rollup_select(unit, 'metrics_batch')} "
+        f"ON CONFLICT (timestamp) DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+_ROLLUP_UPSERTS = [_rollup_upsert(table, unit) for table, unit, _, _ in ROLLUPS]
+
+# Nested columns are read back as JSON text: DuckDB renders it much faster
+# than it builds Python lists and dicts, and msgspec decodes it straight
+# into the models (about 4x faster end to end for a 1000-row history)
+_METRICS_READ_SELECT = ", ".join(
+    f"CAST(to_json({name}) AS VARCHAR) AS {name}" if name in _NESTED_COLUMNS else name
+    for name, _ in _METRICS_COLUMNS
+)
+_FLOATS_DECODER = msgspec.json.Decoder(Tuple[float, ...])
+_DISKS_DECODER = msgspec.json.Decoder(List[DiskMetrics])
+_PROCESSES_DECODER = msgspec.json.Decoder(List[ProcessInfo])
+
+# History queries by which of (start_time, end_time) are bound. The text is
+# fixed per shape, and the bounds stay in the WHERE clause, so DuckDB can
+# skip row groups (and Parquet files) outside the range using their
+# timestamp min/max stats. {source} is the table, or the table plus archive.
+_HISTORY_SELECT = f"SELECT {_METRICS_READ_SELECT} FROM {{source}}"
+_HISTORY_ORDER = " ORDER BY timestamp DESC LIMIT ?"
+_HISTORY_QUERIES = {
+    (False, False): _HISTORY_SELECT + _HISTORY_ORDER,
+    (True, False): _HISTORY_SELECT + " WHERE timestamp >= ?" + _HISTORY_ORDER,
+    (False, True): _HISTORY_SELECT + " WHERE timestamp <= ?" + _HISTORY_ORDER,
+    (True, True): _HISTORY_SELECT + " WHERE timestamp BETWEEN ? AND ?" + _HISTORY_ORDER,
+}
+
+# Sample counts per hour of a staged batch, for the count wheel
+_BATCH_HOUR_COUNTS = (
+    "SELECT date_trunc('hour', timestamp), count(*) FROM metrics_batch GROUP BY 1"
+)
+
+
+def _bucket_start(timestamp: datetime, unit: str) -> datetime:
+    """Start of the rollup bucket holding a timestamp (date_trunc in Python)."""
+    timestamp = timestamp.replace(second=0, microsecond=0)
+    if unit in ("hour", "day"):
+        timestamp = timestamp.replace(minute=0)
+    if unit == "day":
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def _hour_key(timestamp: datetime) -> int:
+    """Count wheel slot of a timestamp: hours since 0001-01-01."""
+    return timestamp.toordinal() * 24 + timestamp.hour
+
 
 class HealthStorage:
     """Manages time-series storage of health metrics in DuckDB."""
@@ -24,35 +247,38 @@ class HealthStorage:
         # Ensure directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
+        # Completed days of metrics live in Parquet, one directory per day
+        self.archive_path = config.archive_path
+        self.archive_path.mkdir(parents=True, exist_ok=True)
+        self._has_archive = any(self.archive_path.glob("date=*/*.parquet"))
+        
+        # One long-lived connection for writes, serialized by _write_lock.
+        # Reads run on their own cursors so they never wait for a flush.
+        self._conn = duckdb.connect(str(self.db_path))
+        self._write_lock = threading.Lock()
+        # Guards only the buffers, so queueing never waits on the database
+        self._buffer_lock = threading.Lock()
+        
+        # Rows waiting for the next batched insert
+        self._metrics_buffer: List[tuple] = []
+        self._alerts_buffer: List[tuple] = []
+        
+        # Samples stored per hour (see _hour_key), so history queries over
+        # ranges with no data return without scanning. Written under
+        # _write_lock; only hours with samples have a slot.
+        self._count_wheel: Dict[int, int] = defaultdict(int)
+        
         # Initialize database
         self._init_database()
-        
+    
     def _init_database(self):
         """Initialize database schema."""
         try:
-            conn = duckdb.connect(str(self.db_path))
+            conn = self._conn
             
             # Create metrics table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS metrics (
-                    timestamp TIMESTAMP,
-                    cpu_usage FLOAT,
-                    cpu_per_core VARCHAR,
-                    load_average VARCHAR,
-                    memory_total BIGINT,
-                    memory_used BIGINT,
-                    memory_percent FLOAT,
-                    swap_used BIGINT,
-                    swap_percent FLOAT,
-                    disks VARCHAR,
-                    network_bytes_sent BIGINT,
-                    network_bytes_recv BIGINT,
-                    network_connections INTEGER,
-                    top_processes VARCHAR,
-                    uptime_seconds FLOAT,
-                    boot_time TIMESTAMP
-                )
-            """)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS metrics ({_METRICS_DDL})")
+            self._migrate_json_columns()
             
             # Create index on timestamp for faster queries
             conn.execute("""
@@ -60,6 +286,27 @@ class HealthStorage:
                 ON metrics(timestamp)
             """)
             
+            # Staging table for the rows of one flush
+            conn.execute("CREATE TEMP TABLE metrics_batch AS SELECT * FROM metrics LIMIT 0")
+            
+            # Create rollup tables, filling new ones from existing history
+            existing = {
+                row[0] for row in conn.execute(
+                    "SELECT table_name FROM information_schema.tables"
+                ).fetchall()
+            }
+            for table, unit, _, _ in ROLLUPS:
+                if table in existing:
+                    continue
+                conn.execute(f"""
+                    CREATE TABLE {table} (
+                        {_METRICS_DDL}, samples BIGINT, PRIMARY KEY (timestamp)
+                    )
+                """)
+                conn.execute(f"INSERT INTO {table} {_rollup_select(unit, self._metrics_source())}")
+            
+            self._load_count_wheel()
+            
             # Create alerts table
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS alerts (
@@ -78,87 +325,264 @@ class HealthStorage:
                 ON alerts(timestamp)
             """)
             
-            conn.close()
             logger.info("Database initialized", path=str(self.db_path))
-            
+        
         except Exception as e:
             logger.error("Error initializing database", error=str(e))
             raise
     
-    def store_metrics(self, metrics: SystemMetrics):
-        """Store a metrics snapshot."""
+    def _migrate_json_columns(self):
+        """Convert nested columns of databases created before native types.
+        
+        Those stored JSON text in VARCHAR columns; DuckDB parses it into the
+        LIST/STRUCT types in place. The timestamp index blocks ALTER, so it
+        is dropped here and recreated by the caller.
+        """
+        column_types = dict(self._conn.execute("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_name = 'metrics'
+        """).fetchall())
+        legacy = [
+            column for column in _NESTED_COLUMNS
+            if column_types.get(column) == "VARCHAR"
+        ]
+        if not legacy:
+            return
+        
+        self._conn.execute("DROP INDEX IF EXISTS idx_metrics_timestamp")
+        for column in legacy:
+            column_type = _NESTED_COLUMNS[column]
+            self._conn.execute(
+                f"ALTER TABLE metrics ALTER {column} TYPE {column_type} "
+                f"USING CAST(CAST({column} AS JSON) AS {column_type})"
+            )
+        logger.info("Migrated metrics columns to native types", columns=legacy)
+    
+    def _load_count_wheel(self):
+        """Rebuild the count wheel from the rollups.
+        
+        The hourly rollup gives exact counts. Older days only survive in the
+        daily rollup, so every hour of such a day gets the day's count: the
+        wheel may then claim data for an hour that has none, which only
+        costs a query, never a missed row.
+        """
+        self._count_wheel.clear()
+        for table, unit in (("metrics_1d", "day"), ("metrics_1h", "hour")):
+            rows = self._conn.execute(f"SELECT timestamp, samples FROM {table}").fetchall()
+            for bucket, samples in rows:
+                key = _hour_key(bucket)
+                if unit == "day":
+                    for hour in range(key, key + 24):
+                        self._count_wheel[hour] = samples
+                else:
+                    self._count_wheel[key] = samples
+    
+    def _range_is_empty(self, start_time: Optional[datetime], end_time: Optional[datetime]) -> bool:
+        """Whether the count wheel shows no samples between the bounds."""
+        if not self._count_wheel:
+            return True
+        if start_time is None:
+            return False
+        
+        first = _hour_key(start_time)
+        last = _hour_key(end_time or datetime.now())
+        if last - first + 1 <= len(self._count_wheel):
+            return not any(hour in self._count_wheel for hour in range(first, last + 1))
+        # Snapshot the keys; flushes may add slots concurrently
+        return not any(first <= hour <= last for hour in list(self._count_wheel))
+    
+    def _samples_in_range(self, start_time: datetime, end_time: Optional[datetime]) -> int:
+        """Upper bound on the samples stored between the bounds, from the count wheel."""
+        first = _hour_key(start_time)
+        last = _hour_key(end_time or datetime.now())
+        # Snapshot the items; flushes may add slots concurrently
+        return sum(count for hour, count in list(self._count_wheel.items()) if first <= hour <= last)
+    
+    def store_metrics(self, metrics: SystemMetrics) -> bool:
+        """Queue a metrics snapshot for the next batched insert.
+        
+        Returns True when enough rows are buffered that the owner should
+        run ``flush`` now (see ``_flush_due``).
+        """
         try:
-            conn = duckdb.connect(str(self.db_path))
-            
-            conn.execute("""
-                INSERT INTO metrics VALUES (
-                    ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-                )
-            """, (
-                metrics.timestamp,
-                metrics.cpu.usage_percent,
-                json.dumps(metrics.cpu.per_core),
-                json.dumps(metrics.cpu.load_average),
-                metrics.memory.total,
-                metrics.memory.used,
-                metrics.memory.percent,
-                metrics.memory.swap_used,
-                metrics.memory.swap_percent,
-                json.dumps([d.model_dump(mode='json') for d in metrics.disks]),
-                metrics.network.bytes_sent,
-                metrics.network.bytes_recv,
-                metrics.network.connections,
-                json.dumps([p.model_dump() for p in metrics.top_processes]),
-                metrics.uptime_seconds,
-                metrics.boot_time,
-            ))
-            
-            conn.close()
-            logger.debug("Metrics stored", timestamp=metrics.timestamp)
-            
+            row = _build_metrics_row(metrics)
+            with self._buffer_lock:
+                self._metrics_buffer.append(row)
+            logger.debug("Metrics queued", timestamp=metrics.timestamp)
+            return self._flush_due()
+        
         except Exception as e:
             logger.error("Error storing metrics", error=str(e))
+            return False
     
     def store_alert(self, alert: HealthAlert):
-        """Store a health alert."""
+        """Queue a health alert for the next batched insert."""
+        self.store_alerts([alert])
+    
+    def store_alerts(self, alerts: List[HealthAlert]) -> bool:
+        """Queue all alerts of one snapshot with a single buffer update.
+        
+        Returns True when the owner should run ``flush`` now.
+        """
+        if not alerts:
+            return False
         try:
-            conn = duckdb.connect(str(self.db_path))
-            
-            conn.execute("""
-                INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                alert.timestamp,
-                alert.level,
-                alert.category,
-                alert.message,
-                alert.value,
-                alert.threshold,
-            ))
-            
-            conn.close()
-            logger.info("Alert stored", level=alert.level, category=alert.category)
-            
+            rows = [
+                (
+                    alert.timestamp,
+                    alert.level,
+                    alert.category,
+                    alert.message,
+                    alert.value,
+                    alert.threshold,
+                )
+                for alert in alerts
+            ]
+            with self._buffer_lock:
+                self._alerts_buffer.extend(rows)
+            logger.info("Alerts queued", count=len(rows))
+            return self._flush_due()
+        
         except Exception as e:
-            logger.error("Error storing alert", error=str(e))
+            logger.error("Error storing alerts", error=str(e))
+            return False
+    
+    def _flush_due(self) -> bool:
+        """Whether ``flush_max_rows`` rows are waiting in the buffers.
+        
+        Queueing never writes: the caller may be an event loop, and a
+        flush can wait on _write_lock behind an archive or cleanup. The
+        owner runs ``flush`` on its storage thread when this is True, and
+        every ``flush_interval`` otherwise.
+        """
+        pending = len(self._metrics_buffer) + len(self._alerts_buffer)
+        return pending >= self.config.flush_max_rows
+    
+    def _insert_rows(self, table: str, rows: List[tuple], select: Optional[str] = None):
+        """Insert rows with a single multi-row VALUES statement.
+        
+        Binding everything to one statement is cheaper than executemany,
+        which plans and runs the INSERT once per row. ``select``, if given,
+        maps the VALUES columns (col0, col1, ...) onto the table.
+        """
+        placeholders = "(" + ", ".join("?" * len(rows[0])) + ")"
+        values = ", ".join([placeholders] * len(rows))
+        if select is None:
+            query = f"INSERT INTO {table} VALUES {values}"
+        else:
+            query = f"INSERT INTO {table} SELECT {select} FROM (VALUES {values})"
+        self._conn.execute(query, [value for row in rows for value in row])
+    
+    def flush(self):
+        """Write all buffered rows and fold new metrics into the rollups."""
+        with self._write_lock:
+            self._flush_locked()
+    
+    def _flush_for_read(self):
+        """Flush so a read sees buffered rows, unless a write holds the lock.
+        
+        Reads never wait behind an archive or cleanup; rows queued in the
+        meantime show up once the owner's next flush has run.
+        """
+        if self._write_lock.acquire(blocking=False):
+            try:
+                self._flush_locked()
+            finally:
+                self._write_lock.release()
+    
+    def _flush_locked(self):
+        """Body of ``flush``; the caller holds _write_lock."""
+        with self._buffer_lock:
+            metrics_rows, self._metrics_buffer = self._metrics_buffer, []
+            alert_rows, self._alerts_buffer = self._alerts_buffer, []
+        if not metrics_rows and not alert_rows:
+            return
+        
+        try:
+            self._conn.execute("BEGIN TRANSACTION")
+            if metrics_rows:
+                self._conn.execute("DELETE FROM metrics_batch")
+                self._insert_rows("metrics_batch", metrics_rows, _METRICS_INSERT_SELECT)
+                self._conn.execute("INSERT INTO metrics SELECT * FROM metrics_batch")
+                for upsert in _ROLLUP_UPSERTS:
+                    self._conn.execute(upsert)
+            if alert_rows:
+                self._insert_rows("alerts", alert_rows)
+            self._conn.execute("COMMIT")
+            for row in metrics_rows:
+                self._count_wheel[_hour_key(row[0])] += 1
+            logger.debug("Storage flushed", metrics=len(metrics_rows), alerts=len(alert_rows))
+        except Exception as e:
+            self._conn.execute("ROLLBACK")
+            logger.error("Error flushing storage", error=str(e), dropped=len(metrics_rows) + len(alert_rows))
+    
+    def bulk_ingest(self, data: Union[str, Path, Any]) -> int:
+        """Load many metrics rows at once, e.g. from a backup or an export.
+        
+        ``data`` is a path or glob of Parquet files (such as an archive
+        partition), or an in-memory table DuckDB can scan directly (a
+        pyarrow Table or pandas DataFrame), with the metrics column names.
+        DuckDB reads the source column-wise in one INSERT ... SELECT, with
+        no per-row binding, and the rows go through the same staging table
+        and rollup upserts as a flush. Returns the number of rows ingested.
+        """
+        self.flush()
+        
+        with self._write_lock:
+            registered = not isinstance(data, (str, Path))
+            if registered:
+                self._conn.register("bulk_source", data)
+                source = "bulk_source"
+            else:
+                source = f"read_parquet('{data}')"
+            
+            self._conn.execute("BEGIN TRANSACTION")
+            try:
+                self._conn.execute("DELETE FROM metrics_batch")
+                self._conn.execute(
+                    "INSERT INTO metrics_batch " + _BULK_INGEST_SELECT.format(source=source)
+                )
+                hour_counts = self._conn.execute(_BATCH_HOUR_COUNTS).fetchall()
+                count = sum(samples for _, samples in hour_counts)
+                self._conn.execute("INSERT INTO metrics SELECT * FROM metrics_batch")
+                for upsert in _ROLLUP_UPSERTS:
+                    self._conn.execute(upsert)
+                self._conn.execute("COMMIT")
+                for hour, samples in hour_counts:
+                    self._count_wheel[_hour_key(hour)] += samples
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                if registered:
+                    self._conn.unregister("bulk_source")
+        
+        logger.info("Metrics ingested", rows=count)
+        return count
+    
+    def close(self):
+        """Flush buffered rows and close the connection."""
+        self.flush()
+        with self._write_lock:
+            self._conn.close()
     
     def get_latest_metrics(self) -> Optional[SystemMetrics]:
         """Get the most recent metrics."""
         try:
-            conn = duckdb.connect(str(self.db_path))
+            # Reads should see rows still sitting in the buffers
+            self._flush_for_read()
             
-            result = conn.execute("""
-                SELECT * FROM metrics 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-            """).fetchone()
-            
-            conn.close()
+            with self._conn.cursor() as cursor:
+                result = cursor.execute(
+                    _HISTORY_QUERIES[(False, False)].format(source=self._metrics_source()),
+                    (1,)
+                ).fetchone()
             
             if not result:
                 return None
             
             return self._row_to_metrics(result)
-            
+        
         except Exception as e:
             logger.error("Error getting latest metrics", error=str(e))
             return None
@@ -169,47 +593,62 @@ class HealthStorage:
         end_time: Optional[datetime] = None,
         limit: int = 100
     ) -> List[SystemMetrics]:
-        """Get historical metrics."""
+        """Get historical metrics.
+        
+        When the range holds more samples than ``limit``, rows come from the
+        finest rollup with at most ``limit`` buckets in the range, each row
+        averaging one bucket, so the result spans the whole range instead
+        of only its newest part.
+        """
         try:
-            conn = duckdb.connect(str(self.db_path))
-            
-            query = "SELECT * FROM metrics WHERE 1=1"
-            params = []
-            
-            if start_time:
-                query += " AND timestamp >= ?"
-                params.append(start_time)
-            
-            if end_time:
-                query += " AND timestamp <= ?"
-                params.append(end_time)
-            
-            query += " ORDER BY timestamp DESC LIMIT ?"
+            # Reads should see rows still sitting in the buffers
+            self._flush_for_read()
+            
+            # Sparse windows (e.g. just after startup) skip the scan entirely
+            if self._range_is_empty(start_time, end_time):
+                return []
+            
+            source, unit = self._history_source(start_time, end_time, limit)
+            if unit is not None:
+                # Include the bucket the range starts in
+                start_time = _bucket_start(start_time, unit)
+            query = _HISTORY_QUERIES[(start_time is not None, end_time is not None)]
+            query = query.format(source=source)
+            params = [t for t in (start_time, end_time) if t is not None]
             params.append(limit)
             
-            results = conn.execute(query, params).fetchall()
-            conn.close()
+            with self._conn.cursor() as cursor:
+                results = cursor.execute(query, params).fetchall()
             
             return [self._row_to_metrics(row) for row in results]
-            
+        
         except Exception as e:
             logger.error("Error getting metrics history", error=str(e))
             return []
     
+    def get_metrics_by_time_range(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        limit: int = 100
+    ) -> List[SystemMetrics]:
+        """Get metrics with start_time <= timestamp <= end_time, newest first."""
+        return self.get_metrics_history(start_time=start_time, end_time=end_time, limit=limit)
+    
     def get_recent_alerts(self, hours: int = 24) -> List[HealthAlert]:
         """Get recent alerts."""
         try:
-            conn = duckdb.connect(str(self.db_path))
+            # Reads should see rows still sitting in the buffers
+            self._flush_for_read()
             
             since = datetime.now() - timedelta(hours=hours)
             
-            results = conn.execute("""
-                SELECT * FROM alerts 
-                WHERE timestamp >= ?
-                ORDER BY timestamp DESC
-            """, (since,)).fetchall()
-            
-            conn.close()
+            with self._conn.cursor() as cursor:
+                results = cursor.execute("""
+                    SELECT * FROM alerts 
+                    WHERE timestamp >= ?
+                    ORDER BY timestamp DESC
+                """, (since,)).fetchall()
             
             alerts = []
             for row in results:
@@ -223,40 +662,143 @@ class HealthStorage:
                 ))
             
             return alerts
-            
+        
         except Exception as e:
             logger.error("Error getting recent alerts", error=str(e))
             return []
     
+    def _history_source(
+        self,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        limit: int
+    ) -> Tuple[str, Optional[str]]:
+        """Pick the table for a history query, as (source, rollup unit or None).
+        
+        Raw samples are used when the range holds no more than ``limit``
+        of them; otherwise the finest rollup whose bucket count over the
+        range fits in ``limit``, or the coarsest one if none does.
+        """
+        if start_time is None or limit <= 0 or self._samples_in_range(start_time, end_time) <= limit:
+            return self._metrics_source(), None
+        
+        span = ((end_time or datetime.now()) - start_time).total_seconds()
+        for table, unit, bucket_seconds, _ in reversed(ROLLUPS):
+            # A range may straddle one more bucket than span / bucket
+            if span / bucket_seconds + 1 <= limit:
+                return table, unit
+        table, unit, _, _ = ROLLUPS[0]
+        return table, unit
+    
+    def _metrics_source(self) -> str:
+        """FROM-clause source covering both live and archived metrics."""
+        if not self._has_archive:
+            return "metrics"
+        archive_glob = str(self.archive_path / "date=*" / "*.parquet")
+        return (
+            "(SELECT * FROM metrics UNION ALL BY NAME "
+            f"SELECT * EXCLUDE (date) FROM read_parquet('{archive_glob}', hive_partitioning = true))"
+        )
+    
+    def archive_completed_days(self):
+        """Move metrics from before today out of the table into day partitions.
+        
+        Each run appends one Parquet file per day under
+        ``archive_path/date=YYYY-MM-DD/``. The table then only ever holds the
+        current day, and retention can drop whole days as directories.
+        
+        A rollback cannot undo files already written, so the COPY goes to a
+        staging directory and its files move into the partitions only once
+        the DELETE has committed. A failed run leaves no files behind and
+        the next run archives the same rows once.
+        """
+        self.flush()
+        today = datetime.combine(date.today(), datetime.min.time())
+        staging = self.archive_path / _ARCHIVE_STAGING
+        
+        with self._write_lock:
+            count = self._conn.execute(
+                "SELECT count(*) FROM metrics WHERE timestamp < ?", (today,)
+            ).fetchone()[0]
+            if not count:
+                return
+            
+            # Left over by a process that died mid-run
+            shutil.rmtree(staging, ignore_errors=True)
+            
+            self._conn.execute("BEGIN TRANSACTION")
+            try:
+                self._conn.execute(f"""
+                    COPY (
+                        SELECT *, CAST(timestamp AS DATE) AS date
+                        FROM metrics WHERE timestamp < ?
+                    ) TO '{staging}' ({_ARCHIVE_COPY_OPTIONS})
+                """, (today,))
+                self._conn.execute("DELETE FROM metrics WHERE timestamp < ?", (today,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            
+            # File names are unique (APPEND), so they never replace older files
+            for staged in staging.glob("date=*/*.parquet"):
+                partition = self.archive_path / staged.parent.name
+                partition.mkdir(exist_ok=True)
+                staged.rename(partition / staged.name)
+            shutil.rmtree(staging, ignore_errors=True)
+            self._has_archive = True
+        
+        logger.info("Metrics archived", rows=count, before=today)
+    
     def cleanup_old_data(self):
         """Clean up old data based on retention policy."""
         try:
-            conn = duckdb.connect(str(self.db_path))
-            
-            # Delete detailed metrics older than retention period
-            cutoff = datetime.now() - timedelta(days=self.config.detailed_retention_days)
-            conn.execute("DELETE FROM metrics WHERE timestamp < ?", (cutoff,))
-            
-            # Delete old alerts
-            alert_cutoff = datetime.now() - timedelta(days=self.config.aggregated_retention_days)
-            conn.execute("DELETE FROM alerts WHERE timestamp < ?", (alert_cutoff,))
+            # Write out buffered rows and archive finished days first
+            self.archive_completed_days()
+            
+            # Drop whole day partitions older than the retention period
+            cutoff = date.today() - timedelta(days=self.config.detailed_retention_days)
+            for partition in self.archive_path.glob("date=*"):
+                try:
+                    day = date.fromisoformat(partition.name[len("date="):])
+                except ValueError:
+                    continue
+                if day < cutoff:
+                    shutil.rmtree(partition)
+            
+            with self._write_lock:
+                self._has_archive = any(self.archive_path.glob("date=*/*.parquet"))
+                
+                # Each rollup keeps its own retention period
+                for table, _, _, retention_setting in ROLLUPS:
+                    rollup_cutoff = datetime.now() - timedelta(days=getattr(self.config, retention_setting))
+                    self._conn.execute(f"DELETE FROM {table} WHERE timestamp < ?", (rollup_cutoff,))
+                
+                # Hours stay in the count wheel as long as any rollup may hold them
+                wheel_cutoff = _hour_key(datetime.now() - timedelta(days=max(
+                    getattr(self.config, retention_setting) for _, _, _, retention_setting in ROLLUPS
+                )))
+                for hour in [hour for hour in self._count_wheel if hour < wheel_cutoff]:
+                    del self._count_wheel[hour]
+                
+                # Delete old alerts
+                alert_cutoff = datetime.now() - timedelta(days=self.config.aggregated_retention_days)
+                self._conn.execute("DELETE FROM alerts WHERE timestamp < ?", (alert_cutoff,))
             
-            conn.close()
             logger.info("Old data cleaned up", cutoff=cutoff)
-            
+        
         except Exception as e:
             logger.error("Error cleaning up old data", error=str(e))
     
     def _row_to_metrics(self, row) -> SystemMetrics:
         """Convert a database row to SystemMetrics."""
-        from models import CPUMetrics, MemoryMetrics, DiskMetrics, NetworkMetrics, ProcessInfo
-        
         return SystemMetrics(
             timestamp=row[0],
             cpu=CPUMetrics(
                 usage_percent=row[1],
-                per_core=json.loads(row[2]),
-                load_average=json.loads(row[3]),
+                per_core=_FLOATS_DECODER.decode(row[2]),
+                load_average=_FLOATS_DECODER.decode(row[3]),
                 context_switches=0,  # Not stored
                 interrupts=0,  # Not stored
             ),
@@ -269,7 +811,7 @@ class HealthStorage:
                 swap_used=row[7],
                 swap_percent=row[8],
             ),
-            disks=[DiskMetrics(**d) for d in json.loads(row[9])],
+            disks=_DISKS_DECODER.decode(row[9]),
             network=NetworkMetrics(
                 bytes_sent=row[10],
                 bytes_recv=row[11],
@@ -277,7 +819,7 @@ class HealthStorage:
                 packets_recv=0,  # Not stored
                 connections=row[12],
             ),
-            top_processes=[ProcessInfo(**p) for p in json.loads(row[13])],
+            top_processes=_PROCESSES_DECODER.decode(row[13]),
             uptime_seconds=row[14],
             boot_time=row[15],
         )
@@ -20,6 +20,8 @@ class LLMServiceConfig(BaseSettings):
     service_name: str = "llm_service"
     service_port: int = 8000
     host: str = "0.0.0.0"
+    workers: int = 1  # uvicorn worker processes; each holds its own model replica in memory
+    replica_id: Optional[str] = None  # Also serve <llm_request_subject>.<replica_id> for balanced clients
     
     # Model paths
     model_path: Path = Path(__file__).parent.parent.parent / "models"
@@ -30,6 +32,36 @@ class LLMServiceConfig(BaseSettings):
     gpu_layers: int = -1  # -1 for auto, 0 for CPU only
     threads: int = 8
     batch_size: int = 512
+    ubatch_size: int = 512  # Physical batch per compute pass during prompt prefill
+    flash_attn: bool = True  # Fused attention kernel; required for a quantized V cache
+    use_mmap: bool = True  # Map weights from disk instead of copying them into memory
+    kv_cache_type: Optional[int] = 8  # GGML type of the K/V cache (8 = Q8_0); None keeps F16
+    prompt_cache_bytes: int = 2 << 30  # KV state cache for prefix reuse across turns; 0 disables
+    # Requests decoded together per llama_decode step; 1 runs them one at a
+    # time. Above 1 they decode in a second context (another KV cache of
+    # max_context cells) that does not use the prompt cache, so concurrent
+    # throughput is traded for prefix reuse across turns
+    parallel_sequences: int = 1
+    
+    # Response caches (0 disables): identical greedy requests, and paraphrases
+    # of a recent prompt, reuse the earlier reply
+    exact_cache_size: int = 1024
+    # The semantic cache only runs with a dedicated embedding_model: mean-pooled
+    # states of a chat model sit close together and give false hits
+    semantic_cache_size: int = 4096
+    semantic_cache_threshold: float = 0.95  # Cosine similarity for a cache hit
+    response_store_enabled: bool = True  # Persist cached replies in SQLite so they survive restarts
+    response_store_ttl_days: float = 7.0  # Persisted replies older than this are pruned
+    
+    # Embeddings (semantic cache, /v1/embeddings) come from a second context
+    # created with embeddings enabled; a generation context cannot output them
+    embedding_model: Optional[str] = None  # GGUF in model_path; None reuses default_model for /v1/embeddings only
+    embedding_context: int = 2048  # Longest text embedded in one pass, in tokens
+    embedding_gpu_layers: int = 0  # CPU by default, so the weights are not held twice in VRAM
+    
+    # Concurrent embedding requests coalesced into one model call
+    embed_batch_size: int = 32
+    embed_batch_delay_ms: float = 5.0  # How long to wait for more texts to batch
     
     # Generation defaults
     default_temperature: float = 0.7
@@ -41,6 +73,7 @@ class LLMServiceConfig(BaseSettings):
     llm_request_subject: str = "ai.llm.request"
     llm_stream_subject: str = "ai.llm.stream"
     llm_embed_subject: str = "ai.llm.embed"
+    llm_embed_batch_subject: str = "ai.llm.embed_batch"
     
     @property
     def model_full_path(self) -> Path:
@@ -0,0 +1,54 @@
+"""Compact wire encodings for embedding vectors.
+
+A float rendered as JSON text costs 8-20 bytes. ``fp16`` sends the vector
+as base64 of little-endian float16, about 2.7 bytes per dimension. ``int8``
+sends base64 of int8 codes plus one per-vector ``scale``, about 1.3 bytes
+per dimension.
+"""
+
+import base64
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from models import EmbeddingEncoding
+
+_FP16 = np.dtype("<f2")
+
+
+def encode_embedding(
+    embedding: Sequence[float], encoding: EmbeddingEncoding
+) -> Tuple[Union[List[float], str], Optional[float]]:
+    """Encode a vector for the wire, returning ``(payload, scale)``."""
+    if encoding == EmbeddingEncoding.FLOAT:
+        return embedding, None
+    
+    vector = np.asarray(embedding, dtype=np.float32)
+    if encoding == EmbeddingEncoding.FP16:
+        return base64.b64encode(vector.astype(_FP16).tobytes()).decode("ascii"), None
+    
+    # Symmetric per-vector quantization onto [-127, 127]
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0.0 else 1.0
+    codes = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return base64.b64encode(codes.tobytes()).decode("ascii"), scale
+
+
+def decode_embedding(
+    payload: Union[List[float], str],
+    encoding: Union[EmbeddingEncoding, str] = EmbeddingEncoding.FLOAT,
+    scale: Optional[float] = None,
+) -> np.ndarray:
+    """Decode an ``EmbedResponse`` payload back into a float32 vector.
+    
+    Clients call this with the response's ``embedding``, ``dtype`` and
+    ``scale`` fields.
+    """
+    encoding = EmbeddingEncoding(encoding)
+    if encoding == EmbeddingEncoding.FLOAT:
+        return np.asarray(payload, dtype=np.float32)
+    
+    raw = base64.b64decode(payload)
+    if encoding == EmbeddingEncoding.FP16:
+        return np.frombuffer(raw, dtype=_FP16).astype(np.float32)
+    return np.frombuffer(raw, dtype=np.int8).astype(np.float32) * np.float32(scale)
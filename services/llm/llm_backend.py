@@ -1,18 +1,71 @@
 """LLM backend using llama.cpp."""
 
+import asyncio
+import contextlib
+import functools
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import AsyncIterator, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
 import structlog
-from llama_cpp import Llama, LlamaGrammar
+from llama_cpp import (
+    LLAMA_POOLING_TYPE_MEAN,
+    LLAMA_POOLING_TYPE_UNSPECIFIED,
+    Llama,
+    LlamaGrammar,
+    LlamaRAMCache,
+)
+from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; loads are not serialized there
+    fcntl = None
 
 from config import LLMServiceConfig
 from models import LLMRequest, LLMResponse, Message, Role
+from scheduler import BatchScheduler, Sequence
+from stop_sequences import StopMatcher
 
 logger = structlog.get_logger(__name__)
 
+# Marks the end of a token stream handed over from the model thread
+_STREAM_END = object()
+
+# Stop sequences for the plain-text prompt used when a model has no template
+_PLAIN_STOP = ["User:", "\n\nUser:"]
+
+# Distinct system prompts whose token prefix is kept per loaded model
+_SYSTEM_PREFIX_CACHE_SIZE = 32
+
+
+@contextlib.contextmanager
+def _load_lock(model_path: Path):
+    """Hold an exclusive lock on a sidecar file while a model loads.
+    
+    Every uvicorn worker loads its own replica; taking turns keeps them
+    from reading and mapping the same GGUF at the same time.
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = model_path.with_name(model_path.name + ".loadlock")
+    try:
+        lock_file = open(lock_path, "a")
+    except OSError as e:
+        logger.debug("Model load lock unavailable", path=str(lock_path), error=str(e))
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
 class LlamaCppBackend:
     """Backend for running LLMs using llama.cpp."""
@@ -22,9 +75,24 @@ class LlamaCppBackend:
         self.config = config
         self.model: Optional[Llama] = None
         self.current_model_name: Optional[str] = None
+        self._model_path: Optional[Path] = None
+        # Embedding-only context, loaded on the first embedding request
+        self.embed_model: Optional[Llama] = None
         self._last_used: float = 0.0  # Track last usage time
         self._unload_timeout: int = 300  # Unload after 5 minutes of inactivity (configurable)
-        
+        # A Llama instance is not thread-safe, so every call into the model
+        # (load, generate, embed, unload) runs on this single worker thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llama")
+        # Compiled from the model's GGUF chat template at load time
+        self._chat_formatter: Optional[Jinja2ChatFormatter] = None
+        self._prefix_formatter: Optional[Jinja2ChatFormatter] = None
+        # System prompt -> (rendered system turn, its tokens)
+        self._system_prefixes: Dict[str, Tuple[str, List[int]]] = {}
+        # Concurrent requests share llama_decode steps instead of queueing
+        self._scheduler: Optional[BatchScheduler] = None
+        if config.parallel_sequences > 1:
+            self._scheduler = BatchScheduler(self, config.parallel_sequences)
+    
     def load_model(self, model_path: Optional[Path] = None) -> None:
         """Load a model from disk."""
         if model_path is None:
@@ -42,26 +110,117 @@ class LlamaCppBackend:
             model_path=str(model_path),
             gpu_layers=self.config.gpu_layers,
             context_size=self.config.max_context,
+            flash_attn=self.config.flash_attn,
+            kv_cache_type=self.config.kv_cache_type,
         )
         
+        # A quantized KV cache halves its memory traffic during decode
+        kv_cache_kwargs = {}
+        if self.config.kv_cache_type is not None:
+            kv_cache_kwargs = {
+                "type_k": self.config.kv_cache_type,
+                "type_v": self.config.kv_cache_type,
+            }
+        
         try:
-            self.model = Llama(
-                model_path=str(model_path),
-                n_ctx=self.config.max_context,
-                n_gpu_layers=self.config.gpu_layers,
-                n_threads=self.config.threads,
-                n_batch=self.config.batch_size,
-                verbose=False,
-            )
+            with _load_lock(model_path):
+                self.model = Llama(
+                    model_path=str(model_path),
+                    n_ctx=self.config.max_context,
+                    n_gpu_layers=self.config.gpu_layers,
+                    n_threads=self.config.threads,
+                    n_batch=self.config.batch_size,
+                    n_ubatch=self.config.ubatch_size,
+                    flash_attn=self.config.flash_attn,
+                    use_mmap=self.config.use_mmap,
+                    verbose=False,
+                    **kv_cache_kwargs,
+                )
+            if self.config.prompt_cache_bytes > 0:
+                # Keeps KV state snapshots keyed by token prefix; a chat turn
+                # restores the longest matching one and prefills only the
+                # tokens added since, even when conversations interleave
+                self.model.set_cache(LlamaRAMCache(capacity_bytes=self.config.prompt_cache_bytes))
+            self._load_chat_template()
+            self._model_path = model_path
             self.current_model_name = model_path.stem
             logger.info("Model loaded successfully", model=self.current_model_name)
         except Exception as e:
             logger.error("Failed to load model", error=str(e))
             raise
     
-    def _format_messages(self, messages: List[Message]) -> str:
-        """Format messages into a prompt string."""
-        # Simple chat format - can be improved with model-specific templates
+    def _load_chat_template(self) -> None:
+        """Compile the chat template embedded in the loaded GGUF, if any."""
+        self._chat_formatter = None
+        self._prefix_formatter = None
+        self._system_prefixes = {}
+        
+        template = self.model.metadata.get("tokenizer.chat_template")
+        if not template:
+            logger.info("Model has no chat template, using plain prompt format")
+            return
+        
+        def token_text(token_id: int) -> str:
+            return self.model._model.token_get_text(token_id) if token_id != -1 else ""
+        
+        eos_token = token_text(self.model.token_eos())
+        bos_token = token_text(self.model.token_bos())
+        self._chat_formatter = Jinja2ChatFormatter(
+            template=template,
+            eos_token=eos_token,
+            bos_token=bos_token,
+            add_generation_prompt=True,
+        )
+        # Renders a lone system turn, whose tokens are reused across requests
+        self._prefix_formatter = Jinja2ChatFormatter(
+            template=template,
+            eos_token=eos_token,
+            bos_token=bos_token,
+            add_generation_prompt=False,
+        )
+    
+    def _tokenize(self, text: str) -> List[int]:
+        """Tokenize rendered template text; the template supplies BOS itself."""
+        return self.model.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+    
+    def _system_prefix(self, content: str) -> Tuple[str, List[int]]:
+        """Rendered system turn and its tokens, tokenized once per system prompt."""
+        prefix = self._system_prefixes.get(content)
+        if prefix is None:
+            text = self._prefix_formatter(messages=[{"role": "system", "content": content}]).prompt
+            prefix = (text, self._tokenize(text))
+            if len(self._system_prefixes) >= _SYSTEM_PREFIX_CACHE_SIZE:
+                self._system_prefixes.pop(next(iter(self._system_prefixes)))
+            self._system_prefixes[content] = prefix
+        return prefix
+    
+    def _format_messages(
+        self, messages: List[Message]
+    ) -> Tuple[Union[str, List[int]], Union[str, List[str], None]]:
+        """Build the prompt and its default stop sequences (model thread).
+        
+        With a chat template the prompt is returned as tokens. The system
+        turn, which is identical across a conversation, is tokenized once
+        and only the text after it is tokenized per call. The KV cache then
+        skips re-evaluating whatever prefix it already holds.
+        """
+        if self._chat_formatter is None:
+            return self._format_plain(messages), _PLAIN_STOP
+        
+        chat = [{"role": msg.role.value, "content": msg.content} for msg in messages]
+        result = self._chat_formatter(messages=chat)
+        prompt = result.prompt
+        
+        if chat and chat[0]["role"] == Role.SYSTEM.value:
+            prefix_text, prefix_tokens = self._system_prefix(chat[0]["content"])
+            # Templates that stamp e.g. the current date may render differently
+            if prompt.startswith(prefix_text):
+                return prefix_tokens + self._tokenize(prompt[len(prefix_text):]), result.stop
+        
+        return self._tokenize(prompt), result.stop
+    
+    def _format_plain(self, messages: List[Message]) -> str:
+        """Format messages into a plain-text prompt string."""
         prompt_parts = []
         
         for msg in messages:
@@ -75,31 +234,99 @@ class LlamaCppBackend:
         prompt_parts.append("Assistant:")
         return "\n\n".join(prompt_parts)
     
+    async def run_in_model_thread(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking model call on the model thread without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    def effective_temperature(self, request: LLMRequest) -> float:
+        """Sampling temperature for a request; an explicit 0 means greedy."""
+        if request.temperature is not None:
+            return request.temperature
+        return self.config.default_temperature
+    
+    def _sampling_params(self, request: LLMRequest) -> Tuple[float, int, float, int]:
+        """Temperature, max tokens, top-p and top-k for a request."""
+        return (
+            self.effective_temperature(request),
+            request.max_tokens or self.config.default_max_tokens,
+            request.top_p or self.config.default_top_p,
+            request.top_k or self.config.default_top_k,
+        )
+    
+    def _submit(self, request: LLMRequest) -> Tuple[Sequence, asyncio.Queue]:
+        """Queue a request on the batch scheduler; its output arrives on the queue."""
+        temperature, max_tokens, top_p, top_k = self._sampling_params(request)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        seq = Sequence(
+            request.messages,
+            request.stop,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            emit=lambda item: loop.call_soon_threadsafe(queue.put_nowait, item),
+        )
+        self._scheduler.submit(seq)
+        return seq, queue
+    
+    async def _drain(self, queue: asyncio.Queue) -> AsyncIterator[str]:
+        """Yield a scheduled request's text until it ends."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    
+    def _prepare(
+        self, messages: List[Message], stop: Optional[List[str]]
+    ) -> Tuple[Union[str, List[int]], List[str]]:
+        """Load the model if needed and build the prompt and stops (model thread)."""
+        self.ensure_model_loaded()
+        prompt, default_stop = self._format_messages(messages)
+        stop = stop or default_stop
+        return prompt, [stop] if isinstance(stop, str) else list(stop or [])
+    
+    def _complete(self, messages: List[Message], stop: Optional[List[str]], **kwargs) -> Any:
+        """Run a completion, loading the model first if needed (model thread)."""
+        prompt, stop = self._prepare(messages, stop)
+        return self.model(prompt, stop=stop, **kwargs)
+    
     async def generate(self, request: LLMRequest) -> LLMResponse:
         """Generate a completion for the given request."""
-        self.ensure_model_loaded()
-        
-        prompt = self._format_messages(request.messages)
-        
-        temperature = request.temperature or self.config.default_temperature
-        max_tokens = request.max_tokens or self.config.default_max_tokens
-        top_p = request.top_p or self.config.default_top_p
-        top_k = request.top_k or self.config.default_top_k
+        temperature, max_tokens, top_p, top_k = self._sampling_params(request)
         
         logger.debug(
             "Generating completion",
-            prompt_length=len(prompt),
+            messages=len(request.messages),
             max_tokens=max_tokens,
         )
         
         try:
-            response = self.model(
-                prompt,
+            if self._scheduler is not None:
+                seq, queue = self._submit(request)
+                try:
+                    chunks = [chunk async for chunk in self._drain(queue)]
+                finally:
+                    seq.cancelled.set()  # Frees the slot if this task was cancelled
+                return LLMResponse(
+                    content="".join(chunks).strip(),
+                    model=self.current_model_name or "unknown",
+                    finish_reason=seq.finish_reason,
+                    tokens_used=seq.n_prompt + seq.n_generated,
+                )
+            
+            response = await self.run_in_model_thread(
+                self._complete,
+                request.messages,
+                request.stop,
                 max_tokens=max_tokens,
                 temperature=temperature,
                 top_p=top_p,
                 top_k=top_k,
-                stop=request.stop or ["User:", "\n\nUser:"],
                 echo=False,
             )
             
@@ -116,45 +343,127 @@ class LlamaCppBackend:
             raise
     
     async def generate_stream(self, request: LLMRequest) -> AsyncIterator[str]:
-        """Generate a streaming completion."""
-        self.ensure_model_loaded()
+        """Generate a streaming completion.
+        
+        Tokens are produced on the model thread and handed to the event loop
+        through a queue; generation stops early if the consumer goes away.
+        With the batch scheduler enabled, the request shares decode steps
+        with every other active one.
+        """
+        if self._scheduler is not None:
+            seq, queue = self._submit(request)
+            try:
+                async for chunk in self._drain(queue):
+                    yield chunk
+            except Exception as e:
+                logger.error("Streaming generation failed", error=str(e))
+                raise
+            finally:
+                seq.cancelled.set()
+            return
         
-        prompt = self._format_messages(request.messages)
+        temperature, max_tokens, top_p, top_k = self._sampling_params(request)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
         
-        temperature = request.temperature or self.config.default_temperature
-        max_tokens = request.max_tokens or self.config.default_max_tokens
-        top_p = request.top_p or self.config.default_top_p
-        top_k = request.top_k or self.config.default_top_k
+        def produce():
+            try:
+                prompt, stop = self._prepare(request.messages, request.stop)
+                # Stops are matched here in one pass per chunk, so llama_cpp
+                # skips its own per-token substring scan
+                matcher = StopMatcher(stop)
+                stream = self.model(
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=top_k,
+                    stop=[],
+                    echo=False,
+                    stream=True,
+                )
+                for chunk in stream:
+                    if cancelled.is_set():
+                        break
+                    text = matcher.feed(chunk["choices"][0]["text"])
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+                    if matcher.stopped:
+                        break
+                else:
+                    text = matcher.flush()
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
         
+        loop.run_in_executor(self._executor, produce)
         try:
-            stream = self.model(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                stop=request.stop or ["User:", "\n\nUser:"],
-                echo=False,
-                stream=True,
-            )
-            
-            for chunk in stream:
-                text = chunk["choices"][0]["text"]
-                if text:
-                    yield text
-        except Exception as e:
-            logger.error("Streaming generation failed", error=str(e))
-            raise
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    logger.error("Streaming generation failed", error=str(item))
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
     
     def get_embeddings(self, text: str) -> List[float]:
         """Get embeddings for text."""
+        return self.get_embeddings_batch([text])[0]
+    
+    def _load_embed_model(self) -> None:
+        """Load the embedding context (model thread).
+        
+        llama.cpp only outputs embeddings from a context created with them
+        enabled, and such a context no longer outputs logits, so embeddings
+        get a context of their own. Without a dedicated ``embedding_model``
+        it maps the chat model's weights again (shared through mmap on the
+        CPU) and mean-pools the token states, since chat models declare no
+        pooling of their own.
+        """
+        if self.config.embedding_model:
+            model_path = self.config.model_path / self.config.embedding_model
+            pooling_type = LLAMA_POOLING_TYPE_UNSPECIFIED
+        else:
+            model_path = self._model_path
+            pooling_type = LLAMA_POOLING_TYPE_MEAN
+        
+        logger.info(
+            "Loading embedding context",
+            model_path=str(model_path),
+            gpu_layers=self.config.embedding_gpu_layers,
+            context_size=self.config.embedding_context,
+        )
+        with _load_lock(model_path):
+            self.embed_model = Llama(
+                model_path=str(model_path),
+                embedding=True,
+                pooling_type=pooling_type,
+                n_ctx=self.config.embedding_context,
+                n_batch=self.config.embedding_context,
+                n_ubatch=self.config.embedding_context,
+                n_gpu_layers=self.config.embedding_gpu_layers,
+                n_threads=self.config.threads,
+                use_mmap=self.config.use_mmap,
+                verbose=False,
+            )
+    
+    def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for many texts, packed into shared decode batches."""
         self.ensure_model_loaded()
         
         try:
-            embedding = self.model.embed(text)
-            return embedding
+            if self.embed_model is None:
+                self._load_embed_model()
+            return self.embed_model.embed(texts)
         except Exception as e:
-            logger.error("Embedding generation failed", error=str(e))
+            logger.error("Embedding generation failed", error=str(e), texts=len(texts))
             raise
     
     def ensure_model_loaded(self) -> None:
@@ -176,9 +485,16 @@ class LlamaCppBackend:
         """Unload the current model."""
         if self.model:
             logger.info("Unloading LLM model", model=self.current_model_name)
+            if self._scheduler is not None:
+                # Its context refers to the model being freed
+                self._scheduler.release()
             del self.model
             self.model = None
+            self.embed_model = None
             self.current_model_name = None
+            self._chat_formatter = None
+            self._prefix_formatter = None
+            self._system_prefixes = {}
             self._last_used = 0.0
             # Force garbage collection and clear CUDA cache if available
             try:
@@ -1,10 +1,14 @@
 """Data models for LLM service."""
 
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, Union
 
+import msgspec
 from pydantic import BaseModel, Field
 
+# Shared encoder; reusing one avoids re-creating its internal buffers per call
+_ENCODER = msgspec.json.Encoder()
+
 
 class Role(str, Enum):
     """Message roles."""
@@ -31,24 +35,74 @@ class LLMRequest(BaseModel):
     stream: bool = False
 
 
-class LLMResponse(BaseModel):
-    """Response from LLM completion."""
+class LLMResponse(msgspec.Struct, frozen=True, gc=False):
+    """Response from LLM completion.
+    
+    Built by the backend and trusted, so a frozen ``msgspec.Struct`` rather
+    than a pydantic model: construction does no validation and ``to_json``
+    serializes it in one pass. Cached replies are shared between requests,
+    which being frozen also makes safe.
+    """
     content: str
     model: str
     finish_reason: str = "stop"
     tokens_used: int = 0
 
 
+_RESPONSE_DECODER = msgspec.json.Decoder(LLMResponse)
+
+
+def to_json(obj) -> bytes:
+    """Encode an LLMResponse (or builtins containing them) as JSON bytes."""
+    return _ENCODER.encode(obj)
+
+
+def decode_response(data: bytes) -> LLMResponse:
+    """Decode a response serialized with ``to_json``."""
+    return _RESPONSE_DECODER.decode(data)
+
+
+class EmbeddingEncoding(str, Enum):
+    """Wire encodings for embedding vectors."""
+    FLOAT = "float"  # JSON list of floats
+    FP16 = "fp16"  # base64 of little-endian float16
+    INT8 = "int8"  # base64 of int8 codes; multiply by scale to restore
+
+
 class EmbedRequest(BaseModel):
     """Request for text embedding."""
     text: str
     model: Optional[str] = None
+    encoding: EmbeddingEncoding = EmbeddingEncoding.FLOAT
 
 
 class EmbedResponse(BaseModel):
-    """Response with embeddings."""
-    embedding: List[float]
+    """Response with embeddings.
+    
+    Non-float encodings carry the vector as a base64 string; decode it with
+    ``embedding_codec.decode_embedding``.
+    """
+    embedding: Union[List[float], str]
+    model: str
+    dtype: EmbeddingEncoding = EmbeddingEncoding.FLOAT
+    dim: int = 0
+    scale: Optional[float] = None  # int8 only
+
+
+class EmbedBatchRequest(BaseModel):
+    """Request for embedding several texts at once."""
+    texts: List[str]
+    model: Optional[str] = None
+    encoding: EmbeddingEncoding = EmbeddingEncoding.FLOAT
+
+
+class EmbedBatchResponse(BaseModel):
+    """Response with one embedding per input text, in order."""
+    embeddings: List[Union[List[float], str]]
     model: str
+    dtype: EmbeddingEncoding = EmbeddingEncoding.FLOAT
+    dim: int = 0
+    scales: Optional[List[float]] = None  # int8 only, one per embedding
 
 
 class ModelInfo(BaseModel):
@@ -0,0 +1,129 @@
+"""SQLite store that keeps the response caches warm across restarts."""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class ResponseStore:
+    """Persistent copy of the exact and semantic response caches.
+    
+    Every reply added to an in-memory cache is also written here, tagged
+    with the model that produced it, and the most recent rows of a model
+    are loaded back when the service starts or switches to that model.
+    Exact-cache rows have no ``match`` key or embedding. Rows are dropped
+    ``ttl_seconds`` after they were written. Safe to share between
+    executor threads.
+    """
+    
+    def __init__(self, db_path: Path, ttl_seconds: float):
+        """Open (or create) the store database.
+        
+        Args:
+            db_path: SQLite database file
+            ttl_seconds: Age after which ``prune`` drops a row
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resp_cache (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                match BLOB,
+                emb BLOB,
+                response BLOB NOT NULL,
+                ts INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS resp_cache_recent ON resp_cache (model, ts)"
+        )
+        self._conn.commit()
+        logger.info("Response store opened", path=str(db_path))
+    
+    def put(
+        self,
+        key: bytes,
+        model: str,
+        response: bytes,
+        match: Optional[bytes] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        """Store a reply, replacing any earlier one under the same key.
+        
+        Failures are logged rather than raised; the in-memory caches keep
+        working without the store.
+        """
+        emb = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO resp_cache (key, model, match, emb, response, ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, match, emb, response, int(time.time()))
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Failed to persist cached response", error=str(e))
+    
+    def load_exact(self, model: str, limit: int) -> List[Tuple[bytes, bytes]]:
+        """Return up to ``limit`` recent exact-cache (key, response) rows, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, response FROM resp_cache "
+                "WHERE model = ? AND match IS NULL AND ts >= ? "
+                "ORDER BY ts DESC LIMIT ?",
+                (model, self._cutoff(), limit)
+            ).fetchall()
+        rows.reverse()
+        return rows
+    
+    def load_semantic(self, model: str, limit: int) -> List[Tuple[bytes, np.ndarray, bytes]]:
+        """Return up to ``limit`` recent semantic (match, embedding, response) rows, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT match, emb, response FROM resp_cache "
+                "WHERE model = ? AND match IS NOT NULL AND ts >= ? "
+                "ORDER BY ts DESC LIMIT ?",
+                (model, self._cutoff(), limit)
+            ).fetchall()
+        rows.reverse()
+        return [(match, np.frombuffer(emb, dtype=np.float32), response) for match, emb, response in rows]
+    
+    def prune(self) -> int:
+        """Drop expired rows.
+        
+        The file is not compacted: VACUUM rewrites the whole database while
+        holding the lock, and the freed pages are reused by later writes.
+        """
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM resp_cache WHERE ts < ?", (self._cutoff(),)
+            ).rowcount
+            self._conn.commit()
+        if deleted:
+            logger.info("Pruned expired cached responses", rows=deleted)
+        return deleted
+    
+    def _cutoff(self) -> int:
+        """Oldest timestamp still within the TTL."""
+        return int(time.time() - self.ttl_seconds)
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
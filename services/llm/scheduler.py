@@ -0,0 +1,343 @@
+"""Continuous batching of generation requests in a dedicated llama.cpp context."""
+
+import codecs
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import structlog
+import llama_cpp
+
+from stop_sequences import StopMatcher
+
+logger = structlog.get_logger(__name__)
+
+
+class Sequence:
+    """One generation request as tracked by the scheduler.
+    
+    ``emit`` is called on the model thread with each chunk of text, an
+    exception if the request fails, and finally ``None``. The counters and
+    ``finish_reason`` are set before the final ``None`` is emitted.
+    """
+    
+    __slots__ = (
+        "messages", "stop", "max_tokens", "temperature", "top_p", "top_k",
+        "emit", "cancelled", "seq_id", "tokens", "n_prompt", "n_past",
+        "n_generated", "next_token", "matcher", "decoder", "finish_reason",
+    )
+    
+    def __init__(
+        self,
+        messages: List[Any],
+        stop: Optional[List[str]],
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        top_k: int,
+        emit: Callable[[Any], None],
+    ):
+        """Describe a request; its prompt is built once it is admitted."""
+        self.messages = messages
+        self.stop = stop
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.top_k = top_k
+        self.emit = emit
+        self.cancelled = threading.Event()
+        self.seq_id = -1
+        self.tokens: List[int] = []
+        self.n_prompt = 0
+        self.n_past = 0  # Tokens already decoded into this sequence's KV cells
+        self.n_generated = 0
+        self.next_token: Optional[int] = None  # Sampled, not yet decoded
+        self.matcher: Optional[StopMatcher] = None
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.finish_reason = "stop"
+    
+    @property
+    def kv_cells(self) -> int:
+        """KV cells reserved for the whole request (prompt plus completion)."""
+        return self.n_prompt + self.max_tokens
+
+
+def _sample(logits: np.ndarray, seq: Sequence, rng: np.random.Generator) -> int:
+    """Pick the next token with the request's temperature, top-k and top-p."""
+    if seq.temperature <= 0:
+        return int(np.argmax(logits))
+    
+    if 0 < seq.top_k < logits.shape[0]:
+        candidates = np.argpartition(logits, -seq.top_k)[-seq.top_k:]
+    else:
+        candidates = np.arange(logits.shape[0])
+    scaled = logits[candidates].astype(np.float64) / seq.temperature
+    order = np.argsort(scaled)[::-1]
+    candidates, scaled = candidates[order], scaled[order]
+    
+    probs = np.exp(scaled - scaled[0])
+    probs /= probs.sum()
+    if seq.top_p < 1.0:
+        # Smallest prefix whose mass reaches top_p; always keep the best token
+        keep = int(np.searchsorted(np.cumsum(probs), seq.top_p)) + 1
+        candidates, probs = candidates[:keep], probs[:keep] / probs[:keep].sum()
+    return int(candidates[rng.choice(len(candidates), p=probs)])
+
+
+class BatchScheduler:
+    """Decodes one token for every active request per llama_decode call.
+    
+    Requests wait in a queue and are admitted between decode steps while a
+    sequence slot is free and the shared KV cache can hold the prompt plus
+    the full completion. Each step packs the pending token of every
+    decoding sequence, then fills the rest of the batch with prompt chunks
+    of newly admitted ones, so prefill never stalls running streams.
+    Finished sequences free their KV cells and slot immediately.
+    
+    Sequences decode in a context of their own, created from the loaded
+    model's parameters with one sequence slot per request (``n_seq_max``),
+    so the model's main context keeps its prompt cache and prefix reuse
+    for single requests. That context holds a second KV cache of
+    ``n_ctx`` cells.
+    
+    Every step is a separate job on the backend's model thread, queued
+    again while any request is active or waiting, so other model-thread
+    work (embeddings, loads) runs between steps rather than after the
+    queue drains.
+    """
+    
+    def __init__(self, backend, max_sequences: int):
+        """Create an idle scheduler for the backend's model."""
+        self.backend = backend
+        self.max_sequences = max_sequences
+        self._waiting: "deque[Sequence]" = deque()
+        self._lock = threading.Lock()
+        self._running = False
+        self._rng = np.random.default_rng()
+        self._n_batch = max(backend.config.batch_size, max_sequences)
+        # Only touched on the model thread
+        self._active: Dict[int, Sequence] = {}
+        self._model = None  # Llama the context below was created for
+        self._ctx = None
+        self._vocab = None
+        self._batch = None
+    
+    def submit(self, seq: Sequence) -> None:
+        """Queue a request, starting the step jobs on the model thread if idle."""
+        with self._lock:
+            self._waiting.append(seq)
+            if self._running:
+                return
+            self._running = True
+        self._schedule()
+    
+    def _schedule(self) -> None:
+        """Queue the next step on the model thread."""
+        try:
+            self.backend._executor.submit(self._tick)
+        except RuntimeError as e:  # Executor shut down
+            self.release(e)
+            self._fail_waiting(e)
+    
+    def _fail_waiting(self, error: Exception) -> None:
+        """Fail every waiting request and mark the scheduler idle."""
+        with self._lock:
+            failed = list(self._waiting)
+            self._waiting.clear()
+            self._running = False
+        for seq in failed:
+            self._finish(seq, error)
+    
+    def _tick(self) -> None:
+        """Admit waiting requests and run one decode step (model thread).
+        
+        Any failure outside the decode itself fails every request, so none
+        is left waiting on steps that are no longer queued.
+        """
+        try:
+            ctx = self._context()
+            self._admit()
+            if self._active:
+                try:
+                    self._step(ctx)
+                except Exception as e:
+                    logger.error("Batched decode failed", error=str(e), sequences=len(self._active))
+                    for seq in list(self._active.values()):
+                        self._evict(seq, e)
+                    ctx.kv_cache_clear()
+        except Exception as e:
+            logger.error("Batch scheduler failed", error=str(e))
+            self.release(e)
+            self._fail_waiting(e)
+            return
+        
+        with self._lock:
+            if not self._active and not self._waiting:
+                self._running = False
+                return
+        self._schedule()
+    
+    def _context(self):
+        """The scheduler's context for the loaded model, created on first use."""
+        self.backend.ensure_model_loaded()
+        model = self.backend.model
+        if model is not self._model:
+            self.release()
+            params = llama_cpp.llama_context_params.from_buffer_copy(model.context_params)
+            params.n_seq_max = self.max_sequences
+            params.n_batch = self._n_batch
+            params.embeddings = False
+            self._ctx = llama_cpp._internals.LlamaContext(
+                model=model._model, params=params, verbose=False
+            )
+            self._vocab = llama_cpp.llama_model_get_vocab(model.model)
+            self._batch = llama_cpp.llama_batch_init(self._n_batch, 0, 1)
+            self._model = model
+        return self._ctx
+    
+    def release(self, error: Optional[Exception] = None) -> None:
+        """Fail active requests and free the context (model thread).
+        
+        Called before the model is unloaded. Waiting requests stay queued
+        and load the model again once admitted.
+        """
+        for seq in list(self._active.values()):
+            del self._active[seq.seq_id]
+            self._finish(seq, error or RuntimeError("Model unloaded"))
+        if self._batch is not None:
+            llama_cpp.llama_batch_free(self._batch)
+            self._batch = None
+        if self._ctx is not None:
+            self._ctx.close()
+            self._ctx = None
+        self._vocab = None
+        self._model = None
+    
+    def _admit(self) -> None:
+        """Move waiting requests into free slots while their KV budget fits.
+        
+        Only the model thread removes from the queue, so the head can be
+        inspected and prepared without holding the lock.
+        """
+        active = self._active
+        n_ctx = self._ctx.n_ctx()
+        reserved = sum(seq.kv_cells for seq in active.values())
+        while len(active) < self.max_sequences:
+            with self._lock:
+                if not self._waiting:
+                    return
+                seq = self._waiting[0]
+            if seq.cancelled.is_set():
+                self._pop_waiting()
+                self._finish(seq, None)
+                continue
+            if not seq.tokens:
+                try:
+                    self._prepare(seq, n_ctx)
+                except Exception as e:
+                    self._pop_waiting()
+                    self._finish(seq, e)
+                    continue
+            if active and reserved + seq.kv_cells > n_ctx:
+                return  # Wait for running sequences to free cells
+            self._pop_waiting()
+            seq.seq_id = next(i for i in range(self.max_sequences) if i not in active)
+            active[seq.seq_id] = seq
+            reserved += seq.kv_cells
+    
+    def _pop_waiting(self) -> None:
+        """Drop the head of the waiting queue."""
+        with self._lock:
+            self._waiting.popleft()
+    
+    def _prepare(self, seq: Sequence, n_ctx: int) -> None:
+        """Tokenize the prompt and clamp the completion to the context size."""
+        prompt, stop = self.backend._prepare(seq.messages, seq.stop)
+        if isinstance(prompt, str):
+            prompt = self._model.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+        if len(prompt) >= n_ctx:
+            raise ValueError(
+                f"Requested tokens ({len(prompt)}) exceed context window of {n_ctx}"
+            )
+        seq.tokens = list(prompt)
+        seq.n_prompt = len(prompt)
+        seq.max_tokens = min(seq.max_tokens, n_ctx - seq.n_prompt)
+        seq.matcher = StopMatcher(stop)
+    
+    def _step(self, ctx) -> None:
+        """Run one llama_decode over all active sequences and sample from it."""
+        model, batch, n_batch, active = self._model, self._batch, self._n_batch, self._active
+        for seq in [seq for seq in active.values() if seq.cancelled.is_set()]:
+            self._evict(seq, None)
+        
+        n_tokens = 0
+        sampled_at: List[tuple] = []  # (batch index, sequence)
+        
+        def add(token: int, seq: Sequence, logits: bool) -> None:
+            nonlocal n_tokens
+            batch.token[n_tokens] = token
+            batch.pos[n_tokens] = seq.n_past
+            batch.n_seq_id[n_tokens] = 1
+            batch.seq_id[n_tokens][0] = seq.seq_id
+            batch.logits[n_tokens] = int(logits)
+            if logits:
+                sampled_at.append((n_tokens, seq))
+            seq.n_past += 1
+            n_tokens += 1
+        
+        # Decoding sequences first, one token each...
+        for seq in active.values():
+            if seq.next_token is not None:
+                add(seq.next_token, seq, True)
+                seq.next_token = None
+        # ...then prompt chunks in whatever room is left
+        for seq in active.values():
+            while seq.n_past < seq.n_prompt and n_tokens < n_batch:
+                add(seq.tokens[seq.n_past], seq, seq.n_past == seq.n_prompt - 1)
+        
+        batch.n_tokens = n_tokens
+        result = llama_cpp.llama_decode(ctx.ctx, batch)
+        if result != 0:
+            raise RuntimeError(f"llama_decode returned {result}")
+        
+        n_vocab = model.n_vocab()
+        for index, seq in sampled_at:
+            if seq.cancelled.is_set():
+                self._evict(seq, None)
+                continue
+            logits = np.ctypeslib.as_array(
+                llama_cpp.llama_get_logits_ith(ctx.ctx, index), shape=(n_vocab,)
+            )
+            token = _sample(logits, seq, self._rng)
+            seq.n_generated += 1
+            if llama_cpp.llama_vocab_is_eog(self._vocab, token):
+                self._evict(seq, None, flush=True)
+                continue
+            
+            text = seq.matcher.feed(seq.decoder.decode(model.detokenize([token])))
+            if text:
+                seq.emit(text)
+            if seq.matcher.stopped:
+                self._evict(seq, None)
+            elif seq.n_generated >= seq.max_tokens:
+                seq.finish_reason = "length"
+                self._evict(seq, None, flush=True)
+            else:
+                seq.next_token = token
+    
+    def _evict(self, seq: Sequence, error: Optional[Exception], flush: bool = False) -> None:
+        """Free a sequence's KV cells and slot and end its stream."""
+        del self._active[seq.seq_id]
+        self._ctx.kv_cache_seq_rm(seq.seq_id, -1, -1)
+        if flush and error is None:
+            text = seq.matcher.flush() + seq.decoder.decode(b"", final=True)
+            if text:
+                seq.emit(text)
+        self._finish(seq, error)
+    
+    def _finish(self, seq: Sequence, error: Optional[Exception]) -> None:
+        """Report a failure, if any, then end the request's stream."""
+        if error is not None:
+            seq.emit(error)
+        seq.emit(None)
@@ -1,32 +1,134 @@
 """Main LLM service implementation."""
 
 import asyncio
+import contextlib
+import functools
+import hashlib
+import json
 import sys
+from collections import Counter, OrderedDict
 from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
 
 import structlog
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "packages" / "common"))
 
 from neuralux.config import NeuraluxConfig
 from neuralux.logger import setup_logging
+from neuralux.batching import MicroBatcher
 from neuralux.messaging import MessageBusClient
+from neuralux.semantic_cache import SemanticCache
 
 from config import LLMServiceConfig
+from embedding_codec import encode_embedding
 from llm_backend import LlamaCppBackend
 from models import (
+    EmbedBatchRequest,
+    EmbedBatchResponse,
     EmbedRequest,
     EmbedResponse,
     LLMRequest,
     LLMResponse,
     ModelInfo,
+    decode_response,
+    to_json,
 )
+from response_store import ResponseStore
 
 logger = structlog.get_logger(__name__)
 
+# Server-sent event framing, encoded once; only the token text is encoded per chunk
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+# How often expired rows are pruned from the response store
+_STORE_PRUNE_INTERVAL_S = 6 * 3600
+
+
+def _request_digest(request: LLMRequest) -> bytes:
+    """Hash of every field that affects a completion.
+    
+    pydantic dumps fields in declaration order, so equal requests always
+    produce the same JSON.
+    """
+    payload = request.model_dump_json(exclude={"stream"}).encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _cache_key(request: LLMRequest, model: Optional[str]) -> bytes:
+    """Hash of everything besides the last message's text that a cached reply must match.
+    
+    A digest rather than a tuple, so it can be persisted along with the reply.
+    """
+    payload = json.dumps([
+        model,
+        [[msg.role.value, msg.content] for msg in request.messages[:-1]],
+        request.messages[-1].role.value,
+        request.temperature,
+        request.max_tokens,
+        request.top_p,
+        request.top_k,
+        request.stop or None,
+    ]).encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+# Marks the end of a broadcast stream in a subscriber's queue
+_STREAM_END = object()
+
+
+class _StreamBroadcast:
+    """Fans one streaming generation out to every subscriber.
+    
+    Chunks are kept so a subscriber that joins mid-stream first receives
+    everything already generated, then the rest as it arrives.
+    """
+    
+    def __init__(self):
+        """Create a broadcast with no subscribers yet."""
+        self.chunks: List[str] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self._error: Optional[Exception] = None
+        self._queues: List[asyncio.Queue] = []
+    
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving every chunk of the stream, then _STREAM_END."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in self.chunks:
+            queue.put_nowait(chunk)
+        if self.done:
+            if self._error is not None:
+                queue.put_nowait(self._error)
+            queue.put_nowait(_STREAM_END)
+        self._queues.append(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue) -> bool:
+        """Drop a subscriber; returns True if nobody is listening any more."""
+        self._queues.remove(queue)
+        return not self._queues
+    
+    def publish(self, chunk: str) -> None:
+        """Send a chunk to every subscriber."""
+        self.chunks.append(chunk)
+        for queue in self._queues:
+            queue.put_nowait(chunk)
+    
+    def close(self, error: Optional[Exception] = None) -> None:
+        """End the stream, reporting an error first if there was one."""
+        self.done = True
+        self._error = error
+        for queue in self._queues:
+            if error is not None:
+                queue.put_nowait(error)
+            queue.put_nowait(_STREAM_END)
+
 
 class LLMService:
     """LLM Service that provides language model capabilities."""
@@ -37,7 +139,40 @@ class LLMService:
         self.neuralux_config = NeuraluxConfig()
         self.message_bus = MessageBusClient(self.neuralux_config)
         self.backend = LlamaCppBackend(self.config)
-        self.app = FastAPI(title="Neuralux LLM Service")
+        # Every uvicorn worker process runs start()/stop() through the lifespan
+        self.app = FastAPI(title="Neuralux LLM Service", lifespan=self._lifespan)
+        
+        # Replies to identical greedy requests, most recently used last
+        self._exact_cache: "OrderedDict[bytes, LLMResponse]" = OrderedDict()
+        self._exact_hits = 0
+        self._exact_misses = 0
+        # Greedy generations in progress; identical concurrent requests wait
+        # for the same one instead of queueing a second decode. Each runs as
+        # its own task, cancelled once no request is waiting for it
+        self._inflight: Dict[bytes, asyncio.Task] = {}
+        self._inflight_waiters: Counter = Counter()
+        # Greedy streams in progress; identical streaming requests subscribe
+        # to the running one
+        self._inflight_streams: Dict[bytes, _StreamBroadcast] = {}
+        
+        # Texts embedded within a few ms of each other share one model call
+        self.embed_batcher = MicroBatcher(
+            self._embed_texts,
+            max_batch=self.config.embed_batch_size,
+            max_delay_ms=self.config.embed_batch_delay_ms
+        )
+        
+        # Created on the first prompt embedding, once its size is known
+        self.semantic_cache: Optional[SemanticCache] = None
+        self._semantic_cache_enabled = (
+            self.config.semantic_cache_size > 0 and self.config.embedding_model is not None
+        )
+        
+        # SQLite copy of both caches, opened on start
+        self.response_store: Optional[ResponseStore] = None
+        self._prune_task: Optional[asyncio.Task] = None
+        # Store writes still running; awaited before the store is closed
+        self._pending_writes: Set[asyncio.Future] = set()
         
         # Setup routes
         self._setup_routes()
@@ -49,7 +184,7 @@ class LLMService:
         async def root():
             return {"service": "neuralux-llm", "version": "0.1.0", "status": "running"}
         
-        @self.app.post("/v1/chat/completions", response_model=LLMResponse)
+        @self.app.post("/v1/chat/completions")
         async def chat_completions(request: LLMRequest):
             """Handle chat completion requests."""
             try:
@@ -59,7 +194,12 @@ class LLMService:
                         media_type="text/event-stream"
                     )
                 else:
-                    return await self.backend.generate(request)
+                    # Serialized by msgspec directly, skipping FastAPI's
+                    # response_model validation
+                    return Response(
+                        content=to_json(await self._generate(request)),
+                        media_type="application/json"
+                    )
             except Exception as e:
                 logger.error("Chat completion failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
@@ -68,15 +208,34 @@ class LLMService:
         async def embeddings(request: EmbedRequest):
             """Handle embedding requests."""
             try:
-                embedding = self.backend.get_embeddings(request.text)
-                return EmbedResponse(
-                    embedding=embedding,
-                    model=self.backend.current_model_name or "unknown"
-                )
+                return await self._embed(request)
             except Exception as e:
                 logger.error("Embedding generation failed", error=str(e))
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/v1/embeddings/batch", response_model=EmbedBatchResponse)
+        async def embeddings_batch(request: EmbedBatchRequest):
+            """Handle batched embedding requests."""
+            try:
+                return await self._embed_batch(request)
+            except Exception as e:
+                logger.error("Batch embedding generation failed", error=str(e))
+                raise HTTPException(status_code=500, detail=str(e))
+        
+        @self.app.get("/v1/cache/stats")
+        async def cache_stats():
+            """Hit/miss counters of the response caches."""
+            total = self._exact_hits + self._exact_misses
+            return {
+                "exact": {
+                    "entries": len(self._exact_cache),
+                    "hits": self._exact_hits,
+                    "misses": self._exact_misses,
+                    "hit_rate": self._exact_hits / total if total else 0.0,
+                },
+                "semantic": self.semantic_cache.stats() if self.semantic_cache else None,
+            }
+        
         @self.app.get("/v1/models", response_model=ModelInfo)
         async def get_model_info():
             """Get information about the current model."""
@@ -98,8 +257,12 @@ class LLMService:
                     pass
                 # Update config default and load
                 self.config.default_model = model_name
-                self.backend.unload_model()
-                self.backend.load_model()
+                await self.backend.run_in_model_thread(self.backend.unload_model)
+                await self.backend.run_in_model_thread(self.backend.load_model)
+                # Replies (and embeddings) of the previous model no longer apply
+                self._exact_cache.clear()
+                self.semantic_cache = None
+                await self._restore_caches(self.backend.current_model_name)
                 try:
                     await self.message_bus.publish("ai.llm.reload.events", {"event": "done", "model": model_name})
                 except Exception:
@@ -112,36 +275,295 @@ class LLMService:
                     pass
                 raise HTTPException(status_code=500, detail=str(e))
     
+    async def _embed_prompt(self, request: LLMRequest) -> Optional[List[float]]:
+        """Embed the last message for the semantic cache, or None if unavailable."""
+        try:
+            embedding = await self.embed_batcher.submit(request.messages[-1].content)
+        except Exception as e:
+            # e.g. a model loaded without embedding support; stop trying
+            logger.warning("Disabling semantic response cache", error=str(e))
+            self._semantic_cache_enabled = False
+            self.semantic_cache = None
+            return None
+        
+        self._ensure_semantic_cache(len(embedding))
+        return embedding
+    
+    def _ensure_semantic_cache(self, dim: int) -> SemanticCache:
+        """Return the semantic cache, (re)creating it for embeddings of ``dim``."""
+        if self.semantic_cache is None:
+            self.semantic_cache = SemanticCache(
+                dim=dim,
+                max_entries=self.config.semantic_cache_size,
+                threshold=self.config.semantic_cache_threshold
+            )
+        elif self.semantic_cache.dim != dim:
+            self.semantic_cache.reset(dim)
+        return self.semantic_cache
+    
+    def _persist(
+        self,
+        key: bytes,
+        response: LLMResponse,
+        match: Optional[bytes] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        """Write a newly cached reply to the response store off the event loop."""
+        if self.response_store is None:
+            return
+        write = asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                self.response_store.put,
+                key,
+                response.model,
+                to_json(response),
+                match,
+                embedding,
+            )
+        )
+        self._pending_writes.add(write)
+        write.add_done_callback(self._pending_writes.discard)
+    
+    async def _restore_caches(self, model: Optional[str]) -> None:
+        """Refill the response caches with the persisted replies of a model."""
+        if self.response_store is None or model is None:
+            return
+        loop = asyncio.get_running_loop()
+        exact = semantic = 0
+        try:
+            if self.config.exact_cache_size > 0:
+                rows = await loop.run_in_executor(
+                    None, self.response_store.load_exact, model, self.config.exact_cache_size
+                )
+                for key, blob in rows:
+                    self._exact_cache[key] = decode_response(blob)
+                while len(self._exact_cache) > self.config.exact_cache_size:
+                    self._exact_cache.popitem(last=False)
+                exact = len(rows)
+            
+            if self._semantic_cache_enabled:
+                rows = await loop.run_in_executor(
+                    None, self.response_store.load_semantic, model, self.config.semantic_cache_size
+                )
+                if rows:
+                    cache = self._ensure_semantic_cache(len(rows[-1][1]))
+                    for match, embedding, blob in rows:
+                        if len(embedding) == cache.dim:
+                            cache.insert(embedding, match, decode_response(blob))
+                            semantic += 1
+        except Exception as e:
+            logger.warning("Failed to restore cached responses", error=str(e))
+        logger.info("Restored cached responses", model=model, exact=exact, semantic=semantic)
+    
+    async def _generate(self, request: LLMRequest) -> LLMResponse:
+        """Generate a completion, answering repeated prompts from cache.
+        
+        Greedy (temperature 0) requests are deterministic, so an identical
+        one is answered by a dict lookup. Otherwise the last message is
+        embedded (one forward pass, no decoding) and matched against recent
+        prompts with the same history and settings.
+        """
+        if self.backend.effective_temperature(request) != 0:
+            return await self._generate_semantic(request)
+        
+        digest = _request_digest(request)
+        if self.config.exact_cache_size > 0:
+            cached = self._exact_cache.get(digest)
+            if cached is not None:
+                self._exact_cache.move_to_end(digest)
+                self._exact_hits += 1
+                return cached
+            self._exact_misses += 1
+        
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.create_task(self._generate_semantic(request))
+            task.add_done_callback(functools.partial(self._generation_done, digest))
+            self._inflight[digest] = task
+        
+        self._inflight_waiters[task] += 1
+        try:
+            # Shielded: the request that started the generation going away
+            # must not cancel it for the others
+            return await asyncio.shield(task)
+        finally:
+            self._inflight_waiters[task] -= 1
+            if not self._inflight_waiters[task]:
+                del self._inflight_waiters[task]
+                if not task.done():
+                    # Last waiter left: stop generating, and let the next
+                    # identical request start afresh
+                    if self._inflight.get(digest) is task:
+                        del self._inflight[digest]
+                    task.cancel()
+    
+    def _generation_done(self, digest: bytes, task: asyncio.Task) -> None:
+        """Cache the reply of a shared greedy generation once it completes."""
+        if self._inflight.get(digest) is task:
+            del self._inflight[digest]
+        # exception() also marks a failure retrieved; every waiter re-raises it
+        if task.cancelled() or task.exception() is not None:
+            return
+        
+        if self.config.exact_cache_size > 0:
+            response = task.result()
+            self._exact_cache[digest] = response
+            if len(self._exact_cache) > self.config.exact_cache_size:
+                self._exact_cache.popitem(last=False)
+            self._persist(digest, response)
+    
+    async def _generate_semantic(self, request: LLMRequest) -> LLMResponse:
+        """Generate a completion, answering paraphrases of recent prompts from cache."""
+        if not self._semantic_cache_enabled or not request.messages:
+            return await self.backend.generate(request)
+        
+        embedding = await self._embed_prompt(request)
+        if embedding is None:
+            return await self.backend.generate(request)
+        
+        key = _cache_key(request, self.backend.current_model_name)
+        cached = self.semantic_cache.lookup(embedding, key)
+        if cached is not None:
+            logger.debug("Completion served from cache")
+            return cached
+        
+        response = await self.backend.generate(request)
+        if self.semantic_cache is not None:
+            self.semantic_cache.insert(embedding, key, response)
+            row_key = hashlib.blake2b(
+                key + request.messages[-1].content.encode("utf-8"), digest_size=16
+            ).digest()
+            self._persist(row_key, response, key, embedding)
+        return response
+    
     async def _stream_response(self, request: LLMRequest):
-        """Stream response generator."""
-        async for chunk in self.backend.generate_stream(request):
-            yield f"data: {chunk}\n\n"
-        yield "data: [DONE]\n\n"
+        """Stream response generator, yielding bytes StreamingResponse sends as-is."""
+        async for chunk in self._stream_chunks(request):
+            yield b"".join((_SSE_PREFIX, chunk.encode("utf-8"), _SSE_SUFFIX))
+        yield _SSE_DONE
     
-    async def _handle_llm_request(self, request_data: dict) -> dict:
-        """Handle LLM request from message bus."""
+    async def _stream_chunks(self, request: LLMRequest) -> AsyncIterator[str]:
+        """Stream a completion, sharing one generation among identical greedy requests."""
+        if self.backend.effective_temperature(request) != 0:
+            async for chunk in self.backend.generate_stream(request):
+                yield chunk
+            return
+        
+        digest = _request_digest(request)
+        broadcast = self._inflight_streams.get(digest)
+        if broadcast is None:
+            broadcast = _StreamBroadcast()
+            self._inflight_streams[digest] = broadcast
+            broadcast.task = asyncio.create_task(self._run_broadcast(digest, broadcast, request))
+        
+        queue = broadcast.subscribe()
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if broadcast.unsubscribe(queue) and not broadcast.done:
+                # Last listener left: stop generating and let the next
+                # identical request start afresh
+                if self._inflight_streams.get(digest) is broadcast:
+                    del self._inflight_streams[digest]
+                broadcast.task.cancel()
+    
+    async def _run_broadcast(self, digest: bytes, broadcast: _StreamBroadcast, request: LLMRequest):
+        """Generate one stream and publish it to the broadcast's subscribers."""
+        try:
+            async for chunk in self.backend.generate_stream(request):
+                broadcast.publish(chunk)
+        except asyncio.CancelledError:
+            broadcast.close()
+            raise
+        except Exception as e:
+            broadcast.close(e)
+        else:
+            broadcast.close()
+        finally:
+            if self._inflight_streams.get(digest) is broadcast:
+                del self._inflight_streams[digest]
+    
+    async def _handle_llm_request(self, request_data: dict) -> Union[bytes, dict]:
+        """Handle LLM request from message bus.
+        
+        Replies are serialized straight to JSON bytes by msgspec,
+        which the message bus forwards without re-encoding.
+        """
         try:
             request = LLMRequest(**request_data)
-            response = await self.backend.generate(request)
-            return response.model_dump()
+            response = await self._generate(request)
+            return to_json(response)
         except Exception as e:
             logger.error("Message bus request failed", error=str(e))
             return {"error": str(e)}
     
-    async def _handle_embed_request(self, request_data: dict) -> dict:
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one call on the model thread."""
+        return await self.backend.run_in_model_thread(self.backend.get_embeddings_batch, texts)
+    
+    async def _embed(self, request: EmbedRequest) -> EmbedResponse:
+        """Embed one text and encode the vector as the request asks."""
+        embedding = await self.embed_batcher.submit(request.text)
+        payload, scale = encode_embedding(embedding, request.encoding)
+        # The payload is built here from plain floats; skip re-validating it
+        return EmbedResponse.model_construct(
+            embedding=payload,
+            model=self.backend.current_model_name or "unknown",
+            dtype=request.encoding,
+            dim=len(embedding),
+            scale=scale,
+        )
+    
+    async def _embed_batch(self, request: EmbedBatchRequest) -> EmbedBatchResponse:
+        """Embed many texts and encode each vector as the request asks."""
+        embeddings = await self.backend.run_in_model_thread(
+            self.backend.get_embeddings_batch, request.texts
+        )
+        encoded = [encode_embedding(embedding, request.encoding) for embedding in embeddings]
+        return EmbedBatchResponse.model_construct(
+            embeddings=[payload for payload, _ in encoded],
+            model=self.backend.current_model_name or "unknown",
+            dtype=request.encoding,
+            dim=len(embeddings[0]) if embeddings else 0,
+            scales=[scale for _, scale in encoded] if encoded and encoded[0][1] is not None else None,
+        )
+    
+    async def _handle_embed_request(self, request_data: dict) -> Union[bytes, dict]:
         """Handle embedding request from message bus."""
         try:
             request = EmbedRequest(**request_data)
-            embedding = self.backend.get_embeddings(request.text)
-            response = EmbedResponse(
-                embedding=embedding,
-                model=self.backend.current_model_name or "unknown"
-            )
-            return response.model_dump()
+            response = await self._embed(request)
+            return response.model_dump_json().encode()
         except Exception as e:
             logger.error("Embedding request failed", error=str(e))
             return {"error": str(e)}
     
+    async def _handle_embed_batch_request(self, request_data: dict) -> Union[bytes, dict]:
+        """Handle batched embedding request from message bus."""
+        try:
+            request = EmbedBatchRequest(**request_data)
+            response = await self._embed_batch(request)
+            return response.model_dump_json().encode()
+        except Exception as e:
+            logger.error("Batch embedding request failed", error=str(e))
+            return {"error": str(e)}
+    
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Start the service with the app and stop it on shutdown."""
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+    
     async def start(self):
         """Start the LLM service."""
         setup_logging(self.config.service_name, self.neuralux_config.log_level)
@@ -153,18 +575,49 @@ class LLMService:
         import asyncio
         asyncio.create_task(self._unload_inactive_models())
         
+        self.embed_batcher.start()
+        
+        if self.config.response_store_enabled:
+            try:
+                self.response_store = ResponseStore(
+                    self.neuralux_config.data_dir / "llm_response_cache.db",
+                    ttl_seconds=self.config.response_store_ttl_days * 86400
+                )
+            except Exception as e:
+                logger.warning("Response store unavailable", error=str(e))
+            else:
+                # Replies of the model that will be loaded on first use
+                await self._restore_caches(Path(self.config.default_model).stem)
+                self._prune_task = asyncio.create_task(self._prune_response_store())
+        
         # Connect to message bus
         try:
             await self.message_bus.connect()
             
-            # Register message handlers
+            # Register message handlers; with several workers each request
+            # goes to one of them via the queue group
             await self.message_bus.reply_handler(
                 self.config.llm_request_subject,
-                self._handle_llm_request
+                self._handle_llm_request,
+                queue=self.config.service_name
             )
+            if self.config.replica_id:
+                # This replica's own subject, for clients balancing across
+                # replicas listed in the endpoint registry
+                await self.message_bus.reply_handler(
+                    f"{self.config.llm_request_subject}.{self.config.replica_id}",
+                    self._handle_llm_request,
+                    queue=self.config.service_name
+                )
             await self.message_bus.reply_handler(
                 self.config.llm_embed_subject,
-                self._handle_embed_request
+                self._handle_embed_request,
+                queue=self.config.service_name
+            )
+            await self.message_bus.reply_handler(
+                self.config.llm_embed_batch_subject,
+                self._handle_embed_batch_request,
+                queue=self.config.service_name
             )
             
             logger.info("Message bus handlers registered")
@@ -176,7 +629,33 @@ class LLMService:
         """Stop the LLM service."""
         logger.info("Stopping LLM service")
         await self.message_bus.disconnect()
-        self.backend.unload_model()
+        await self.embed_batcher.stop()
+        await self.backend.run_in_model_thread(self.backend.unload_model)
+        await self._close_response_store()
+    
+    async def _close_response_store(self):
+        """Stop pruning, let pending writes land, then close the store."""
+        if self.response_store is None:
+            return
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+        store, self.response_store = self.response_store, None  # No new writes
+        await asyncio.gather(*self._pending_writes, return_exceptions=True)
+        store.close()
+    
+    async def _prune_response_store(self):
+        """Background task dropping expired rows from the response store."""
+        while True:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.response_store.prune)
+                await asyncio.sleep(_STORE_PRUNE_INTERVAL_S)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error in response store prune task", error=str(e))
+                await asyncio.sleep(_STORE_PRUNE_INTERVAL_S)
     
     async def _unload_inactive_models(self):
         """Background task to unload inactive models."""
@@ -185,7 +664,8 @@ class LLMService:
                 await asyncio.sleep(60)  # Check every minute
                 if self.backend.should_unload():
                     logger.info("Unloading inactive LLM model")
-                    self.backend.unload_model()
+                    # Queued behind any generation still running
+                    await self.backend.run_in_model_thread(self.backend.unload_model)
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -199,21 +679,12 @@ service = LLMService()
 if __name__ == "__main__":
     import uvicorn
     
-    async def startup():
-        await service.start()
-    
-    async def shutdown():
-        await service.stop()
-    
-    # Add startup/shutdown handlers
-    service.app.add_event_handler("startup", startup)
-    service.app.add_event_handler("shutdown", shutdown)
-    
-    # Run the service
+    # Several workers need an import string; each loads its own model replica
     uvicorn.run(
-        service.app,
+        "service:service.app" if service.config.workers > 1 else service.app,
         host=service.config.host,
         port=service.config.service_port,
+        workers=service.config.workers,
+        app_dir=str(Path(__file__).parent),
         log_level=service.neuralux_config.log_level.lower(),
     )
-
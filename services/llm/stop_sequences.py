@@ -0,0 +1,74 @@
+"""Incremental stop-sequence matching for streamed generations."""
+
+from typing import Iterable, Optional
+
+try:
+    import ahocorasick
+except ImportError:  # Optional; str.find over the short pending window is used otherwise
+    ahocorasick = None
+
+
+class StopMatcher:
+    """Finds the first stop sequence across streamed text chunks.
+    
+    Stop sequences are compiled once per request into an Aho-Corasick
+    automaton, so each chunk is scanned in a single pass regardless of how
+    many stops there are. Text that could still grow into a stop sequence
+    is held back, so no part of a stop sequence is ever emitted.
+    """
+    
+    def __init__(self, stops: Iterable[str]):
+        """Compile the stop sequences."""
+        self._stops = [stop for stop in stops if stop]
+        # Proper prefixes of every stop; a chunk ending in one may continue it
+        self._prefixes = {stop[:i] for stop in self._stops for i in range(1, len(stop))}
+        self._max_hold = max(map(len, self._stops), default=1) - 1
+        self._automaton = None
+        if ahocorasick is not None and self._stops:
+            self._automaton = ahocorasick.Automaton()
+            for stop in self._stops:
+                self._automaton.add_word(stop, len(stop))
+            self._automaton.make_automaton()
+        self._pending = ""
+        self.stopped = False
+    
+    def feed(self, text: str) -> str:
+        """Add generated text and return the part that is safe to emit.
+        
+        Sets ``stopped`` once a stop sequence is found; the returned text
+        then ends right before it.
+        """
+        buffer = self._pending + text
+        start = self._find(buffer)
+        if start is not None:
+            self._pending = ""
+            self.stopped = True
+            return buffer[:start]
+        
+        hold = self._hold_length(buffer)
+        self._pending = buffer[len(buffer) - hold:]
+        return buffer[:len(buffer) - hold]
+    
+    def flush(self) -> str:
+        """Return the held-back text once generation ends without a stop."""
+        pending, self._pending = self._pending, ""
+        return pending
+    
+    def _find(self, buffer: str) -> Optional[int]:
+        """Start index of the earliest stop sequence in buffer, if any."""
+        if self._automaton is not None:
+            return min(
+                (end - length + 1 for end, length in self._automaton.iter(buffer)),
+                default=None,
+            )
+        return min(
+            (index for index in (buffer.find(stop) for stop in self._stops) if index >= 0),
+            default=None,
+        )
+    
+    def _hold_length(self, buffer: str) -> int:
+        """Length of the longest buffer suffix that is a prefix of a stop."""
+        for length in range(min(self._max_hold, len(buffer)), 0, -1):
+            if buffer[-length:] in self._prefixes:
+                return length
+        return 0
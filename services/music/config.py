@@ -10,3 +10,5 @@ class MusicServiceConfig:
     model_cache_dir: str = os.getenv("MUSIC_MODEL_CACHE_DIR", str(Path(__file__).resolve().parents[2] / "models" / "music"))
     output_dir: str = os.getenv("MUSIC_OUTPUT_DIR", str(Path.home() / "Music"))
     service_port: int = int(os.getenv("MUSIC_SERVICE_PORT", 8010))
+    # "auto" picks bfloat16 (or float16) on CUDA and float32 on CPU
+    torch_dtype: str = os.getenv("MUSIC_TORCH_DTYPE", "auto")
@@ -1,14 +1,19 @@
 import asyncio
+import functools
 import os
+import re
 import time
 from pathlib import Path
+from typing import Optional
 import sys
 import structlog
 import torch
 from transformers import AutoProcessor, MusicgenForConditionalGeneration
-from scipy.io.wavfile import write as write_wav
+import soundfile
 import numpy as np
 import gc
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to path to allow absolute imports from services
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
@@ -17,6 +22,35 @@ from services.music.config import MusicServiceConfig
 
 logger = structlog.get_logger(__name__)
 
+# Output filenames keep word characters, whitespace and dashes from the
+# prompt; runs of whitespace/dashes become a single underscore
+_UNSAFE_PATTERN = re.compile(r'[^\w\s-]')
+_COLLAPSE_PATTERN = re.compile(r'[-\s]+')
+
+# Distinct prompts whose processed, on-device inputs are kept for reuse
+_INPUT_CACHE_SIZE = 256
+
+def _model_dtype(setting: str, device: str) -> torch.dtype:
+    """Weight dtype for the model: half precision on CUDA unless configured otherwise."""
+    if setting != "auto":
+        return getattr(torch, setting)
+    if device != "cuda":
+        return torch.float32
+    return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+
+def _write_pcm16(file_path: Path, sampling_rate: int, audio: np.ndarray) -> None:
+    """Write audio as 16-bit PCM WAV.
+    
+    libsndfile scales float samples to PCM16 inside its write loop, so no
+    int16 copy or in-memory WAV image of the clip is ever built.
+    """
+    if np.issubdtype(audio.dtype, np.floating):
+        # Clip first so loud samples saturate instead of wrapping around
+        np.clip(audio, -1.0, 1.0, out=audio)
+    soundfile.write(str(file_path), audio, sampling_rate, subtype="PCM_16")
+
+
 class MusicGenerationService:
     def __init__(self, message_bus):
         self.message_bus = message_bus
@@ -26,6 +60,13 @@ class MusicGenerationService:
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self._last_used: float = 0.0  # Track last usage time
         self._unload_timeout: int = 300  # Unload after 5 minutes of inactivity
+        # One thread owns the model: loading, generation and unloading are
+        # serialized there and never block the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="musicgen")
+        # Pinned host buffer that generated audio is copied into; grown on demand
+        self._host_buf: Optional[torch.Tensor] = None
+        # Prompt -> processor output already on the device (retries, repeats)
+        self._input_cache: "OrderedDict[str, dict]" = OrderedDict()
         
         # Ensure model directory exists
         self.model_path = Path(self.config.model_cache_dir)
@@ -37,15 +78,24 @@ class MusicGenerationService:
         # Start background task for automatic model unloading
         asyncio.create_task(self._unload_inactive_model())
 
-    async def _ensure_model_loaded(self):
+    async def _run_in_model_thread(self, func, *args, **kwargs):
+        """Run a blocking model call on the model thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def _load_model(self):
         if self.model is None or self.processor is None:
             logger.info("Loading music generation model...", path=self.model_path)
             try:
                 model_name = self.config.model_name
                 self.processor = AutoProcessor.from_pretrained(model_name, cache_dir=self.model_path)
-                self.model = MusicgenForConditionalGeneration.from_pretrained(model_name, cache_dir=self.model_path)
+                # Half precision halves weight and KV cache traffic in the decoder
+                dtype = _model_dtype(self.config.torch_dtype, self.device)
+                self.model = MusicgenForConditionalGeneration.from_pretrained(
+                    model_name, cache_dir=self.model_path, torch_dtype=dtype
+                )
                 self.model.to(self.device)
-                logger.info("Music generation model loaded successfully.")
+                logger.info("Music generation model loaded successfully.", dtype=str(dtype))
             except Exception as e:
                 logger.error("Failed to load music generation model", error=str(e))
                 raise
@@ -66,7 +116,7 @@ class MusicGenerationService:
                 await asyncio.sleep(60)  # Check every minute
                 if self.should_unload():
                     logger.info("Unloading inactive music generation model")
-                    self.unload_model()
+                    await self._run_in_model_thread(self.unload_model)
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -80,6 +130,8 @@ class MusicGenerationService:
             self.model = None
             del self.processor
             self.processor = None
+            self._host_buf = None
+            self._input_cache.clear()
             self._last_used = 0.0
             # Force garbage collection and clear CUDA cache
             gc.collect()
@@ -87,6 +139,84 @@ class MusicGenerationService:
                 torch.cuda.empty_cache()
             logger.info("Music generation model unloaded")
 
+    def _to_host(self, audio: torch.Tensor) -> np.ndarray:
+        """Copy generated audio into host memory as float32 samples.
+        
+        On CUDA the copy lands in a reused page-locked buffer, so it is a
+        single DMA transfer instead of a staged copy through pageable memory.
+        The returned array views that buffer and is valid until the next call.
+        """
+        audio = audio.reshape(-1)
+        if self.device != "cuda":
+            return audio.to(torch.float32).numpy()
+        
+        n = audio.numel()
+        if self._host_buf is None or self._host_buf.numel() < n:
+            self._host_buf = torch.empty(n, dtype=torch.float32, pin_memory=True)
+        host = self._host_buf[:n]
+        host.copy_(audio, non_blocking=True)
+        torch.cuda.current_stream().synchronize()
+        return host.numpy()
+
+    def _prepare_inputs(self, prompt: str):
+        """Tokenize a prompt and move it to the device, reusing repeated prompts.
+        
+        generate() only reads its inputs, so the cached tensors are shared.
+        On CUDA the token tensors are page-locked and copied asynchronously;
+        generate() is queued on the same stream, so it still sees the
+        finished copy without this thread waiting for it.
+        """
+        inputs = self._input_cache.get(prompt)
+        if inputs is not None:
+            self._input_cache.move_to_end(prompt)
+            return inputs
+        
+        cpu_inputs = self.processor(
+            text=[prompt],
+            padding=True,
+            return_tensors="pt",
+        )
+        if self.device == "cuda":
+            inputs = {
+                name: tensor.pin_memory().to(self.device, non_blocking=True)
+                for name, tensor in cpu_inputs.items()
+            }
+        else:
+            inputs = cpu_inputs.to(self.device)
+        self._input_cache[prompt] = inputs
+        if len(self._input_cache) > _INPUT_CACHE_SIZE:
+            self._input_cache.popitem(last=False)
+        return inputs
+
+    def _generate_to_file(self, prompt: str) -> Path:
+        """Generate audio for a prompt and write it as WAV; runs on the model thread."""
+        # Loading here too covers an idle unload queued ahead of this call
+        self._load_model()
+        if self.model is None:
+            raise RuntimeError("Music generation model could not be loaded.")
+
+        inputs = self._prepare_inputs(prompt)
+
+        # No autograd bookkeeping during sampling
+        with torch.inference_mode():
+            audio_values = self.model.generate(**inputs)
+
+        # Save the generated audio
+        music_dir = Path(self.config.output_dir)
+        music_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Generate a random filename
+        safe_prompt = _COLLAPSE_PATTERN.sub('_', _UNSAFE_PATTERN.sub('', prompt)[:50])
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        filename = f"{safe_prompt}_{timestamp}.wav"
+        file_path = music_dir / filename
+        
+        sampling_rate = self.model.config.audio_encoder.sampling_rate
+        audio_numpy = self._to_host(audio_values[0, 0])
+        _write_pcm16(file_path, sampling_rate, audio_numpy)
+
+        return file_path
+
     async def _handle_music_generation_request(self, payload):
         prompt = payload.get("prompt")
         duration = payload.get("duration", 30)
@@ -99,42 +229,10 @@ class MusicGenerationService:
         logger.info("Generating music with prompt", prompt=prompt, duration=duration)
 
         try:
-            if self.model is None or self.processor is None:
-                await self._ensure_model_loaded()
-                if self.model is None:
-                    raise RuntimeError("Music generation model could not be loaded.")
-            
             # Update usage time when model is used
             self._last_used = time.time()
 
-            inputs = self.processor(
-                text=[prompt],
-                padding=True,
-                return_tensors="pt",
-            ).to(self.device)
-
-            audio_values = self.model.generate(**inputs)
-
-            # Save the generated audio
-            music_dir = Path(self.config.output_dir)
-            music_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Generate a random filename
-            import re
-            safe_prompt = re.sub(r'[^\\w\\s-]', '', prompt)[:50]
-            safe_prompt = re.sub(r'[-\\s]+', '_', safe_prompt)
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            filename = f"{safe_prompt}_{timestamp}.wav"
-            file_path = music_dir / filename
-            
-            sampling_rate = self.model.config.audio_encoder.sampling_rate
-            audio_numpy = audio_values[0, 0].cpu().numpy()
-            
-            # Ensure the audio data is in a valid format for WAV
-            if np.issubdtype(audio_numpy.dtype, np.floating):
-                audio_numpy = (audio_numpy * 32767).astype(np.int16)
-
-            write_wav(file_path, sampling_rate, audio_numpy)
+            file_path = await self._run_in_model_thread(self._generate_to_file, prompt)
 
             logger.info("Music saved to file", path=str(file_path))
 
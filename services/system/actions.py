@@ -1,50 +1,202 @@
 import psutil
 import logging
 import json
-from typing import Dict, Any
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 
 from services.system import config
 
+try:
+    import orjson
+except ImportError:  # Optional fast JSON codec; stdlib json otherwise
+    orjson = None
+
+try:
+    import pwd
+except ImportError:  # Unix only; the /proc scan below needs it
+    pwd = None
+
 logger = logging.getLogger(config.SERVICE_NAME)
 
-def list_processes(params: Dict[str, Any]) -> str:
+# Process list replies are reused for this long; polling agents ask repeatedly
+PROCESS_SNAPSHOT_TTL = 1.0
+
+# (name filter, include_memory) -> (monotonic time built, encoded reply).
+# Actions run on the default executor's threads, hence the lock
+_snapshot_cache: Dict[Tuple[Any, bool], Tuple[float, bytes]] = {}
+_snapshot_lock = threading.Lock()
+_SNAPSHOT_CACHE_SIZE = 32
+
+# On Linux the process list is read from /proc/<pid>/stat directly
+_PROC_SCAN = psutil.LINUX and pwd is not None and os.path.isdir("/proc")
+if _PROC_SCAN:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# pid -> (start time in ticks, CPU ticks used, monotonic time) at the last
+# scan, for cpu_percent; the start time tells a reused pid apart
+_cpu_samples: Dict[int, Tuple[int, int, float]] = {}
+# cpu_percent is usage since the previous scan (psutil keeps the same kind
+# of per-process state), so scans from different threads must not overlap
+_scan_lock = threading.Lock()
+
+
+def dumps(message: Any) -> bytes:
+    """Encode a reply as JSON bytes, ready to publish."""
+    if orjson is not None:
+        return orjson.dumps(message)
+    return json.dumps(message).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Decode a JSON request payload; raises json.JSONDecodeError if invalid."""
+    if orjson is not None:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def list_processes(params: Dict[str, Any]) -> bytes:
     """
-    Lists running processes, optionally filtered by name.
+    Lists running processes, optionally filtered by name (case-insensitive).
+    
+    Pass include_memory=False to skip memory_percent, which costs an extra
+    read per process where psutil has to be used. Replies are cached per filter for
+    PROCESS_SNAPSHOT_TTL seconds and returned already encoded.
     """
+    name = params.get("name")
+    name_lc = name.lower() if name else None
+    include_memory = bool(params.get("include_memory", True))
+    key = (name_lc, include_memory)
+    
+    now = time.monotonic()
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(key)
+    if cached is not None and now - cached[0] < PROCESS_SNAPSHOT_TTL:
+        return cached[1]
+    
     try:
-        process_list = []
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']):
-            process_list.append(proc.info)
-        
-        # Optional filtering
-        if "name" in params:
-            process_list = [p for p in process_list if params["name"] in p["name"].lower()]
-            
-        return json.dumps({"status": "success", "data": process_list})
+        with _scan_lock:
+            if _PROC_SCAN:
+                process_list = _scan_proc(name_lc, include_memory)
+            else:
+                process_list = _iter_psutil(name_lc, include_memory)
+        result = dumps({"status": "success", "data": process_list})
     except Exception as e:
         logger.error(f"Error listing processes: {e}")
-        return json.dumps({"status": "error", "message": str(e)})
+        return dumps({"status": "error", "message": str(e)})
+    
+    with _snapshot_lock:
+        if len(_snapshot_cache) >= _SNAPSHOT_CACHE_SIZE:
+            _snapshot_cache.clear()
+        _snapshot_cache[key] = (now, result)
+    return result
+
+
+@lru_cache(maxsize=256)
+def _username(uid: int) -> str:
+    """Resolve a uid to a user name, falling back to the number like psutil."""
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+def _scan_proc(name_lc: Optional[str], include_memory: bool) -> List[Dict[str, Any]]:
+    """
+    Builds the process list from one read of /proc/<pid>/stat per process.
+    
+    psutil opens stat, status and statm for the same fields. Here the name,
+    CPU times and resident size all come from stat, and the owner from a
+    stat() of the /proc/<pid> directory. cpu_percent follows psutil's
+    semantics: usage since the previous scan, 0.0 the first time a process
+    is seen. Callers hold _scan_lock.
+    """
+    now = time.monotonic()
+    total_memory = psutil.virtual_memory().total if include_memory else 0
+    samples = {}
+    process_list = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb", buffering=0) as f:
+                raw = f.read()
+            # The name is in parentheses and may itself contain spaces or ')'
+            start = raw.index(b"(")
+            end = raw.rindex(b")")
+            name = raw[start + 1:end].decode("utf-8", "replace")
+            # Filter while scanning so non-matching rows are never parsed
+            if name_lc is not None and name_lc not in name.lower():
+                continue
+            uid = entry.stat().st_uid
+        except (OSError, ValueError):
+            continue  # Exited while being read
+        
+        # Fields after the name, numbered from 3 (state) as in proc(5)
+        fields = raw[end + 2:].split()
+        pid = int(entry.name)
+        cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        started = int(fields[19])
+        samples[pid] = (started, cpu_ticks, now)
+        
+        cpu_percent = 0.0
+        previous = _cpu_samples.get(pid)
+        if previous is not None and previous[0] == started and now > previous[2]:
+            cpu_seconds = (cpu_ticks - previous[1]) / _CLOCK_TICKS
+            cpu_percent = round(cpu_seconds / (now - previous[2]) * 100, 1)
+        
+        info = {"pid": pid, "name": name, "username": _username(uid), "cpu_percent": cpu_percent}
+        if include_memory:
+            info["memory_percent"] = int(fields[21]) * _PAGE_SIZE / total_memory * 100
+        process_list.append(info)
+    
+    if name_lc is None:
+        # A full scan saw every live process; drop samples of exited ones
+        _cpu_samples.clear()
+    _cpu_samples.update(samples)
+    return process_list
+
+
+def _iter_psutil(name_lc: Optional[str], include_memory: bool) -> List[Dict[str, Any]]:
+    """
+    Builds the process list through psutil, on platforms without /proc.
+    """
+    attrs = ['pid', 'name', 'username', 'cpu_percent']
+    if include_memory:
+        attrs.append('memory_percent')
+    process_list = []
+    for proc in psutil.process_iter(attrs):
+        info = proc.info
+        # Filter while iterating so non-matching rows are never kept
+        if name_lc is not None and name_lc not in (info["name"] or "").lower():
+            continue
+        process_list.append(info)
+    return process_list
 
-def kill_process(params: Dict[str, Any]) -> str:
+def kill_process(params: Dict[str, Any]) -> bytes:
     """
     Terminates a process by its PID.
     """
     pid = params.get("pid")
     if not pid:
-        return json.dumps({"status": "error", "message": "PID must be provided."})
+        return dumps({"status": "error", "message": "PID must be provided."})
 
     try:
         process = psutil.Process(pid)
         process.terminate()  # or .kill() for a more forceful termination
         logger.info(f"Terminated process with PID {pid}")
-        return json.dumps({"status": "success", "message": f"Process {pid} terminated."})
+        return dumps({"status": "success", "message": f"Process {pid} terminated."})
     except psutil.NoSuchProcess:
-        return json.dumps({"status": "error", "message": f"No process with PID {pid} found."})
+        return dumps({"status": "error", "message": f"No process with PID {pid} found."})
     except psutil.AccessDenied:
-        return json.dumps({"status": "error", "message": f"Permission denied to terminate process {pid}."})
+        return dumps({"status": "error", "message": f"Permission denied to terminate process {pid}."})
     except Exception as e:
         logger.error(f"Error killing process {pid}: {e}")
-        return json.dumps({"status": "error", "message": str(e)})
+        return dumps({"status": "error", "message": str(e)})
 
 # --- Action Dispatcher ---
 # A mapping of action names to functions
@@ -13,3 +13,5 @@ NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
 # --- System Service Settings ---
 # The NATS subject prefix for system actions
 ACTION_SUBJECT_PREFIX = "system.action"
+# Replicas share this NATS queue group, so each action runs on exactly one of them
+ACTION_QUEUE_GROUP = os.getenv("SYSTEM_ACTION_QUEUE_GROUP", "system_workers")
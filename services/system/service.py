@@ -12,7 +12,7 @@ from nats.aio.client import Client as NATS
 from aiohttp import web
 
 from services.system import config
-from services.system.actions import ACTION_MAP
+from services.system.actions import ACTION_MAP, dumps, loads
 
 # --- Logger Setup ---
 logging.basicConfig(level=config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,6 +24,7 @@ class SystemService:
     def __init__(self):
         self.nc = NATS()
         self.is_running = False
+        self._stop_event = asyncio.Event()
 
     async def start(self):
         """Starts the system service."""
@@ -39,12 +40,13 @@ class SystemService:
         await site.start()
 
         try:
-            await self.nc.connect(servers=[config.NATS_URL])
+            # Replies never go to our own subscriptions; the server need not echo them back
+            await self.nc.connect(servers=[config.NATS_URL], no_echo=True)
             logger.info(f"Connected to NATS at {config.NATS_URL}")
             
             subject = f"{config.ACTION_SUBJECT_PREFIX}.>"
-            await self.nc.subscribe(subject, cb=self.action_handler)
-            logger.info(f"Subscribed to action stream: {subject}")
+            await self.nc.subscribe(subject, queue=config.ACTION_QUEUE_GROUP, cb=self.action_handler)
+            logger.info(f"Subscribed to action stream: {subject} (queue group {config.ACTION_QUEUE_GROUP})")
             
         except Exception as e:
             logger.fatal(f"Failed to connect to NATS: {e}")
@@ -61,31 +63,39 @@ class SystemService:
         await self.nc.close()
         logger.info("Disconnected from NATS.")
         logger.info("System Service stopped.")
+        # Set last: main() returns on it, and asyncio.run cancels what is left
+        self._stop_event.set()
 
     async def action_handler(self, msg):
         """Handles incoming action requests."""
         subject = msg.subject
         reply = msg.reply
-        data = msg.data.decode()
+        data = msg.data
         
         action_name = subject.replace(f"{config.ACTION_SUBJECT_PREFIX}.", "")
         logger.info(f"Received request for action '{action_name}'")
 
         if action_name in ACTION_MAP:
             try:
-                params = json.loads(data) if data else {}
-                result = ACTION_MAP[action_name](params)
+                params = loads(data) if data else {}
+                # Actions block on psutil/proc reads; keep the loop free for the health check
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, ACTION_MAP[action_name], params)
             except json.JSONDecodeError:
-                result = json.dumps({"status": "error", "message": "Invalid JSON payload."})
+                result = dumps({"status": "error", "message": "Invalid JSON payload."})
             except Exception as e:
-                result = json.dumps({"status": "error", "message": f"An unexpected error occurred: {e}"})
+                result = dumps({"status": "error", "message": f"An unexpected error occurred: {e}"})
         else:
-            result = json.dumps({"status": "error", "message": f"Unknown action: {action_name}"})
+            result = dumps({"status": "error", "message": f"Unknown action: {action_name}"})
 
         if reply:
-            await self.nc.publish(reply, result.encode())
+            await self.nc.publish(reply, result)
             logger.debug(f"Sent reply for action '{action_name}'")
 
+    async def wait_stopped(self):
+        """Waits until stop() has been called."""
+        await self._stop_event.wait()
+
     async def health_check(self, request):
         """Health check endpoint."""
         return web.Response(text="OK")
@@ -101,9 +111,7 @@ async def main():
         loop.add_signal_handler(sig, signal_handler)
 
     await service.start()
-
-    while service.is_running:
-        await asyncio.sleep(1)
+    await service.wait_stopped()
 
 if __name__ == "__main__":
     asyncio.run(main())
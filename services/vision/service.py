@@ -6,7 +6,9 @@ import structlog
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import StreamingResponse
 import asyncio
+import functools
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Add common package to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "packages" / "common"))
@@ -42,6 +44,10 @@ class VisionService:
         self.message_bus = MessageBusClient(self.neuralux_config)
         self.ocr = OCRProcessor()
         self.image_gen = ImageGenerationBackend()
+        # OCR and diffusion block for seconds, so each runs on its own
+        # thread; one worker apiece also serializes access to the models
+        self._ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision-ocr")
+        self._image_gen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision-imagegen")
         
         # Set progress callback
         set_download_progress_callback(progress_callback)
@@ -53,6 +59,16 @@ class VisionService:
         )
         self._setup_routes()
 
+    async def _run_ocr(self, func, *args, **kwargs):
+        """Run a blocking OCR call on the OCR thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ocr_executor, functools.partial(func, *args, **kwargs))
+
+    async def _run_image_gen(self, func, *args, **kwargs):
+        """Run a blocking image generation call on the image generation thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._image_gen_executor, functools.partial(func, *args, **kwargs))
+
     async def connect_to_message_bus(self) -> None:
         await self.message_bus.connect()
         
@@ -81,7 +97,7 @@ class VisionService:
                     return {"error": "No image provided"}
 
                 logger.info("Calling OCR backend")
-                result = self.ocr.run(img, language=req.language)
+                result = await self._run_ocr(self.ocr.run, img, language=req.language)
                 logger.info("OCR backend returned", result_keys=list(result.keys()) if isinstance(result, dict) else None)
                 if result.get("error"):
                     return {"error": result.get("error")}
@@ -105,7 +121,8 @@ class VisionService:
                 req = ImageGenRequest(**data)
                 
                 # Generate image
-                image = self.image_gen.generate(
+                image = await self._run_image_gen(
+                    self.image_gen.generate,
                     prompt=req.prompt,
                     negative_prompt=req.negative_prompt,
                     width=req.width,
@@ -168,7 +185,7 @@ class VisionService:
                 await asyncio.sleep(60)  # Check every minute
                 if self.image_gen.should_unload():
                     logger.info("Unloading inactive image generation model")
-                    self.image_gen.unload_model()
+                    await self._run_image_gen(self.image_gen.unload_model)
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -190,7 +207,7 @@ class VisionService:
                     img = Image.open(BytesIO(raw))
                 else:
                     raise HTTPException(status_code=400, detail="No image provided")
-                result = self.ocr.run(img, language=request.language)
+                result = await self._run_ocr(self.ocr.run, img, language=request.language)
                 if result.get("error"):
                     raise HTTPException(status_code=500, detail=result.get("error"))
                 return OCRResponse(
@@ -208,7 +225,8 @@ class VisionService:
             """Generate an image from a text prompt using Flux or other models."""
             try:
                 # Generate image
-                image = self.image_gen.generate(
+                image = await self._run_image_gen(
+                    self.image_gen.generate,
                     prompt=request.prompt,
                     negative_prompt=request.negative_prompt,
                     width=request.width,
@@ -247,7 +265,7 @@ class VisionService:
         async def load_model(model_name: str):
             """Load a specific image generation model."""
             try:
-                self.image_gen.load_model(model_name)
+                await self._run_image_gen(self.image_gen.load_model, model_name)
                 return {"status": "ok", "model": model_name}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
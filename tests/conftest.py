@@ -0,0 +1,103 @@
+"""Shared fixtures for the service tests."""
+
+import importlib
+import re
+import sys
+import types
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = ROOT / "services"
+
+
+@pytest.fixture
+def service_module(monkeypatch):
+    """Import a module of a service the way the service runs it.
+    
+    Services import their siblings as top-level modules (``config``,
+    ``models``, ...) with the service directory on sys.path, and those
+    names clash between services, so modules another service left behind
+    are dropped before importing.
+    """
+    def load(service: str, name: str):
+        monkeypatch.syspath_prepend(str(ROOT / "packages" / "common"))
+        monkeypatch.syspath_prepend(str(SERVICES / service))
+        for module_name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if "." not in module_name and path.startswith(str(SERVICES)):
+                monkeypatch.delitem(sys.modules, module_name)
+        return importlib.import_module(name)
+    
+    return load
+
+
+def _words(text: str):
+    """Lower-cased words of a text, ignoring punctuation."""
+    return re.findall(r"\w+", text.lower())
+
+
+class FakeLlama:
+    """Stand-in for ``llama_cpp.Llama`` that replies without a model.
+    
+    Completions always return ``reply``. Embeddings are bags of hashed
+    words, so texts differing only in case or punctuation embed the same,
+    and like the real class they require ``embedding=True``.
+    """
+    
+    instances: list = []
+    reply = "Paris"
+    dim = 64
+    
+    def __init__(self, model_path: str, embedding: bool = False, **kwargs):
+        self.model_path = model_path
+        self.embedding = embedding
+        self.kwargs = kwargs
+        self.metadata = {}
+        self.completions = 0
+        self.instances.append(self)
+    
+    def set_cache(self, cache) -> None:
+        self.cache = cache
+    
+    def __call__(self, prompt, stop=None, max_tokens=16, stream=False, **kwargs):
+        self.completions += 1
+        if stream:
+            return iter([{"choices": [{"text": self.reply}]}])
+        return {
+            "choices": [{"text": self.reply, "finish_reason": "stop"}],
+            "usage": {"total_tokens": len(_words(str(prompt))) + 1},
+        }
+    
+    def embed(self, texts):
+        if not self.embedding:
+            raise RuntimeError("Llama model must be created with embedding=True to call this method")
+        vectors = []
+        for text in [texts] if isinstance(texts, str) else texts:
+            vector = np.zeros(self.dim, dtype=np.float32)
+            for word in _words(text):
+                vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+            vectors.append((vector / max(np.linalg.norm(vector), 1e-9)).tolist())
+        return vectors[0] if isinstance(texts, str) else vectors
+
+
+@pytest.fixture
+def fake_llama_cpp(monkeypatch):
+    """Install a fake ``llama_cpp`` package; returns the module."""
+    module = types.ModuleType("llama_cpp")
+    chat_format = types.ModuleType("llama_cpp.llama_chat_format")
+    
+    module.Llama = type("Llama", (FakeLlama,), {"instances": []})
+    module.LlamaGrammar = type("LlamaGrammar", (), {})
+    module.LlamaRAMCache = lambda capacity_bytes: ("ram-cache", capacity_bytes)
+    module.LLAMA_POOLING_TYPE_UNSPECIFIED = -1
+    module.LLAMA_POOLING_TYPE_MEAN = 1
+    module.llama_chat_format = chat_format
+    chat_format.Jinja2ChatFormatter = type("Jinja2ChatFormatter", (), {})
+    
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    monkeypatch.setitem(sys.modules, "llama_cpp.llama_chat_format", chat_format)
+    return module
@@ -0,0 +1,125 @@
+"""Tests for least-pending routing across service replicas."""
+
+import asyncio
+import json
+import os
+
+import pytest
+from nats.errors import NoRespondersError
+
+from packages.common.neuralux.balancer import ReplicaBalancer
+
+SUBJECT = "ai.llm.request"
+REPLICAS = [f"{SUBJECT}.a", f"{SUBJECT}.b"]
+
+
+def _write_registry(path, registry, mtime=None):
+    """Write a registry file, optionally with an explicit mtime."""
+    path.write_text(json.dumps(registry))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registry file listing two replicas of SUBJECT."""
+    path = tmp_path / "endpoints.json"
+    _write_registry(path, {SUBJECT: REPLICAS}, mtime=1000)
+    return path
+
+
+def test_unlisted_subject_has_no_replicas(registry):
+    """Subjects missing from the registry are left to the caller."""
+    balancer = ReplicaBalancer(registry)
+    
+    assert balancer.replicas(SUBJECT) == REPLICAS
+    assert balancer.replicas("ai.other") == []
+
+
+def test_missing_or_invalid_registry_is_ignored(tmp_path):
+    """A missing file or malformed JSON means no replicas, not an error."""
+    path = tmp_path / "endpoints.json"
+    balancer = ReplicaBalancer(path)
+    assert balancer.replicas(SUBJECT) == []
+    
+    path.write_text("{not json")
+    assert balancer.replicas(SUBJECT) == []
+
+
+def test_registry_reloaded_when_it_changes(registry):
+    """Edits to the registry apply without restarting the client."""
+    balancer = ReplicaBalancer(registry)
+    assert balancer.replicas(SUBJECT) == REPLICAS
+    
+    _write_registry(registry, {SUBJECT: [f"{SUBJECT}.c"]}, mtime=2000)
+    assert balancer.replicas(SUBJECT) == [f"{SUBJECT}.c"]
+
+
+def test_requests_go_to_least_pending_replica(registry):
+    """A replica busy with this client's requests is avoided."""
+    balancer = ReplicaBalancer(registry)
+    
+    async def run():
+        release = asyncio.Event()
+        
+        async def slow(target):
+            await release.wait()
+            return target
+        
+        busy = asyncio.create_task(balancer.dispatch(SUBJECT, slow))
+        await asyncio.sleep(0)
+        picked, _ = await balancer.dispatch(SUBJECT, lambda target: asyncio.sleep(0, target))
+        release.set()
+        first, _ = await busy
+        return first, picked
+    
+    first, picked = asyncio.run(run())
+    
+    assert first != picked
+    assert {first, picked} == set(REPLICAS)
+
+
+def test_timeout_retried_on_another_replica(registry):
+    """A replica that times out is retried on one not tried yet."""
+    balancer = ReplicaBalancer(registry, backoff=0)
+    attempts = []
+    
+    async def flaky(target):
+        attempts.append(target)
+        if len(attempts) == 1:
+            raise asyncio.TimeoutError()
+        return "ok"
+    
+    replica, result = asyncio.run(balancer.dispatch(SUBJECT, flaky))
+    
+    assert result == "ok"
+    assert replica == attempts[1] != attempts[0]
+    assert not balancer._pending
+
+
+def test_gives_up_after_max_attempts(registry):
+    """Retries stop after max_attempts and the last error is raised."""
+    balancer = ReplicaBalancer(registry, max_attempts=3, backoff=0)
+    attempts = []
+    
+    async def down(target):
+        attempts.append(target)
+        raise NoRespondersError()
+    
+    with pytest.raises(NoRespondersError):
+        asyncio.run(balancer.dispatch(SUBJECT, down))
+    assert len(attempts) == 3
+
+
+def test_error_replies_are_not_retried(registry):
+    """Failures other than timeouts and missing responders are raised at once."""
+    balancer = ReplicaBalancer(registry, backoff=0)
+    attempts = []
+    
+    async def broken(target):
+        attempts.append(target)
+        raise ValueError("bad request")
+    
+    with pytest.raises(ValueError):
+        asyncio.run(balancer.dispatch(SUBJECT, broken))
+    assert len(attempts) == 1
@@ -0,0 +1,95 @@
+"""Tests for micro-batching of concurrent calls."""
+
+import asyncio
+
+from packages.common.neuralux.batching import MicroBatcher
+
+
+def test_concurrent_items_share_one_call():
+    """Items submitted together are processed in one batch, results in order."""
+    calls = []
+    
+    async def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+    
+    async def run():
+        batcher = MicroBatcher(double, max_batch=8, max_delay_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_batch_size_is_capped():
+    """No call receives more than max_batch items."""
+    calls = []
+    
+    async def echo(items):
+        calls.append(len(items))
+        return list(items)
+    
+    async def run():
+        batcher = MicroBatcher(echo, max_batch=2, max_delay_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert calls == [2, 2, 1]
+
+
+def test_failed_call_fails_its_items():
+    """An exception from the batch call is raised to every item in the batch."""
+    async def fail(items):
+        raise ValueError("boom")
+    
+    async def run():
+        batcher = MicroBatcher(fail, max_delay_ms=5)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        finally:
+            await batcher.stop()
+    
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_stop_fails_items_being_processed():
+    """Stopping mid-call resolves the batch in flight instead of leaving it hanging."""
+    async def run():
+        started = asyncio.Event()
+        
+        async def hang(items):
+            started.set()
+            await asyncio.Event().wait()
+        
+        batcher = MicroBatcher(hang, max_delay_ms=1)
+        batcher.start()
+        pending = asyncio.ensure_future(batcher.submit("in flight"))
+        await started.wait()
+        queued = asyncio.ensure_future(batcher.submit("queued"))
+        await asyncio.sleep(0)
+        
+        await batcher.stop()
+        return await asyncio.wait_for(
+            asyncio.gather(pending, queued, return_exceptions=True), timeout=1
+        )
+    
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ["Batcher stopped", "Batcher stopped"]
+
+
+def test_unstarted_batcher_processes_items_alone():
+    """Without a drain task each item gets its own call."""
+    async def echo(items):
+        return list(items)
+    
+    assert asyncio.run(MicroBatcher(echo).submit("x")) == "x"
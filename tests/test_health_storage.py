@@ -0,0 +1,210 @@
+"""Tests for the health service's DuckDB metrics storage."""
+
+from datetime import date, datetime, time, timedelta
+
+import duckdb
+import pytest
+
+
+@pytest.fixture
+def health(service_module):
+    """The health service's storage and model modules."""
+    storage = service_module("health", "storage")
+    storage.models = service_module("health", "models")
+    storage.config = service_module("health", "config")
+    return storage
+
+
+@pytest.fixture
+def storage(health, tmp_path):
+    """Storage on a fresh database and archive directory."""
+    config = health.config.HealthServiceConfig(
+        db_path=tmp_path / "health.duckdb",
+        archive_path=tmp_path / "archive",
+    )
+    store = health.HealthStorage(config)
+    yield store
+    store.close()
+
+
+def _metrics(health, timestamp, cpu=10.0, bytes_sent=0):
+    """A snapshot with the given CPU usage and network counter."""
+    models = health.models
+    return models.SystemMetrics(
+        timestamp=timestamp,
+        cpu=models.CPUMetrics(
+            usage_percent=cpu, per_core=(cpu,), load_average=(0.1, 0.2, 0.3),
+            context_switches=0, interrupts=0,
+        ),
+        memory=models.MemoryMetrics(
+            total=1000, available=500, used=500, percent=50.0,
+            swap_total=0, swap_used=0, swap_percent=0.0,
+        ),
+        disks=[models.DiskMetrics("/dev/sda1", "/", 100, 40, 60, 40.0)],
+        network=models.NetworkMetrics(
+            bytes_sent=bytes_sent, bytes_recv=0, packets_sent=0, packets_recv=0, connections=3,
+        ),
+        top_processes=[models.ProcessInfo(1, "init", 0.5, 0.1, 10.0)],
+        uptime_seconds=60.0,
+        boot_time=datetime(2024, 1, 1),
+    )
+
+
+def _rollup(storage, table):
+    """(bucket, cpu_usage, network_bytes_sent, samples) rows of a rollup table."""
+    return storage._conn.execute(
+        f"SELECT timestamp, cpu_usage, network_bytes_sent, samples FROM {table} ORDER BY 1"
+    ).fetchall()
+
+
+def test_rollups_merge_flushes_into_one_bucket(health, storage):
+    """Samples of one bucket flushed separately fold into a single weighted row."""
+    start = datetime(2024, 3, 1, 10, 15)
+    storage.store_metrics(_metrics(health, start, cpu=10.0, bytes_sent=1))
+    storage.store_metrics(_metrics(health, start + timedelta(seconds=10), cpu=20.0, bytes_sent=2))
+    storage.flush()
+    storage.store_metrics(_metrics(health, start + timedelta(seconds=20), cpu=60.0, bytes_sent=3))
+    storage.flush()
+    
+    # Averaged columns are weighted by samples; others keep the latest value
+    assert _rollup(storage, "metrics_1m") == [(start, pytest.approx(30.0), 3, 3)]
+    assert _rollup(storage, "metrics_1h") == [(datetime(2024, 3, 1, 10), pytest.approx(30.0), 3, 3)]
+    assert _rollup(storage, "metrics_1d") == [(datetime(2024, 3, 1), pytest.approx(30.0), 3, 3)]
+
+
+def test_rollups_bucket_by_unit(health, storage):
+    """Samples in different minutes of one hour share only the coarser buckets."""
+    start = datetime(2024, 3, 1, 10, 15)
+    storage.store_metrics(_metrics(health, start, cpu=10.0))
+    storage.store_metrics(_metrics(health, start + timedelta(minutes=1), cpu=30.0))
+    storage.flush()
+    
+    assert [row[3] for row in _rollup(storage, "metrics_1m")] == [1, 1]
+    assert _rollup(storage, "metrics_1h")[0][1:] == (pytest.approx(20.0), 0, 2)
+
+
+def test_full_buffer_asks_owner_to_flush(health, storage):
+    """Queueing reports a due flush instead of writing on the caller's thread."""
+    storage.config.flush_max_rows = 2
+    start = datetime(2024, 3, 1, 10)
+    
+    assert storage.store_metrics(_metrics(health, start)) is False
+    assert storage.store_metrics(_metrics(health, start + timedelta(minutes=1))) is True
+    assert storage._conn.execute("SELECT count(*) FROM metrics").fetchone()[0] == 0
+    
+    storage.flush()
+    assert storage._conn.execute("SELECT count(*) FROM metrics").fetchone()[0] == 2
+
+
+def test_reads_do_not_wait_for_writes(health, storage):
+    """A read during an archive or cleanup returns the rows already written."""
+    start = datetime(2024, 3, 1, 10)
+    storage.store_metrics(_metrics(health, start))
+    storage.flush()
+    storage.store_metrics(_metrics(health, start + timedelta(minutes=1)))
+    
+    with storage._write_lock:
+        latest = storage.get_latest_metrics()
+    assert latest.timestamp == start
+    
+    assert storage.get_latest_metrics().timestamp == start + timedelta(minutes=1)
+
+
+def test_long_ranges_read_from_rollups(health, storage):
+    """A history wider than limit samples allows is served one row per bucket."""
+    start = datetime(2024, 3, 1, 10)
+    for minute in range(4):
+        storage.store_metrics(_metrics(health, start + timedelta(minutes=minute), cpu=10.0 * minute))
+    
+    history = storage.get_metrics_history(start, start + timedelta(hours=2), limit=3)
+    assert [(m.timestamp, m.cpu.usage_percent) for m in history] == [(start, pytest.approx(15.0))]
+    
+    detailed = storage.get_metrics_history(start, start + timedelta(hours=2), limit=100)
+    assert len(detailed) == 4
+    assert detailed[0].disks[0].mountpoint == "/"
+
+
+def test_rollup_history_covers_the_whole_range(health, storage):
+    """The chosen rollup has no more buckets than limit, so the oldest are kept."""
+    start = datetime(2024, 3, 1, 0, 0)
+    for step in range(7 * 48):
+        storage.store_metrics(_metrics(health, start + timedelta(minutes=30 * step)))
+    
+    end = start + timedelta(days=7)
+    history = storage.get_metrics_history(start, end, limit=200)
+    assert len(history) == 7 * 24
+    assert history[-1].timestamp == start
+    
+    # A start inside a bucket still returns that bucket
+    history = storage.get_metrics_history(start + timedelta(hours=5), end, limit=10)
+    assert [m.timestamp for m in history][-1] == start
+    assert len(history) == 7
+
+
+def test_archive_moves_finished_days_to_parquet(health, storage):
+    """Rows before today move to a day partition and stay readable."""
+    yesterday = datetime.combine(date.today() - timedelta(days=1), time(12))
+    now = datetime.now()
+    storage.store_metrics(_metrics(health, yesterday, cpu=40.0))
+    storage.store_metrics(_metrics(health, now, cpu=50.0))
+    storage.archive_completed_days()
+    
+    partition = storage.archive_path / f"date={yesterday.date().isoformat()}"
+    assert len(list(partition.glob("*.parquet"))) == 1
+    assert storage._conn.execute("SELECT count(*) FROM metrics").fetchone()[0] == 1
+    
+    # A later run appends another file to the same day
+    storage.store_metrics(_metrics(health, yesterday + timedelta(hours=1), cpu=45.0))
+    storage.archive_completed_days()
+    assert len(list(partition.glob("*.parquet"))) == 2
+    
+    history = storage.get_metrics_history(limit=10)
+    assert [m.cpu.usage_percent for m in history] == [50.0, 45.0, 40.0]
+    assert history[-1].top_processes[0].name == "init"
+
+
+def test_failed_archive_leaves_no_files(health, storage, monkeypatch):
+    """A DELETE that fails after the COPY keeps rows in the table and out of Parquet."""
+    yesterday = datetime.combine(date.today() - timedelta(days=1), time(12))
+    storage.store_metrics(_metrics(health, yesterday))
+    storage.flush()
+    
+    conn = storage._conn
+    
+    class FailingDelete:
+        """Connection whose archive DELETE fails."""
+        
+        def __getattr__(self, name):
+            return getattr(conn, name)
+        
+        def execute(self, query, *args):
+            if query.startswith("DELETE FROM metrics WHERE"):
+                raise duckdb.IOException("disk full")
+            return conn.execute(query, *args)
+    
+    monkeypatch.setattr(storage, "_conn", FailingDelete())
+    with pytest.raises(duckdb.IOException):
+        storage.archive_completed_days()
+    monkeypatch.setattr(storage, "_conn", conn)
+    
+    assert not list(storage.archive_path.rglob("*.parquet"))
+    assert conn.execute("SELECT count(*) FROM metrics").fetchone()[0] == 1
+    
+    # The next run archives the rows exactly once
+    storage.archive_completed_days()
+    assert len(list(storage.archive_path.glob("date=*/*.parquet"))) == 1
+    assert not (storage.archive_path / ".staging").exists()
+    assert [m.timestamp for m in storage.get_metrics_history(limit=10)] == [yesterday]
+
+
+def test_cleanup_drops_expired_day_partitions(health, storage):
+    """Whole days past detailed retention are removed from the archive."""
+    old = datetime.combine(date.today() - timedelta(days=30), time(12))
+    recent = datetime.combine(date.today() - timedelta(days=1), time(12))
+    storage.store_metrics(_metrics(health, old))
+    storage.store_metrics(_metrics(health, recent))
+    storage.cleanup_old_data()
+    
+    days = sorted(p.name for p in storage.archive_path.glob("date=*"))
+    assert days == [f"date={recent.date().isoformat()}"]
+    assert [m.timestamp for m in storage.get_metrics_history(limit=10)] == [recent]
@@ -0,0 +1,153 @@
+"""Tests for the LLM service's response caches."""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def llm(service_module, fake_llama_cpp, monkeypatch, tmp_path):
+    """The LLM service module, configured for fake models in ``tmp_path``."""
+    (tmp_path / "chat.gguf").write_bytes(b"")
+    (tmp_path / "embed.gguf").write_bytes(b"")
+    monkeypatch.setenv("MODEL_PATH", str(tmp_path))
+    monkeypatch.setenv("DEFAULT_MODEL", "chat.gguf")
+    monkeypatch.setenv("EMBEDDING_MODEL", "embed.gguf")
+    monkeypatch.setenv("PARALLEL_SEQUENCES", "1")
+    return service_module("llm", "service")
+
+
+def _request(llm, text, **kwargs):
+    """A one-message chat request."""
+    return llm.LLMRequest(messages=[{"role": "user", "content": text}], **kwargs)
+
+
+def test_near_duplicate_prompt_hits_cache(llm):
+    """A paraphrase of a recent prompt is answered without generating."""
+    service = llm.LLMService()
+    
+    async def run():
+        first = await service._generate(_request(llm, "What is the capital of France?"))
+        second = await service._generate(_request(llm, "what is the capital of france"))
+        return first, second
+    
+    first, second = asyncio.run(run())
+    
+    assert second == first
+    assert service.backend.model.completions == 1
+    assert service.semantic_cache.stats()["hits"] == 1
+
+
+def test_distant_prompt_is_generated(llm):
+    """An unrelated prompt misses the cache and reaches the model."""
+    service = llm.LLMService()
+    
+    async def run():
+        await service._generate(_request(llm, "What is the capital of France?"))
+        await service._generate(_request(llm, "Write a haiku about autumn leaves"))
+    
+    asyncio.run(run())
+    
+    assert service.backend.model.completions == 2
+    assert service.semantic_cache.stats()["misses"] == 2
+
+
+def test_embeddings_use_an_embedding_context(llm):
+    """Embeddings come from a separate context created with embeddings enabled."""
+    service = llm.LLMService()
+    backend = service.backend
+    
+    embedding = backend.get_embeddings("hello world")
+    
+    assert len(embedding) == 64
+    assert backend.embed_model is not backend.model
+    assert backend.embed_model.embedding is True
+    assert backend.embed_model.model_path == str(service.config.model_path / "embed.gguf")
+    assert backend.model.embedding is False
+    assert service._semantic_cache_enabled
+    
+    backend.unload_model()
+    assert backend.embed_model is None
+
+
+def test_semantic_cache_needs_an_embedding_model(llm, monkeypatch):
+    """Without a dedicated embedding model paraphrases are generated again."""
+    monkeypatch.delenv("EMBEDDING_MODEL")
+    service = llm.LLMService()
+    
+    async def run():
+        await service._generate(_request(llm, "What is the capital of France?"))
+        await service._generate(_request(llm, "what is the capital of france"))
+    
+    asyncio.run(run())
+    
+    assert not service._semantic_cache_enabled
+    assert service.semantic_cache is None
+    assert service.backend.model.completions == 2
+    
+    # /v1/embeddings still falls back to the chat model's weights
+    service.backend.get_embeddings("hello world")
+    assert service.backend.embed_model.model_path == str(service.config.model_full_path)
+
+
+def _blocking_generate(llm, service):
+    """Replace generation with one that waits for the returned event."""
+    release = asyncio.Event()
+    calls = []
+    
+    async def generate(request):
+        calls.append(request)
+        await release.wait()
+        return llm.LLMResponse(content="Paris", model="fake")
+    
+    service._semantic_cache_enabled = False
+    service.backend.generate = generate
+    return release, calls
+
+
+def test_cancelled_leader_does_not_fail_followers(llm):
+    """Identical greedy requests share one generation that outlives its starter."""
+    service = llm.LLMService()
+    
+    async def run():
+        release, calls = _blocking_generate(llm, service)
+        request = _request(llm, "What is the capital of France?", temperature=0)
+        leader = asyncio.create_task(service._generate(request))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(service._generate(request))
+        await asyncio.sleep(0)
+        
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return calls, await asyncio.gather(leader, follower, return_exceptions=True)
+    
+    calls, (leader, follower) = asyncio.run(run())
+    
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower.content == "Paris"
+    assert len(calls) == 1
+    assert list(service._exact_cache.values()) == [follower]
+    assert not service._inflight and not service._inflight_waiters
+
+
+def test_generation_cancelled_when_every_waiter_leaves(llm):
+    """Nobody waiting stops the shared generation; the next request starts over."""
+    service = llm.LLMService()
+    
+    async def run():
+        release, calls = _blocking_generate(llm, service)
+        request = _request(llm, "What is the capital of France?", temperature=0)
+        waiter = asyncio.create_task(service._generate(request))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        
+        release.set()
+        return calls, await service._generate(request)
+    
+    calls, response = asyncio.run(run())
+    
+    assert response.content == "Paris"
+    assert len(calls) == 2
+    assert not service._inflight and not service._inflight_waiters
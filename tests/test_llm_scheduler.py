@@ -0,0 +1,248 @@
+"""Tests for continuous batching in the LLM service."""
+
+import asyncio
+import ctypes
+import re
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from conftest import FakeLlama
+
+N_VOCAB = 100
+EOG = 99
+
+
+class _ContextParams(ctypes.Structure):
+    """The llama_context_params fields the scheduler reads or sets."""
+    _fields_ = [
+        ("n_ctx", ctypes.c_uint32),
+        ("n_batch", ctypes.c_uint32),
+        ("n_seq_max", ctypes.c_uint32),
+        ("embeddings", ctypes.c_bool),
+    ]
+
+
+class _Context:
+    """Stand-in for ``llama_cpp._internals.LlamaContext``."""
+    
+    def __init__(self, model, params, verbose=True):
+        self.model = model
+        self.params = params
+        self.ctx = self
+        self.removed = []
+        self.closed = False
+        self.logits = {}
+    
+    def n_ctx(self):
+        return self.params.n_ctx
+    
+    def kv_cache_seq_rm(self, seq_id, p0, p1):
+        self.removed.append(seq_id)
+    
+    def kv_cache_clear(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+
+
+class ScheduledLlama(FakeLlama):
+    """Fake model whose next token is always the previous one plus one.
+    
+    Prompts tokenize to the numbers they contain, and token ``t`` reads
+    as ``<t>``.
+    """
+    
+    def __init__(self, model_path, embedding=False, **kwargs):
+        super().__init__(model_path, embedding=embedding, **kwargs)
+        self.context_params = _ContextParams(
+            n_ctx=kwargs.get("n_ctx", 512), n_batch=kwargs.get("n_batch", 512), n_seq_max=1
+        )
+        self._model = types.SimpleNamespace(name="weights")
+        self.model = "model"
+    
+    def tokenize(self, text, add_bos=True, special=False):
+        return [int(n) for n in re.findall(rb"\d+", text)] or [0]
+    
+    def detokenize(self, tokens):
+        return "".join(f"<{token}>" for token in tokens).encode()
+    
+    def n_vocab(self):
+        return N_VOCAB
+    
+    def reset(self):
+        raise AssertionError("the scheduler must not touch the main context")
+
+
+@pytest.fixture
+def llm(service_module, fake_llama_cpp, monkeypatch, tmp_path):
+    """The LLM service module with batching enabled over a fake llama.cpp."""
+    events = []
+    
+    def batch_init(n_tokens, embd, n_seq_max):
+        return types.SimpleNamespace(
+            token=[0] * n_tokens,
+            pos=[0] * n_tokens,
+            n_seq_id=[0] * n_tokens,
+            seq_id=[[0] for _ in range(n_tokens)],
+            logits=[0] * n_tokens,
+            n_tokens=0,
+        )
+    
+    def decode(ctx, batch):
+        seq_ids = set()
+        for i in range(batch.n_tokens):
+            seq_ids.add(batch.seq_id[i][0])
+            if batch.logits[i]:
+                logits = np.zeros(N_VOCAB, dtype=np.float32)
+                logits[min(batch.token[i] + 1, N_VOCAB - 1)] = 1.0
+                ctx.logits[i] = logits
+        events.append(("decode", frozenset(seq_ids)))
+        return 0
+    
+    def logits_ith(ctx, i):
+        return ctx.logits[i].ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+    
+    fake_llama_cpp.Llama = type("Llama", (ScheduledLlama,), {"instances": []})
+    fake_llama_cpp.llama_context_params = _ContextParams
+    fake_llama_cpp._internals = types.SimpleNamespace(LlamaContext=_Context)
+    fake_llama_cpp.llama_batch_init = batch_init
+    fake_llama_cpp.llama_batch_free = lambda batch: events.append(("free", None))
+    fake_llama_cpp.llama_decode = decode
+    fake_llama_cpp.llama_get_logits_ith = logits_ith
+    fake_llama_cpp.llama_model_get_vocab = lambda model: ("vocab", model)
+    fake_llama_cpp.llama_vocab_is_eog = lambda vocab, token: token == EOG
+    
+    (tmp_path / "chat.gguf").write_bytes(b"")
+    monkeypatch.setenv("MODEL_PATH", str(tmp_path))
+    monkeypatch.setenv("DEFAULT_MODEL", "chat.gguf")
+    monkeypatch.setenv("PARALLEL_SEQUENCES", "4")
+    module = service_module("llm", "llm_backend")
+    module.events = events
+    module.config_module = service_module("llm", "config")
+    module.models = service_module("llm", "models")
+    return module
+
+
+def _backend(llm, **config):
+    """A backend with the scheduler enabled."""
+    return llm.LlamaCppBackend(llm.config_module.LLMServiceConfig(**config))
+
+
+def _request(llm, text, max_tokens=8):
+    """A one-message greedy chat request."""
+    return llm.models.LLMRequest(
+        messages=[{"role": "user", "content": text}], max_tokens=max_tokens, temperature=0
+    )
+
+
+def _generate_together(backend, requests):
+    """Submit every request before the model thread takes the first step."""
+    gate = threading.Event()
+    backend._executor.submit(gate.wait)
+    
+    async def run():
+        tasks = [asyncio.create_task(backend.generate(request)) for request in requests]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks)
+    
+    return asyncio.run(run())
+
+
+def _decoded_together(llm):
+    """Largest number of sequences sharing one llama_decode call."""
+    return max(len(seq_ids) for kind, seq_ids in llm.events if kind == "decode")
+
+
+def test_end_of_generation_token_stops_sequence(llm):
+    """The vocab's end-of-generation token ends the reply with finish_reason stop."""
+    backend = _backend(llm)
+    
+    (response,) = _generate_together(backend, [_request(llm, "96")])
+    
+    assert response.content == "<97><98>"
+    assert response.finish_reason == "stop"
+
+
+def test_max_tokens_ends_sequence(llm):
+    """A sequence that reaches max_tokens finishes with finish_reason length."""
+    backend = _backend(llm)
+    
+    (response,) = _generate_together(backend, [_request(llm, "1", max_tokens=3)])
+    
+    assert response.content == "<2><3><4>"
+    assert response.finish_reason == "length"
+    assert response.tokens_used == 4
+
+
+def test_requests_that_fit_decode_together(llm):
+    """Requests within the KV budget share decode steps."""
+    backend = _backend(llm, max_context=64)
+    
+    responses = _generate_together(
+        backend, [_request(llm, "10", max_tokens=4), _request(llm, "50", max_tokens=4)]
+    )
+    
+    assert [r.content for r in responses] == ["<11><12><13><14>", "<51><52><53><54>"]
+    assert _decoded_together(llm) == 2
+
+
+def test_admission_waits_for_kv_budget(llm):
+    """A request that would overflow the context waits for running ones to finish."""
+    backend = _backend(llm, max_context=8)
+    
+    responses = _generate_together(
+        backend, [_request(llm, "10", max_tokens=4), _request(llm, "50", max_tokens=4)]
+    )
+    
+    assert [r.content for r in responses] == ["<11><12><13><14>", "<51><52><53><54>"]
+    assert _decoded_together(llm) == 1
+
+
+def test_dedicated_context_has_a_slot_per_sequence(llm):
+    """Batches decode in their own context, leaving the prompt-cached one alone."""
+    backend = _backend(llm, max_context=64)
+    
+    _generate_together(backend, [_request(llm, "1", max_tokens=2)])
+    
+    scheduler = backend._scheduler
+    assert scheduler._ctx.params.n_seq_max == 4
+    assert scheduler._ctx.params.n_ctx == 64
+    assert scheduler._ctx.model is backend.model._model
+    assert backend.model.cache is not None
+    
+    ctx = scheduler._ctx
+    backend.unload_model()
+    assert ctx.closed
+    assert scheduler._ctx is None
+
+
+def test_other_model_thread_work_runs_between_steps(llm):
+    """Work queued on the model thread is not held back until every request finishes."""
+    backend = _backend(llm)
+    gate = threading.Event()
+    backend._executor.submit(gate.wait)
+    
+    async def run():
+        task = asyncio.create_task(backend.generate(_request(llm, "1", max_tokens=20)))
+        await asyncio.sleep(0)
+        job = backend._executor.submit(llm.events.append, ("job", None))
+        gate.set()
+        await task
+        return job
+    
+    asyncio.run(run()).result()
+    
+    kinds = [kind for kind, _ in llm.events]
+    assert kinds.index("job") < len(kinds) - 1 - kinds[::-1].index("decode")
+
+
+def test_single_sequence_config_bypasses_scheduler(llm):
+    """With one sequence requests go straight to the prompt-cached context."""
+    backend = _backend(llm, parallel_sequences=1)
+    
+    assert backend._scheduler is None
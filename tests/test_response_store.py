@@ -0,0 +1,104 @@
+"""Tests for the LLM service's persistent response store."""
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def store_module(service_module):
+    """The LLM service's response_store module."""
+    return service_module("llm", "response_store")
+
+
+def test_exact_and_semantic_rows_load_separately(store_module, tmp_path):
+    """Rows with a match key load as semantic entries, the rest as exact ones."""
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    store.put(b"exact", "model-a", b"reply-1")
+    store.put(b"semantic", "model-a", b"reply-2", match=b"key", embedding=[0.5, 0.25])
+    
+    assert store.load_exact("model-a", 10) == [(b"exact", b"reply-1")]
+    ((match, embedding, response),) = store.load_semantic("model-a", 10)
+    assert (match, response) == (b"key", b"reply-2")
+    np.testing.assert_array_equal(embedding, np.array([0.5, 0.25], dtype=np.float32))
+    store.close()
+
+
+def test_rows_are_per_model_and_newest_kept(store_module, tmp_path, monkeypatch):
+    """Loads only see the model's rows, up to the limit, oldest first."""
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    clock = iter(range(1000, 1010))
+    monkeypatch.setattr(store_module.time, "time", lambda: next(clock))
+    for i in range(3):
+        store.put(b"a%d" % i, "model-a", b"reply-%d" % i)
+    store.put(b"b", "model-b", b"other")
+    
+    assert store.load_exact("model-a", 2) == [(b"a1", b"reply-1"), (b"a2", b"reply-2")]
+    assert store.load_exact("model-b", 10) == [(b"b", b"other")]
+    store.close()
+
+
+def test_same_key_replaces_row(store_module, tmp_path):
+    """Writing a key again keeps only the newest reply."""
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    store.put(b"key", "model-a", b"old")
+    store.put(b"key", "model-a", b"new")
+    
+    assert store.load_exact("model-a", 10) == [(b"key", b"new")]
+    store.close()
+
+
+def test_prune_drops_expired_rows(store_module, tmp_path, monkeypatch):
+    """Rows older than the TTL are neither loaded nor kept by prune."""
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=60)
+    monkeypatch.setattr(store_module.time, "time", lambda: 1000.0)
+    store.put(b"old", "model-a", b"old")
+    monkeypatch.setattr(store_module.time, "time", lambda: 1100.0)
+    store.put(b"new", "model-a", b"new")
+    
+    assert store.load_exact("model-a", 10) == [(b"new", b"new")]
+    assert store.prune() == 1
+    assert store.prune() == 0
+    store.close()
+
+
+def test_rows_survive_reopening(store_module, tmp_path):
+    """A new store on the same file sees earlier rows."""
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    store.put(b"key", "model-a", b"reply")
+    store.close()
+    
+    store = store_module.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    assert store.load_exact("model-a", 10) == [(b"key", b"reply")]
+    store.close()
+
+
+def test_service_stop_waits_for_pending_writes(service_module, fake_llama_cpp, monkeypatch, tmp_path):
+    """Replies persisted just before shutdown are written before the store closes."""
+    monkeypatch.setenv("PARALLEL_SEQUENCES", "1")
+    llm = service_module("llm", "service")
+    service = llm.LLMService()
+    service.response_store = llm.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    
+    put = service.response_store.put
+    
+    def slow_put(*args):
+        time.sleep(0.05)  # Still running when the store is asked to close
+        put(*args)
+    
+    monkeypatch.setattr(service.response_store, "put", slow_put)
+    
+    async def run():
+        for i in range(4):
+            service._persist(b"key-%d" % i, llm.LLMResponse(content="reply", model="model-a"))
+        await service._close_response_store()
+    
+    asyncio.run(run())
+    
+    assert service.response_store is None
+    assert not service._pending_writes
+    store = llm.ResponseStore(tmp_path / "cache.db", ttl_seconds=3600)
+    assert len(store.load_exact("model-a", 10)) == 4
+    store.close()
@@ -0,0 +1,79 @@
+"""Tests for the embedding-keyed response cache."""
+
+import numpy as np
+
+from packages.common.neuralux.semantic_cache import SemanticCache
+
+
+def _unit(*values):
+    """A float32 vector from the given components."""
+    return np.array(values, dtype=np.float32)
+
+
+def test_near_duplicate_hits_and_distant_query_misses():
+    """A query close to a cached one is answered; an unrelated one is not."""
+    cache = SemanticCache(dim=3, threshold=0.95)
+    cache.insert(_unit(1, 0, 0), "key", "answer")
+    
+    assert cache.lookup(_unit(1, 0.05, 0), "key") == "answer"
+    assert cache.lookup(_unit(0, 1, 0), "key") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_key_must_match():
+    """Entries only answer lookups with an identical parameter key."""
+    cache = SemanticCache(dim=3)
+    cache.insert(_unit(1, 0, 0), ("limit", 10), "ten")
+    
+    assert cache.lookup(_unit(1, 0, 0), ("limit", 5)) is None
+    assert cache.lookup(_unit(1, 0, 0), ("limit", 10)) == "ten"
+
+
+def test_sized_from_first_insert():
+    """Without a dim the cache adopts the size of the first vector stored."""
+    cache = SemanticCache()
+    assert cache.lookup(_unit(1, 0), "key") is None
+    
+    cache.insert(_unit(1, 0, 0, 0, 0), "key", "five")
+    assert cache.dim == 5
+    assert cache.lookup(_unit(1, 0, 0, 0, 0), "key") == "five"
+
+
+def test_dimension_change_starts_over():
+    """A vector of another size (e.g. after a PCA projection) resets the cache."""
+    cache = SemanticCache(dim=4)
+    cache.insert(_unit(1, 0, 0, 0), "key", "old")
+    
+    # Lookups of the wrong size miss instead of raising
+    assert cache.lookup(_unit(1, 0), "key") is None
+    
+    cache.insert(_unit(1, 0), "key", "new")
+    assert cache.dim == 2
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup(_unit(1, 0), "key") == "new"
+
+
+def test_evicts_least_recently_used():
+    """When full, the entry used least recently makes room."""
+    cache = SemanticCache(dim=2, max_entries=2)
+    cache.insert(_unit(1, 0), "key", "a")
+    cache.insert(_unit(0, 1), "key", "b")
+    assert cache.lookup(_unit(1, 0), "key") == "a"  # b is now the oldest
+    
+    cache.insert(_unit(1, 1), "key", "c")
+    assert cache.lookup(_unit(0, 1), "key") is None
+    assert cache.lookup(_unit(1, 0), "key") == "a"
+    assert cache.lookup(_unit(1, 1), "key") == "c"
+
+
+def test_grows_past_initial_rows():
+    """The matrix grows as entries are added, keeping earlier rows."""
+    cache = SemanticCache(dim=8, max_entries=1000, threshold=0.999)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 8)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        cache.insert(vector, "key", i)
+    
+    assert cache.lookup(vectors[0], "key") == 0
+    assert cache.lookup(vectors[299], "key") == 299